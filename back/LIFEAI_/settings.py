@@ -26,10 +26,17 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
 ]
 
+# Login do app é por e-mail (core.backends); o ModelBackend continua atendendo o admin por username
+AUTHENTICATION_BACKENDS = [
+    'core.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.WhiteNoiseAsyncMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -49,6 +56,13 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
 
+EMAIL_OUTBOX_LOTE = int(os.getenv('EMAIL_OUTBOX_LOTE', 50))
+EMAIL_OUTBOX_INTERVALO = float(os.getenv('EMAIL_OUTBOX_INTERVALO', 5))
+EMAIL_OUTBOX_MAX_TENTATIVAS = int(os.getenv('EMAIL_OUTBOX_MAX_TENTATIVAS', 6))
+EMAIL_OUTBOX_BACKOFF_BASE = int(os.getenv('EMAIL_OUTBOX_BACKOFF_BASE', 30))
+EMAIL_OUTBOX_BACKOFF_MAX = int(os.getenv('EMAIL_OUTBOX_BACKOFF_MAX', 60 * 60))
+EMAIL_OUTBOX_RESERVA = int(os.getenv('EMAIL_OUTBOX_RESERVA', 10 * 60))
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.sqlite3'),
@@ -66,30 +80,118 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# Em produção o collectstatic roda no build da imagem e gera o manifesto com hash nos nomes,
+# o que permite ao WhiteNoise servir os arquivos com cache de longo prazo.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'lifeai'),
+    }
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.JSONRapidoRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.services.autenticacao.JWTAutenticacaoCache',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
 }
 
+# Históricos paginados por cursor (core.pagination). Enquanto PAGINACAO_LEGADO_PADRAO estiver ligado,
+# requisições sem ?cursor= nem ?limite= continuam recebendo a lista completa.
+PAGINACAO_LEGADO_PADRAO = os.getenv('PAGINACAO_LEGADO_PADRAO', 'True').lower() in ('true', '1')
+PAGINACAO_LIMITE_PADRAO = int(os.getenv('PAGINACAO_LIMITE_PADRAO', 20))
+PAGINACAO_LIMITE_MAXIMO = int(os.getenv('PAGINACAO_LIMITE_MAXIMO', 100))
+# Listas de serializers planos montadas a partir de .values() (core.services.leitura)
+LEITURA_VALORES = os.getenv('LEITURA_VALORES', 'True').lower() in ('true', '1')
+
+# sync/: tokens mais antigos que a retenção dos tombstones recebem um snapshot completo
+SYNC_RETENCAO_EXCLUSOES = int(os.getenv('SYNC_RETENCAO_EXCLUSOES', 60 * 60 * 24 * 90))
+SYNC_MARGEM = int(os.getenv('SYNC_MARGEM', 5))
+
+# Endpoints */lote/ para dados registrados offline
+LOTE_MAX_ITENS = int(os.getenv('LOTE_MAX_ITENS', 500))
+
+# imc/historico/ com agrupamento: tamanho padrão e máximo da série devolvida
+GRAFICO_MAX_PONTOS = int(os.getenv('GRAFICO_MAX_PONTOS', 60))
+GRAFICO_MAX_PONTOS_LIMITE = int(os.getenv('GRAFICO_MAX_PONTOS_LIMITE', 500))
+
+# compromissos/?inicio=&fim=: tamanho máximo do período pedido
+CALENDARIO_MAX_DIAS = int(os.getenv('CALENDARIO_MAX_DIAS', 366))
+
 LM_API_URL = os.getenv("LM_API_URL", "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 LM_API_MODEL = os.getenv("LM_API_MODEL", "")
 
+LLM_MAX_CONCORRENCIA = int(os.getenv("LLM_MAX_CONCORRENCIA", 50))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", 20))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+LLM_ESPERA_SLOT = float(os.getenv("LLM_ESPERA_SLOT", 10))
+LLM_MAX_TENTATIVAS = int(os.getenv("LLM_MAX_TENTATIVAS", 3))
+LLM_CIRCUIT_FALHAS = int(os.getenv("LLM_CIRCUIT_FALHAS", 5))
+LLM_CIRCUIT_RESET = float(os.getenv("LLM_CIRCUIT_RESET", 30))
+
+CONVERSA_MAX_SESSOES = int(os.getenv("CONVERSA_MAX_SESSOES", 10000))
+CONVERSA_TTL = float(os.getenv("CONVERSA_TTL", 60 * 60))
+CONVERSA_MAX_MENSAGENS = int(os.getenv("CONVERSA_MAX_MENSAGENS", 40))
+CONVERSA_MAX_BYTES_SESSAO = int(os.getenv("CONVERSA_MAX_BYTES_SESSAO", 64 * 1024))
+CONVERSA_MEMORIA_TOTAL = int(os.getenv("CONVERSA_MEMORIA_TOTAL", 64 * 1024 * 1024))
+
+CHAT_JANELA_TURNOS = int(os.getenv("CHAT_JANELA_TURNOS", 6))
+CHAT_INTERVALO_RESUMO = int(os.getenv("CHAT_INTERVALO_RESUMO", 4))
+CHAT_ORCAMENTO_TOKENS = int(os.getenv("CHAT_ORCAMENTO_TOKENS", 8000))
+CHAT_MAX_TOKENS_RESUMO = int(os.getenv("CHAT_MAX_TOKENS_RESUMO", 600))
+
+DIETA_WORKER_CONCORRENCIA = int(os.getenv("DIETA_WORKER_CONCORRENCIA", 4))
+DIETA_WORKER_INTERVALO = float(os.getenv("DIETA_WORKER_INTERVALO", 2))
+DIETA_JOB_MAX_TENTATIVAS = int(os.getenv("DIETA_JOB_MAX_TENTATIVAS", 3))
+DIETA_JOB_TIMEOUT = int(os.getenv("DIETA_JOB_TIMEOUT", 10 * 60))
+DIETA_JOB_BACKOFF_BASE = int(os.getenv("DIETA_JOB_BACKOFF_BASE", 15))
+DIETA_JOB_BACKOFF_MAX = int(os.getenv("DIETA_JOB_BACKOFF_MAX", 5 * 60))
+DIETA_CACHE_TTL = float(os.getenv("DIETA_CACHE_TTL", 6 * 60 * 60))
+DIETA_CACHE_MAX_ITENS = int(os.getenv("DIETA_CACHE_MAX_ITENS", 1000))
+
+CONTEXTO_IA_TTL = int(os.getenv("CONTEXTO_IA_TTL", 30 * 60))
+
+# Autenticação JWT: por quanto tempo cada processo reaproveita is_active do usuário sem ir ao banco (0 desliga)
+AUTH_CACHE_USUARIO_TTL = float(os.getenv("AUTH_CACHE_USUARIO_TTL", 60))
+AUTH_CACHE_USUARIO_MAX_ITENS = int(os.getenv("AUTH_CACHE_USUARIO_MAX_ITENS", 10000))
+
+LIMITE_TAXA_BACKEND = os.getenv("LIMITE_TAXA_BACKEND", "core.services.limite_taxa.BackendMemoria")
+LIMITE_TAXA_MAX_EM_VOO = int(os.getenv("LIMITE_TAXA_MAX_EM_VOO", 200))
+LIMITE_TAXA_RETRY_AFTER_GLOBAL = int(os.getenv("LIMITE_TAXA_RETRY_AFTER_GLOBAL", 5))
+LIMITE_TAXA_ENDPOINTS = {
+    'chat-ia': {
+        'capacidade': int(os.getenv("LIMITE_CHAT_CAPACIDADE", 10)),
+        'por_minuto': float(os.getenv("LIMITE_CHAT_POR_MINUTO", 20)),
+    },
+    'gerar-dieta-ia': {
+        'capacidade': int(os.getenv("LIMITE_DIETA_CAPACIDADE", 3)),
+        'por_minuto': float(os.getenv("LIMITE_DIETA_POR_MINUTO", 2)),
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -0,0 +1,6 @@
+from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+
+
+class UvicornWorker(BaseUvicornWorker):
+    # O handler ASGI do Django não implementa o protocolo lifespan.
+    CONFIG_KWARGS = {**BaseUvicornWorker.CONFIG_KWARGS, "lifespan": "off"}
@@ -0,0 +1,33 @@
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.db.models.functions import Lower
+
+
+def buscar_por_email(email):
+    # Mesma expressão e mesmo predicado (email > '') do índice único parcial auth_user_email_uniq
+    # (migration 0012); com exclude(email='') o SQLite não reconhece o índice e varre a tabela.
+    return (
+        User.objects.annotate(email_normalizado=Lower('email'))
+        .filter(email_normalizado=email.strip().lower(), email__gt='')
+    )
+
+
+class EmailBackend(ModelBackend):
+    """Autentica por e-mail e senha numa única consulta, já trazendo o perfil (select_related),
+    para o login saber se o onboarding foi concluído sem outra ida ao banco.
+
+    Chamadas com ``username`` seguem para o ModelBackend (admin, por exemplo).
+    """
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        # O índice é único: sem ORDER BY, que o first() acrescentaria
+        user = next(iter(buscar_por_email(email).select_related('perfil')[:1]), None)
+        if user is None:
+            # Gasta o mesmo tempo de hash de um usuário existente, como o ModelBackend
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
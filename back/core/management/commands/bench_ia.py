@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import PerfilUsuario
+
+
+def criar_servidor_gemini_falso(porta, atraso):
+    class GeminiFalsoHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if "streamGenerateContent" in self.path:
+                return self.responder_stream()
+            time.sleep(atraso)
+            corpo = json.dumps({
+                "candidates": [{"content": {"parts": [{"text": "Resposta do benchmark."}]}}]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def responder_stream(self, trechos=5):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for i in range(trechos):
+                time.sleep(atraso / trechos)
+                evento = {"candidates": [{"content": {"parts": [{"text": f"Trecho {i}. "}]}}]}
+                self.wfile.write(f"data: {json.dumps(evento)}\r\n\r\n".encode())
+                self.wfile.flush()
+            self.close_connection = True
+
+        def log_message(self, *args):
+            pass
+
+    class GeminiFalsoServer(ThreadingHTTPServer):
+        request_queue_size = 1024
+        daemon_threads = True
+
+    servidor = GeminiFalsoServer(("127.0.0.1", porta), GeminiFalsoHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a vazão do chat-ia/ (contra um Gemini falso local) ou do perfil/ servidos via "
+        "runserver (WSGI), uvicorn (ASGI, um processo) e gunicorn com workers uvicorn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requisicoes", type=int, default=50)
+        parser.add_argument("--concorrencia", type=int, default=50)
+        parser.add_argument("--atraso", type=float, default=0.5, help="Latência simulada do Gemini, em segundos.")
+        parser.add_argument("--porta", type=int, default=8010)
+        parser.add_argument("--porta-gemini", type=int, default=8765)
+        parser.add_argument("--modos", nargs="+", default=["wsgi", "asgi"], choices=["wsgi", "asgi", "gunicorn"])
+        parser.add_argument("--rota", default="chat-ia", choices=["chat-ia", "perfil"],
+                            help="perfil mede só o custo de servir (JWT + uma leitura no banco), sem LLM.")
+        parser.add_argument("--workers", type=int, default=4, help="Workers do gunicorn no modo gunicorn.")
+        parser.add_argument("--stream", action="store_true", help="Usa o modo SSE e mede o tempo até o primeiro trecho.")
+
+    def handle(self, *args, **options):
+        porta = options["porta"]
+        servidor_gemini = criar_servidor_gemini_falso(options["porta_gemini"], options["atraso"])
+
+        user, _ = User.objects.get_or_create(username="bench_ia", defaults={"email": "bench_ia@lifeai.local"})
+        token = str(RefreshToken.for_user(user).access_token)
+        if options["rota"] == "perfil":
+            PerfilUsuario.objects.get_or_create(
+                id_usuario=user,
+                defaults={"nome": "Bench", "sexo": "F", "idade": 30, "objetivo": "Benchmark"}
+            )
+
+        env = {
+            **os.environ,
+            "LM_API_URL": f"http://127.0.0.1:{options['porta_gemini']}/v1beta/models/falso",
+            "GEMINI_API_KEY": "bench",
+            "LIMITE_CHAT_CAPACIDADE": str(options["requisicoes"]),
+            "LIMITE_TAXA_MAX_EM_VOO": str(options["requisicoes"]),
+            "WEB_CONCURRENCY": str(options["workers"]),
+            "GUNICORN_ACCESSLOG": "",
+            # O gunicorn com vários workers recusa o LocMemCache; sem Redis, o benchmark roda sem cache
+            "CACHE_BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.dummy.DummyCache"),
+        }
+        comandos = {
+            "wsgi": [sys.executable, "manage.py", "runserver", f"127.0.0.1:{porta}", "--noreload", "--nothreading"],
+            "asgi": [sys.executable, "-m", "uvicorn", "LIFEAI_.asgi:application",
+                     "--host", "127.0.0.1", "--port", str(porta), "--lifespan", "off", "--log-level", "warning"],
+            "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{porta}",
+                         "LIFEAI_.asgi:application"],
+        }
+
+        try:
+            for modo in options["modos"]:
+                processo = subprocess.Popen(
+                    comandos[modo], cwd=settings.BASE_DIR, env=env,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+                try:
+                    self.aguardar_servidor(porta)
+                    resultado = asyncio.run(self.disparar(
+                        f"http://127.0.0.1:{porta}/{options['rota']}/", token,
+                        options["requisicoes"], options["concorrencia"], options["stream"]
+                    ))
+                finally:
+                    processo.terminate()
+                    processo.wait()
+                self.imprimir(modo, resultado)
+        finally:
+            servidor_gemini.shutdown()
+
+    def aguardar_servidor(self, porta, limite=30):
+        fim = time.monotonic() + limite
+        while time.monotonic() < fim:
+            try:
+                if httpx.get(f"http://127.0.0.1:{porta}/health/").status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"Servidor não respondeu na porta {porta}.")
+
+    async def disparar(self, url, token, total, concorrencia, stream=False):
+        semaforo = asyncio.Semaphore(concorrencia)
+        latencias = []
+        primeiros_trechos = []
+        erros = 0
+        headers = {"Authorization": f"Bearer {token}"}
+        limites = httpx.Limits(max_connections=concorrencia)
+
+        async with httpx.AsyncClient(timeout=None, limits=limites) as client:
+            async def uma(indice):
+                nonlocal erros
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    if url.endswith("/chat-ia/"):
+                        metodo, corpo = "POST", {"pergunta": "Como dormir melhor?", "sessao_id": f"bench-{indice}", "stream": stream}
+                    else:
+                        metodo, corpo = "GET", None
+                    try:
+                        async with client.stream(metodo, url, headers=headers, json=corpo) as resposta:
+                            if resposta.status_code != 200:
+                                erros += 1
+                            primeiro = None
+                            async for _ in resposta.aiter_raw():
+                                if primeiro is None:
+                                    primeiro = time.perf_counter() - inicio
+                            if primeiro is not None:
+                                primeiros_trechos.append(primeiro)
+                    except httpx.TransportError:
+                        erros += 1
+                    latencias.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(uma(i) for i in range(total)))
+            duracao = time.perf_counter() - inicio
+
+        latencias.sort()
+        primeiros_trechos.sort()
+        return {
+            "ttft": primeiros_trechos[len(primeiros_trechos) // 2] if primeiros_trechos else 0.0,
+            "total": total,
+            "erros": erros,
+            "duracao": duracao,
+            "p50": latencias[len(latencias) // 2],
+            "p95": latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))],
+        }
+
+    def imprimir(self, modo, resultado):
+        self.stdout.write(
+            f"{modo}: {resultado['total']} requisições em {resultado['duracao']:.2f}s "
+            f"({resultado['total'] / resultado['duracao']:.1f} req/s) | "
+            f"p50 {resultado['p50']:.2f}s | p95 {resultado['p95']:.2f}s | "
+            f"primeiro byte p50 {resultado['ttft']:.2f}s | erros {resultado['erros']}"
+        )
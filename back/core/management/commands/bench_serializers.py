@@ -0,0 +1,87 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core import models, serializers
+from core.renderers import JSONRapidoRenderer, orjson
+from core.services.leitura import leitor_para
+
+
+class Command(BaseCommand):
+    help = ("Compara serializer + JSONRenderer com a leitura por .values() e o renderer orjson numa lista "
+            "de histórico de exercícios. Os dados são criados numa transação desfeita no final.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--linhas", type=int, default=10000)
+        parser.add_argument("--repeticoes", type=int, default=5, help="Vale o melhor tempo de cada caminho.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.executar(options["linhas"], options["repeticoes"])
+            transaction.set_rollback(True)
+
+    def executar(self, linhas, repeticoes):
+        user = User.objects.create_user(f"bench-{uuid.uuid4().hex[:8]}", password=None)
+        agora = timezone.now()
+        models.HistoricoExercicio.objects.bulk_create([
+            models.HistoricoExercicio(
+                id_usuario=user, nome_exercicio=f"Exercício {i % 20}", duracao_segundos=600 + i % 300,
+                calorias_queimadas=50 + i % 400, data_treino=agora - timedelta(minutes=i), client_id=uuid.uuid4()
+            )
+            for i in range(linhas)
+        ], batch_size=1000)
+
+        queryset = models.HistoricoExercicio.objects.filter(id_usuario=user).order_by("-data_treino", "-id")
+        serializer_class = serializers.HistoricoExercicioSerializer
+        leitor = leitor_para(serializer_class)
+
+        def por_serializer():
+            return serializer_class(list(queryset), many=True).data
+
+        def por_valores():
+            return leitor.representar(queryset.values(*leitor.colunas()))
+
+        caminhos = [
+            ("serializer + JSONRenderer", por_serializer, JSONRenderer()),
+            ("values() + JSONRenderer", por_valores, JSONRenderer()),
+        ]
+        if orjson is not None:
+            caminhos += [
+                ("serializer + orjson", por_serializer, JSONRapidoRenderer()),
+                ("values() + orjson", por_valores, JSONRapidoRenderer()),
+            ]
+        else:
+            self.stdout.write("orjson não instalado; medindo só o JSONRenderer.")
+
+        referencia = JSONRenderer().render(por_serializer())
+        if JSONRenderer().render(por_valores()) != referencia:
+            self.stderr.write("A leitura por values() não gerou o mesmo JSON do serializer.")
+
+        base = None
+        for nome, montar, renderer in caminhos:
+            montagem, renderizacao = self.medir(montar, renderer, repeticoes)
+            total = montagem + renderizacao
+            base = base or total
+            self.stdout.write(
+                f"{nome}: {total * 1000:.1f}ms ({linhas} linhas) | consulta + montagem {montagem * 1000:.1f}ms | "
+                f"render {renderizacao * 1000:.1f}ms | {base / total:.2f}x"
+            )
+
+    def medir(self, montar, renderer, repeticoes):
+        melhor = None
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            dados = montar()
+            montado = time.perf_counter()
+            renderer.render(dados)
+            fim = time.perf_counter()
+            tempos = (montado - inicio, fim - montado)
+            if melhor is None or sum(tempos) < sum(melhor):
+                melhor = tempos
+        return melhor
@@ -0,0 +1,37 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.outbox_email import enviar_lote, reservar_emails
+
+
+class Command(BaseCommand):
+    help = "Envia os e-mails pendentes do outbox em lotes, reaproveitando uma conexão SMTP por lote."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=settings.EMAIL_OUTBOX_LOTE)
+        parser.add_argument("--intervalo", type=float, default=settings.EMAIL_OUTBOX_INTERVALO,
+                            help="Segundos entre consultas ao outbox quando não há e-mails.")
+        parser.add_argument("--uma-vez", action="store_true", help="Esvazia o outbox e encerra.")
+
+    def handle(self, *args, **options):
+        self.parar = False
+        for sinal in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sinal, self.sinalizar_parada)
+
+        self.stdout.write("Envio de e-mails iniciado.")
+        while not self.parar:
+            emails = reservar_emails(options["lote"])
+            if emails:
+                enviados = enviar_lote(emails)
+                self.stdout.write(f"{enviados}/{len(emails)} e-mail(s) enviados.")
+                continue
+            if options["uma_vez"]:
+                break
+            time.sleep(options["intervalo"])
+        self.stdout.write("Envio de e-mails encerrado.")
+
+    def sinalizar_parada(self, *args):
+        self.parar = True
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Exclusao
+
+
+class Command(BaseCommand):
+    help = "Remove tombstones mais antigos que SYNC_RETENCAO_EXCLUSOES; clientes com token anterior recebem um snapshot completo."
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(seconds=settings.SYNC_RETENCAO_EXCLUSOES)
+        removidas, _ = Exclusao.objects.filter(excluido_em__lt=limite).delete()
+        self.stdout.write(f"{removidas} exclusão(ões) removida(s).")
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import PlanoAlimentar
+
+
+class Command(BaseCommand):
+    help = "Remove planos alimentares que nenhuma dieta usa mais (ex.: depois de excluir um usuário)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--idade-minima", type=int, default=60 * 60,
+                            help="Só remove planos criados há mais destes segundos, para não competir com um save em andamento.")
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(seconds=options["idade_minima"])
+        removidos, _ = PlanoAlimentar.objects.filter(dietas__isnull=True, criado_em__lt=limite).delete()
+        self.stdout.write(f"{removidos} plano(s) removido(s).")
@@ -0,0 +1,56 @@
+import asyncio
+import signal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.jobs_dieta import processar_job, recuperar_jobs_travados, reservar_jobs
+
+
+class Command(BaseCommand):
+    help = "Worker que consome a fila de geração de dietas (JobDieta)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concorrencia", type=int, default=settings.DIETA_WORKER_CONCORRENCIA)
+        parser.add_argument("--intervalo", type=float, default=settings.DIETA_WORKER_INTERVALO,
+                            help="Segundos entre consultas à fila quando não há jobs.")
+        parser.add_argument("--uma-vez", action="store_true", help="Processa os jobs pendentes e encerra.")
+
+    def handle(self, *args, **options):
+        asyncio.run(self.executar(options["concorrencia"], options["intervalo"], options["uma_vez"]))
+
+    async def executar(self, concorrencia, intervalo, uma_vez):
+        parar = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sinal in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sinal, parar.set)
+
+        ativos = set()
+        self.stdout.write(f"Worker de dietas iniciado (concorrência {concorrencia}).")
+
+        while not parar.is_set():
+            await sync_to_async(recuperar_jobs_travados)()
+
+            novos = []
+            vagas = concorrencia - len(ativos)
+            if vagas > 0:
+                novos = await sync_to_async(reservar_jobs)(vagas)
+                for job in novos:
+                    ativos.add(asyncio.create_task(processar_job(job)))
+
+            if uma_vez and not ativos and not novos:
+                break
+
+            esperas = ativos | {asyncio.create_task(parar.wait())}
+            concluidos, _ = await asyncio.wait(esperas, timeout=intervalo, return_when=asyncio.FIRST_COMPLETED)
+            ativos -= concluidos
+            for tarefa in esperas - ativos:
+                if not tarefa.done():
+                    tarefa.cancel()
+
+        # Encerramento gracioso: termina os jobs em andamento antes de sair.
+        if ativos:
+            self.stdout.write(f"Aguardando {len(ativos)} job(s) em andamento.")
+            await asyncio.gather(*ativos, return_exceptions=True)
+        self.stdout.write("Worker de dietas encerrado.")
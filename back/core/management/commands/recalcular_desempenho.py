@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.services.desempenho import recalcular_desempenho
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o rollup de desempenho diário a partir das pontuações dos compromissos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuario", type=int, help="Recalcula só o usuário com este id.")
+
+    def handle(self, *args, **options):
+        recalcular_desempenho(options["usuario"])
+        self.stdout.write("Desempenho diário recalculado.")
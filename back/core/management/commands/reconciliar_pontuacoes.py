@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.services.desempenho import recalcular_desempenho
+from core.services.pontuacao import reconciliar_pontuacoes
+
+
+class Command(BaseCommand):
+    help = "Corrige pontuações de compromissos que divergiram da contagem real das atividades."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuario", type=int, help="Reconcilia só o usuário com este id.")
+
+    def handle(self, *args, **options):
+        criadas, corrigidas, usuarios = reconciliar_pontuacoes(options["usuario"])
+        # bulk_create/bulk_update não disparam os signals que mantêm o rollup
+        for user_id in usuarios:
+            recalcular_desempenho(user_id)
+        self.stdout.write(
+            f"{criadas} pontuação(ões) criada(s), {corrigidas} corrigida(s), "
+            f"{len(usuarios)} usuário(s) com desempenho recalculado."
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_historicoexercicio'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobDieta',
+            fields=[
+                ('id', models.AutoField(db_column='id', primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], db_column='status', default='pendente', max_length=20)),
+                ('pergunta', models.TextField(db_column='pergunta')),
+                ('erro', models.TextField(blank=True, db_column='erro', null=True)),
+                ('tentativas', models.PositiveIntegerField(db_column='tentativas', default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True, db_column='criado_em')),
+                ('iniciado_em', models.DateTimeField(blank=True, db_column='iniciado_em', null=True)),
+                ('finalizado_em', models.DateTimeField(blank=True, db_column='finalizado_em', null=True)),
+                ('dieta', models.ForeignKey(blank=True, db_column='id_dieta', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='core.dieta')),
+                ('id_usuario', models.ForeignKey(db_column='id_usuario', on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'job_dieta',
+                'ordering': ['criado_em'],
+                'indexes': [models.Index(fields=['status', 'criado_em'], name='job_dieta_status_idx')],
+            },
+        ),
+    ]
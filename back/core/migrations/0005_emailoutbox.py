@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_jobdieta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.AutoField(db_column='id', primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('boas_vindas', 'Boas-vindas')], db_column='tipo', max_length=30)),
+                ('destinatario', models.EmailField(db_column='destinatario', max_length=254)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviado', 'Enviado'), ('erro', 'Erro')], db_column='status', default='pendente', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(db_column='tentativas', default=0)),
+                ('proxima_tentativa', models.DateTimeField(db_column='proxima_tentativa', default=django.utils.timezone.now)),
+                ('erro', models.TextField(blank=True, db_column='erro', null=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True, db_column='criado_em')),
+                ('enviado_em', models.DateTimeField(blank=True, db_column='enviado_em', null=True)),
+                ('id_usuario', models.ForeignKey(db_column='id_usuario', on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'email_outbox',
+                'ordering': ['proxima_tentativa'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='email_outbox_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_emailoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exclusao',
+            fields=[
+                ('id', models.AutoField(db_column='id', primary_key=True, serialize=False)),
+                ('tipo', models.CharField(db_column='tipo', max_length=30)),
+                ('objeto_id', models.IntegerField(db_column='objeto_id')),
+                ('excluido_em', models.DateTimeField(db_column='excluido_em', default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'exclusao',
+                'ordering': ['excluido_em'],
+            },
+        ),
+        migrations.AddField(
+            model_name='composicaocorporal',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_column='atualizado_em'),
+        ),
+        migrations.AddField(
+            model_name='compromisso',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_column='atualizado_em'),
+        ),
+        migrations.AddField(
+            model_name='compromissoatividade',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_column='atualizado_em', db_index=True),
+        ),
+        migrations.AddField(
+            model_name='dieta',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_column='atualizado_em'),
+        ),
+        migrations.AddField(
+            model_name='historicoexercicio',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_column='atualizado_em'),
+        ),
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_column='atualizado_em'),
+        ),
+        migrations.AddField(
+            model_name='pontuacaocompromisso',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_column='atualizado_em', db_index=True),
+        ),
+        migrations.AddField(
+            model_name='registrocorporal',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_column='atualizado_em'),
+        ),
+        migrations.AddIndex(
+            model_name='composicaocorporal',
+            index=models.Index(fields=['id_usuario', 'atualizado_em'], name='composicao_corporal_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compromisso',
+            index=models.Index(fields=['id_usuario', 'atualizado_em'], name='compromisso_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dieta',
+            index=models.Index(fields=['id_usuario', 'atualizado_em'], name='dieta_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicoexercicio',
+            index=models.Index(fields=['id_usuario', 'atualizado_em'], name='historico_exercicio_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='perfilusuario',
+            index=models.Index(fields=['id_usuario', 'atualizado_em'], name='perfil_usuario_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrocorporal',
+            index=models.Index(fields=['id_usuario', 'atualizado_em'], name='registro_corporal_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='exclusao',
+            name='id_usuario',
+            field=models.ForeignKey(db_column='id_usuario', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='exclusoes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='exclusao',
+            index=models.Index(fields=['id_usuario', 'excluido_em'], name='exclusao_sync_idx'),
+        ),
+    ]
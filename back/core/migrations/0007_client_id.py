@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_sincronizacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compromisso',
+            name='client_id',
+            field=models.UUIDField(blank=True, db_column='client_id', null=True),
+        ),
+        migrations.AddField(
+            model_name='historicoexercicio',
+            name='client_id',
+            field=models.UUIDField(blank=True, db_column='client_id', null=True),
+        ),
+        migrations.AddField(
+            model_name='registrocorporal',
+            name='client_id',
+            field=models.UUIDField(blank=True, db_column='client_id', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='compromisso',
+            constraint=models.UniqueConstraint(fields=('id_usuario', 'client_id'), name='compromisso_client_id_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='historicoexercicio',
+            constraint=models.UniqueConstraint(fields=('id_usuario', 'client_id'), name='historico_exercicio_client_id_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='registrocorporal',
+            constraint=models.UniqueConstraint(fields=('id_usuario', 'client_id'), name='registro_corporal_client_id_uniq'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+import core.operations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_client_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        core.operations.AddIndexConcurrently(
+            model_name='composicaocorporal',
+            index=models.Index(fields=['id_usuario', '-data_consulta', '-id'], name='composicao_corporal_hist_idx'),
+        ),
+        core.operations.AddIndexConcurrently(
+            model_name='compromisso',
+            index=models.Index(fields=['id_usuario', '-data', 'hora_inicio', 'id'], name='compromisso_hist_idx'),
+        ),
+        core.operations.AddIndexConcurrently(
+            model_name='dieta',
+            index=models.Index(fields=['id_usuario', '-data_criacao', '-id'], name='dieta_hist_idx'),
+        ),
+        core.operations.AddIndexConcurrently(
+            model_name='historicoexercicio',
+            index=models.Index(fields=['id_usuario', '-data_treino', '-id'], name='historico_exercicio_hist_idx'),
+        ),
+        core.operations.AddIndexConcurrently(
+            model_name='registrocorporal',
+            index=models.Index(fields=['id_usuario', '-data_consulta', '-id'], name='registro_corporal_hist_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def preencher_desempenho(apps, schema_editor):
+    PontuacaoCompromisso = apps.get_model('core', 'PontuacaoCompromisso')
+    DesempenhoDiario = apps.get_model('core', 'DesempenhoDiario')
+    dias = (
+        PontuacaoCompromisso.objects
+        .values('compromisso__id_usuario_id', 'compromisso__data')
+        .annotate(soma=Sum('porcentagem'), qtd=Count('id'))
+        .order_by()
+    )
+    DesempenhoDiario.objects.bulk_create([
+        DesempenhoDiario(
+            id_usuario_id=dia['compromisso__id_usuario_id'], data=dia['compromisso__data'],
+            soma_porcentagem=dia['soma'], qtd_compromissos=dia['qtd']
+        )
+        for dia in dias
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_indices_historico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DesempenhoDiario',
+            fields=[
+                ('id', models.AutoField(db_column='id', primary_key=True, serialize=False)),
+                ('data', models.DateField(db_column='data')),
+                ('soma_porcentagem', models.FloatField(db_column='soma_porcentagem', default=0)),
+                ('qtd_compromissos', models.PositiveIntegerField(db_column='qtd_compromissos', default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True, db_column='atualizado_em')),
+                ('id_usuario', models.ForeignKey(db_column='id_usuario', on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'desempenho_diario',
+                'ordering': ['data'],
+                'constraints': [models.UniqueConstraint(fields=('id_usuario', 'data'), name='desempenho_diario_dia_uniq')],
+            },
+        ),
+        migrations.RunPython(preencher_desempenho, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_desempenhodiario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compromisso',
+            name='data_original',
+            field=models.DateField(blank=True, db_column='data_original', null=True),
+        ),
+        migrations.CreateModel(
+            name='SerieCompromisso',
+            fields=[
+                ('id', models.AutoField(db_column='id', primary_key=True, serialize=False)),
+                ('titulo', models.CharField(db_column='titulo', max_length=200)),
+                ('hora_inicio', models.TimeField(db_column='hora_inicio')),
+                ('hora_fim', models.TimeField(db_column='hora_fim')),
+                ('regra', models.CharField(db_column='regra', max_length=200)),
+                ('data_inicio', models.DateField(db_column='data_inicio')),
+                ('data_fim', models.DateField(blank=True, db_column='data_fim', null=True)),
+                ('excecoes', models.JSONField(blank=True, db_column='excecoes', default=list)),
+                ('atualizado_em', models.DateTimeField(auto_now=True, db_column='atualizado_em')),
+                ('id_usuario', models.ForeignKey(db_column='id_usuario', on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'serie_compromisso',
+                'ordering': ['data_inicio', 'hora_inicio'],
+            },
+        ),
+        migrations.AddField(
+            model_name='compromisso',
+            name='serie',
+            field=models.ForeignKey(blank=True, db_column='id_serie', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ocorrencias', to='core.seriecompromisso'),
+        ),
+        migrations.AddIndex(
+            model_name='compromisso',
+            index=models.Index(condition=models.Q(('serie__isnull', False)), fields=['id_usuario', 'data_original'], name='compromisso_ocorrencia_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='compromisso',
+            constraint=models.UniqueConstraint(fields=('serie', 'data_original'), name='compromisso_serie_data_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='seriecompromisso',
+            index=models.Index(fields=['id_usuario', 'atualizado_em'], name='serie_compromisso_sync_idx'),
+        ),
+    ]
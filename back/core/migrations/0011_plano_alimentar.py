@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_serie_compromisso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanoAlimentar',
+            fields=[
+                ('id', models.AutoField(db_column='id', primary_key=True, serialize=False)),
+                ('hash', models.CharField(db_column='hash', max_length=64, unique=True)),
+                ('conteudo', models.BinaryField(db_column='conteudo')),
+                ('tamanho', models.PositiveIntegerField(db_column='tamanho')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, db_column='criado_em')),
+            ],
+            options={
+                'db_table': 'plano_alimentar',
+            },
+        ),
+        migrations.AddField(
+            model_name='dieta',
+            name='calorias_totais',
+            field=models.PositiveIntegerField(db_column='calorias_totais', default=0),
+        ),
+        migrations.AddField(
+            model_name='dieta',
+            name='qtd_dias',
+            field=models.PositiveIntegerField(db_column='qtd_dias', default=0),
+        ),
+        migrations.AddField(
+            model_name='dieta',
+            name='qtd_refeicoes',
+            field=models.PositiveIntegerField(db_column='qtd_refeicoes', default=0),
+        ),
+        migrations.AddField(
+            model_name='dieta',
+            name='plano',
+            field=models.ForeignKey(db_column='id_plano', null=True, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='dietas', to='core.planoalimentar'),
+        ),
+        # Nulo só durante a cópia, para a migration poder ser desfeita
+        migrations.AlterField(
+            model_name='dieta',
+            name='plano_alimentar',
+            field=models.JSONField(db_column='plano_alimentar', null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:30
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def verificar_emails_duplicados(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    duplicados = list(
+        User.objects.exclude(email='')
+        .values(email_normalizado=Lower('email'))
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+        .values_list('email_normalizado', flat=True)
+    )
+    if duplicados:
+        raise RuntimeError(
+            "Há usuários com o mesmo e-mail; resolva antes de criar o índice único: " + ", ".join(duplicados)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0011_plano_alimentar'),
+    ]
+
+    operations = [
+        migrations.RunPython(verificar_emails_duplicados, migrations.RunPython.noop),
+        # auth_user não é nosso, então o índice vai por SQL. Parcial porque usuários criados
+        # pelo admin podem não ter e-mail.
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX auth_user_email_uniq ON auth_user (LOWER(email)) WHERE email > ''",
+            "DROP INDEX auth_user_email_uniq",
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.services.cache_dieta import chave_pergunta
+
+
+def preencher_chaves(apps, schema_editor):
+    # Só os jobs ativos entram na constraint. Se a corrida antiga deixou dois ativos para a
+    # mesma pergunta, o mais novo recebe uma chave própria e ainda é processado.
+    JobDieta = apps.get_model('core', 'JobDieta')
+    vistas = set()
+    ativos = JobDieta.objects.filter(status__in=['pendente', 'processando']).order_by('criado_em')
+    for job in ativos.only('id', 'id_usuario_id', 'pergunta'):
+        chave = chave_pergunta(job.pergunta)
+        if (job.id_usuario_id, chave) in vistas:
+            chave = f'legado-{job.id}'
+        vistas.add((job.id_usuario_id, chave))
+        JobDieta.objects.filter(id=job.id).update(chave=chave)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_auth_user_email_uniq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobdieta',
+            name='chave',
+            field=models.CharField(db_column='chave', default='', max_length=64),
+        ),
+        migrations.RunPython(preencher_chaves, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='jobdieta',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pendente', 'processando'])), fields=('id_usuario', 'chave'), name='job_dieta_ativo_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_job_dieta_chave'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobdieta',
+            name='force_new',
+            field=models.BooleanField(db_column='force_new', default=False),
+        ),
+    ]
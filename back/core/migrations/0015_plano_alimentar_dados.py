@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:05
+
+from django.db import migrations
+
+from core.services.planos import (
+    comprimir_plano,
+    descomprimir_plano,
+    endereco_plano,
+    resumir_plano,
+    serializar_plano
+)
+
+
+def mover_planos(apps, schema_editor):
+    Dieta = apps.get_model('core', 'Dieta')
+    PlanoAlimentar = apps.get_model('core', 'PlanoAlimentar')
+    ids_por_hash = {}
+    for dieta in Dieta.objects.only('id', 'plano_alimentar').iterator(chunk_size=500):
+        bruto = serializar_plano(dieta.plano_alimentar)
+        endereco = endereco_plano(bruto)
+        if endereco not in ids_por_hash:
+            ids_por_hash[endereco] = PlanoAlimentar.objects.create(
+                hash=endereco, conteudo=comprimir_plano(bruto), tamanho=len(bruto)
+            ).id
+        Dieta.objects.filter(id=dieta.id).update(plano_id=ids_por_hash[endereco],
+                                                 **resumir_plano(dieta.plano_alimentar))
+
+
+def restaurar_planos(apps, schema_editor):
+    Dieta = apps.get_model('core', 'Dieta')
+    for dieta in Dieta.objects.select_related('plano').iterator(chunk_size=500):
+        Dieta.objects.filter(id=dieta.id).update(plano_alimentar=descomprimir_plano(dieta.plano.conteudo))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_job_dieta_force_new'),
+    ]
+
+    operations = [
+        migrations.RunPython(mover_planos, restaurar_planos),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_plano_alimentar_dados'),
+    ]
+
+    # Separada da cópia em 0015: no Postgres o UPDATE em id_plano deixa eventos pendentes da FK
+    # deferrable, e um ALTER TABLE na mesma transação falharia.
+    operations = [
+        migrations.RemoveField(
+            model_name='dieta',
+            name='plano_alimentar',
+        ),
+        migrations.AlterField(
+            model_name='dieta',
+            name='plano',
+            field=models.ForeignKey(db_column='id_plano', on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='dietas', to='core.planoalimentar'),
+        ),
+    ]
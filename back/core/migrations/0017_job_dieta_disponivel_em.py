@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_plano_alimentar_remover_json'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobdieta',
+            name='disponivel_em',
+            field=models.DateTimeField(blank=True, db_column='disponivel_em', null=True),
+        ),
+    ]
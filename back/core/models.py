@@ -1,5 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from core.services.planos import (
+    comprimir_plano,
+    descomprimir_plano,
+    endereco_plano,
+    resumir_plano,
+    serializar_plano
+)
+from core.services.recorrencia import RegraRecorrencia
 
 
 class ModelBase(models.Model):
@@ -21,9 +31,19 @@ class RegistroCorporal(ModelBase):
     altura = models.FloatField(db_column='altura', null=False)
     imc_res = models.FloatField(db_column='imc_res', null=True, blank=True)
     classificacao = models.CharField(db_column='classificacao', max_length=30, null=True, blank=True)
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True)
+    # Gerado pelo app para tornar idempotente o reenvio de registros feitos offline
+    client_id = models.UUIDField(db_column='client_id', null=True, blank=True)
 
     class Meta:
         db_table = 'registro_corporal'
+        indexes = [
+            models.Index(fields=['id_usuario', '-data_consulta', '-id'], name='registro_corporal_hist_idx'),
+            models.Index(fields=['id_usuario', 'atualizado_em'], name='registro_corporal_sync_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['id_usuario', 'client_id'], name='registro_corporal_client_id_uniq'),
+        ]
         ordering = ['id']
 
 
@@ -53,22 +73,88 @@ class PerfilUsuario(ModelBase):
         blank=True,
         help_text="Ex: Asma, problema no joelho, hérnia, limitação para exercícios"
     )
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True)
 
     class Meta:
         db_table = 'perfil_usuario'
+        indexes = [
+            models.Index(fields=['id_usuario', 'atualizado_em'], name='perfil_usuario_sync_idx'),
+        ]
 
     def __str__(self):
         return f"Perfil de {self.nome}"
 
+class SerieCompromisso(ModelBase):
+    """Compromisso recorrente guardado como regra (subconjunto do RRULE, ver core.services.recorrencia).
+
+    As ocorrências não viram linhas de Compromisso: são geradas para a janela consultada e só
+    as que o usuário edita ou conclui são materializadas, ligadas pela ``serie`` e ``data_original``.
+    Ocorrências canceladas ficam em ``excecoes`` (como o EXDATE do RFC).
+    """
+    titulo = models.CharField(db_column='titulo', max_length=200)
+    hora_inicio = models.TimeField(db_column='hora_inicio')
+    hora_fim = models.TimeField(db_column='hora_fim')
+    regra = models.CharField(db_column='regra', max_length=200)
+    data_inicio = models.DateField(db_column='data_inicio')
+    # Última ocorrência possível pela regra; nulo para séries sem fim
+    data_fim = models.DateField(db_column='data_fim', null=True, blank=True)
+    excecoes = models.JSONField(db_column='excecoes', default=list, blank=True)
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True)
+
+    class Meta:
+        db_table = 'serie_compromisso'
+        ordering = ['data_inicio', 'hora_inicio']
+        indexes = [
+            models.Index(fields=['id_usuario', 'atualizado_em'], name='serie_compromisso_sync_idx'),
+        ]
+
+    @property
+    def regra_recorrencia(self):
+        return RegraRecorrencia.from_string(self.regra)
+
+    def datas(self, inicio, fim):
+        """Datas das ocorrências em [inicio, fim], já sem as canceladas."""
+        excecoes = set(self.excecoes)
+        for dia in self.regra_recorrencia.ocorrencias(self.data_inicio, inicio, fim):
+            if dia.isoformat() not in excecoes:
+                yield dia
+
+    def save(self, *args, **kwargs):
+        self.data_fim = self.regra_recorrencia.ultima_data(self.data_inicio)
+        if 'update_fields' in kwargs and kwargs['update_fields'] is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'data_fim'}
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.titulo} ({self.regra})"
+
 class Compromisso(ModelBase):
     titulo = models.CharField(db_column='titulo', max_length=200, null=False)
     data = models.DateField(db_column='data', null=False)
     hora_inicio = models.TimeField(db_column='hora_inicio', null=False)
     hora_fim = models.TimeField(db_column='hora_fim', null=False)
     concluido = models.BooleanField(db_column='concluido', default=False)
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True)
+    # Gerado pelo app para tornar idempotente o reenvio de registros feitos offline
+    client_id = models.UUIDField(db_column='client_id', null=True, blank=True)
+    # Preenchidos quando o compromisso é uma ocorrência materializada de uma série;
+    # data_original é a data prevista pela regra, mesmo que a ocorrência tenha sido remarcada.
+    serie = models.ForeignKey('SerieCompromisso', db_column='id_serie', on_delete=models.SET_NULL,
+                              null=True, blank=True, related_name='ocorrencias')
+    data_original = models.DateField(db_column='data_original', null=True, blank=True)
 
     class Meta:
         db_table = 'compromisso'
+        indexes = [
+            models.Index(fields=['id_usuario', '-data', 'hora_inicio', 'id'], name='compromisso_hist_idx'),
+            models.Index(fields=['id_usuario', 'atualizado_em'], name='compromisso_sync_idx'),
+            models.Index(fields=['id_usuario', 'data_original'], name='compromisso_ocorrencia_idx',
+                         condition=models.Q(serie__isnull=False)),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['id_usuario', 'client_id'], name='compromisso_client_id_uniq'),
+            models.UniqueConstraint(fields=['serie', 'data_original'], name='compromisso_serie_data_uniq'),
+        ]
         unique_together = (('id_usuario', 'data', 'hora_inicio'),)
         ordering = ['-data', 'hora_inicio']
 
@@ -81,6 +167,7 @@ class CompromissoAtividade(models.Model):
     done = models.BooleanField(db_column='done', default=False)
     compromisso = models.ForeignKey('Compromisso', db_column='id_compromisso', on_delete=models.CASCADE,
                                     related_name='atividades')
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'compromisso_atividade'
@@ -98,6 +185,7 @@ class PontuacaoCompromisso(models.Model):
     qtd_atv_done = models.PositiveIntegerField(db_column='qtd_atv_done', default=0)
     porcentagem = models.FloatField(db_column='porcentagem', default=0)
     criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'pontuacao_compromisso'
@@ -106,6 +194,28 @@ class PontuacaoCompromisso(models.Model):
     def __str__(self):
         return f"Pontuação - Compromisso #{self.compromisso.id}: {self.porcentagem:.2f}%"
 
+class DesempenhoDiario(ModelBase):
+    """Rollup por usuário e dia das pontuações dos compromissos, mantido pelos signals de
+    PontuacaoCompromisso e Compromisso (core.services.desempenho)."""
+    data = models.DateField(db_column='data')
+    soma_porcentagem = models.FloatField(db_column='soma_porcentagem', default=0)
+    qtd_compromissos = models.PositiveIntegerField(db_column='qtd_compromissos', default=0)
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True)
+
+    class Meta:
+        db_table = 'desempenho_diario'
+        ordering = ['data']
+        constraints = [
+            models.UniqueConstraint(fields=['id_usuario', 'data'], name='desempenho_diario_dia_uniq'),
+        ]
+
+    @property
+    def porcentagem(self):
+        return self.soma_porcentagem / self.qtd_compromissos if self.qtd_compromissos else 0
+
+    def __str__(self):
+        return f"Desempenho de {self.data}: {self.porcentagem:.2f}%"
+
 class ComposicaoCorporal(ModelBase):
     data_consulta = models.DateField(db_column='data_consulta', auto_now_add=True)
     gordura_percentual = models.FloatField(db_column='gordura_percentual', null=True, blank=True)
@@ -113,11 +223,44 @@ class ComposicaoCorporal(ModelBase):
     agua_percentual = models.FloatField(db_column='agua_percentual', null=True, blank=True)
     gordura_visceral = models.IntegerField(db_column='gordura_visceral', null=True, blank=True)
     estimado = models.BooleanField(db_column='estimado', default=False)
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True)
 
     class Meta:
         db_table = 'composicao_corporal'
+        indexes = [
+            models.Index(fields=['id_usuario', '-data_consulta', '-id'], name='composicao_corporal_hist_idx'),
+            models.Index(fields=['id_usuario', 'atualizado_em'], name='composicao_corporal_sync_idx'),
+        ]
         ordering = ['-data_consulta']
 
+class PlanoAlimentar(models.Model):
+    """Corpo de um plano de dieta, endereçado pelo sha256 do JSON canônico e guardado com zlib.
+    Dietas com o mesmo plano apontam para a mesma linha."""
+    id = models.AutoField(db_column='id', primary_key=True)
+    hash = models.CharField(db_column='hash', max_length=64, unique=True)
+    conteudo = models.BinaryField(db_column='conteudo')
+    tamanho = models.PositiveIntegerField(db_column='tamanho')
+    criado_em = models.DateTimeField(db_column='criado_em', auto_now_add=True)
+
+    class Meta:
+        db_table = 'plano_alimentar'
+
+    @classmethod
+    def armazenar(cls, plano):
+        bruto = serializar_plano(plano)
+        armazenado, _ = cls.objects.get_or_create(
+            hash=endereco_plano(bruto),
+            defaults={'conteudo': comprimir_plano(bruto), 'tamanho': len(bruto)}
+        )
+        return armazenado
+
+    @property
+    def dados(self):
+        return descomprimir_plano(self.conteudo)
+
+    def __str__(self):
+        return f"Plano {self.hash[:12]} ({self.tamanho} bytes)"
+
 class Dieta(ModelBase):
     id_usuario = models.ForeignKey(
         User,
@@ -126,23 +269,170 @@ class Dieta(ModelBase):
         related_name='dietas'
     )
     data_criacao = models.DateTimeField(db_column='data_criacao', auto_now_add=True)
-    plano_alimentar = models.JSONField(db_column='plano_alimentar', null=False)
+    plano = models.ForeignKey('PlanoAlimentar', db_column='id_plano', on_delete=models.PROTECT,
+                              related_name='dietas')
+    # Resumo do plano para o histórico, preenchido ao salvar (core.services.planos.resumir_plano)
+    calorias_totais = models.PositiveIntegerField(db_column='calorias_totais', default=0)
+    qtd_refeicoes = models.PositiveIntegerField(db_column='qtd_refeicoes', default=0)
+    qtd_dias = models.PositiveIntegerField(db_column='qtd_dias', default=0)
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True)
 
     class Meta:
         db_table = 'dieta'
+        indexes = [
+            models.Index(fields=['id_usuario', '-data_criacao', '-id'], name='dieta_hist_idx'),
+            models.Index(fields=['id_usuario', 'atualizado_em'], name='dieta_sync_idx'),
+        ]
         ordering = ['-data_criacao']
 
+    @property
+    def plano_alimentar(self):
+        """O plano completo; use select_related('plano') ao ler várias dietas."""
+        if self._plano_pendente is not None:
+            return self._plano_pendente
+        return self.plano.dados
+
+    @plano_alimentar.setter
+    def plano_alimentar(self, plano):
+        # Aceito também no construtor (Dieta.objects.create(plano_alimentar=...)); vai para o
+        # armazenamento só no save().
+        self._plano_pendente = plano
+
+    _plano_pendente = None
+
+    def save(self, *args, **kwargs):
+        if self._plano_pendente is not None:
+            self.plano = PlanoAlimentar.armazenar(self._plano_pendente)
+            for campo, valor in resumir_plano(self._plano_pendente).items():
+                setattr(self, campo, valor)
+            self._plano_pendente = None
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Dieta {self.id} - {self.data_criacao}"
 
+class JobDieta(ModelBase):
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDO = 'concluido'
+    ERRO = 'erro'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (PROCESSANDO, 'Processando'),
+        (CONCLUIDO, 'Concluído'),
+        (ERRO, 'Erro'),
+    ]
+
+    status = models.CharField(db_column='status', max_length=20, choices=STATUS_CHOICES, default=PENDENTE)
+    pergunta = models.TextField(db_column='pergunta')
+    # Hash da pergunta normalizada: um job ativo por usuário e pergunta
+    chave = models.CharField(db_column='chave', max_length=64, default='')
+    # Pedido com force_new: gera de novo em vez de devolver o plano do cache de dietas
+    force_new = models.BooleanField(db_column='force_new', default=False)
+    dieta = models.ForeignKey('Dieta', db_column='id_dieta', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='jobs')
+    erro = models.TextField(db_column='erro', null=True, blank=True)
+    tentativas = models.PositiveIntegerField(db_column='tentativas', default=0)
+    # Job devolvido à fila por falha temporária só volta a ser reservado a partir deste momento
+    disponivel_em = models.DateTimeField(db_column='disponivel_em', null=True, blank=True)
+    criado_em = models.DateTimeField(db_column='criado_em', auto_now_add=True)
+    iniciado_em = models.DateTimeField(db_column='iniciado_em', null=True, blank=True)
+    finalizado_em = models.DateTimeField(db_column='finalizado_em', null=True, blank=True)
+
+    class Meta:
+        db_table = 'job_dieta'
+        ordering = ['criado_em']
+        indexes = [
+            models.Index(fields=['status', 'criado_em'], name='job_dieta_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['id_usuario', 'chave'], name='job_dieta_ativo_uniq',
+                                    condition=models.Q(status__in=['pendente', 'processando'])),
+        ]
+
+    def __str__(self):
+        return f"Job de dieta #{self.id} ({self.status})"
+
+class Exclusao(models.Model):
+    """Tombstone de um registro excluído, consumido pelo endpoint sync/.
+
+    Sem constraint no banco: as exclusões em cascata de um usuário ainda geram tombstones
+    enquanto o próprio usuário está sendo apagado.
+    """
+    id = models.AutoField(db_column='id', primary_key=True)
+    id_usuario = models.ForeignKey(
+        User,
+        db_column='id_usuario',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='exclusoes'
+    )
+    tipo = models.CharField(db_column='tipo', max_length=30)
+    objeto_id = models.IntegerField(db_column='objeto_id')
+    excluido_em = models.DateTimeField(db_column='excluido_em', default=timezone.now)
+
+    class Meta:
+        db_table = 'exclusao'
+        ordering = ['excluido_em']
+        indexes = [
+            models.Index(fields=['id_usuario', 'excluido_em'], name='exclusao_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.objeto_id} excluído em {self.excluido_em}"
+
+class EmailOutbox(ModelBase):
+    BOAS_VINDAS = 'boas_vindas'
+    TIPO_CHOICES = [
+        (BOAS_VINDAS, 'Boas-vindas'),
+    ]
+
+    PENDENTE = 'pendente'
+    ENVIADO = 'enviado'
+    ERRO = 'erro'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (ENVIADO, 'Enviado'),
+        (ERRO, 'Erro'),
+    ]
+
+    tipo = models.CharField(db_column='tipo', max_length=30, choices=TIPO_CHOICES)
+    destinatario = models.EmailField(db_column='destinatario')
+    status = models.CharField(db_column='status', max_length=20, choices=STATUS_CHOICES, default=PENDENTE)
+    tentativas = models.PositiveIntegerField(db_column='tentativas', default=0)
+    proxima_tentativa = models.DateTimeField(db_column='proxima_tentativa', default=timezone.now)
+    erro = models.TextField(db_column='erro', null=True, blank=True)
+    criado_em = models.DateTimeField(db_column='criado_em', auto_now_add=True)
+    enviado_em = models.DateTimeField(db_column='enviado_em', null=True, blank=True)
+
+    class Meta:
+        db_table = 'email_outbox'
+        ordering = ['proxima_tentativa']
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa'], name='email_outbox_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"E-mail {self.tipo} para {self.destinatario} ({self.status})"
+
 class HistoricoExercicio(ModelBase):
     nome_exercicio = models.CharField(db_column='nome_exercicio', max_length=150, null=False)
     duracao_segundos = models.PositiveIntegerField(db_column='duracao_segundos', null=False)
     calorias_queimadas = models.PositiveIntegerField(db_column='calorias_queimadas', null=False)
     data_treino = models.DateTimeField(db_column='data_treino', null=False)
+    atualizado_em = models.DateTimeField(db_column='atualizado_em', auto_now=True)
+    # Gerado pelo app para tornar idempotente o reenvio de registros feitos offline
+    client_id = models.UUIDField(db_column='client_id', null=True, blank=True)
 
     class Meta:
         db_table = 'historico_exercicio'
+        indexes = [
+            models.Index(fields=['id_usuario', '-data_treino', '-id'], name='historico_exercicio_hist_idx'),
+            models.Index(fields=['id_usuario', 'atualizado_em'], name='historico_exercicio_sync_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['id_usuario', 'client_id'], name='historico_exercicio_client_id_uniq'),
+        ]
         ordering = ['-data_treino']
 
     def __str__(self):
@@ -0,0 +1,123 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.services.leitura import leitor_para
+
+
+class PaginacaoKeyset(BasePagination):
+    """Paginação por cursor opaco sobre a chave de ordenação (keyset).
+
+    Em vez de OFFSET, cada página filtra pelos valores do último item da anterior,
+    então o custo não cresce com a profundidade do histórico. ``ordem`` deve terminar
+    em ``id`` (ou ``-id``) para desempatar registros com a mesma data.
+    """
+
+    cursor_query_param = 'cursor'
+    limite_query_param = 'limite'
+
+    def __init__(self, ordem):
+        self.ordem = ordem
+        self.limite_padrao = settings.PAGINACAO_LIMITE_PADRAO
+        self.limite_maximo = settings.PAGINACAO_LIMITE_MAXIMO
+
+    def usar_legado(self, request):
+        # Clientes antigos não mandam cursor nem limite e esperam a lista completa.
+        if not settings.PAGINACAO_LEGADO_PADRAO:
+            return False
+        return (self.cursor_query_param not in request.query_params
+                and self.limite_query_param not in request.query_params)
+
+    def get_limite(self, request):
+        try:
+            limite = int(request.query_params[self.limite_query_param])
+        except (KeyError, ValueError):
+            return self.limite_padrao
+        if limite <= 0:
+            return self.limite_padrao
+        return min(limite, self.limite_maximo)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limite = self.get_limite(request)
+        queryset = queryset.order_by(*self.ordem)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.filtro_apos(self.decodificar(cursor, queryset.model)))
+
+        itens = list(queryset[:self.limite + 1])
+        self.tem_proxima = len(itens) > self.limite
+        itens = itens[:self.limite]
+        self.proximo_cursor = self.codificar(itens[-1]) if self.tem_proxima else None
+        return itens
+
+    def get_paginated_response(self, data):
+        proximo = None
+        if self.proximo_cursor:
+            proximo = replace_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param, self.proximo_cursor
+            )
+        return Response({
+            'resultados': data,
+            'cursor': self.proximo_cursor,
+            'proximo': proximo,
+        })
+
+    def campos(self):
+        return [(campo.lstrip('-'), campo.startswith('-')) for campo in self.ordem]
+
+    def filtro_apos(self, valores):
+        # (a, b, id) depois de (va, vb, vid) vira: a > va OR (a = va AND b > vb) OR (... AND id > vid),
+        # trocando > por < nos campos em ordem decrescente.
+        filtro = Q()
+        iguais = {}
+        for (nome, decrescente), valor in zip(self.campos(), valores):
+            operador = 'lt' if decrescente else 'gt'
+            filtro |= Q(**iguais, **{f'{nome}__{operador}': valor})
+            iguais[nome] = valor
+        return filtro
+
+    def codificar(self, item):
+        valores = []
+        for nome, _ in self.campos():
+            valor = item[nome] if isinstance(item, dict) else getattr(item, nome)
+            valores.append(valor.isoformat() if hasattr(valor, 'isoformat') else valor)
+        return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip('=')
+
+    def decodificar(self, cursor, model):
+        try:
+            valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if not isinstance(valores, list) or len(valores) != len(self.ordem):
+                raise ValueError
+            return [
+                model._meta.get_field(nome).to_python(valor)
+                for (nome, _), valor in zip(self.campos(), valores)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError, ValidationError):
+            raise NotFound('Cursor inválido.')
+
+
+def responder_paginado(request, queryset, serializer_class, ordem):
+    # Serializers planos são lidos direto de .values(), sem criar uma instância por linha.
+    leitor = leitor_para(serializer_class) if settings.LEITURA_VALORES else None
+    if leitor is not None:
+        queryset = queryset.values(*leitor.colunas(campo.lstrip('-') for campo in ordem))
+        serializar = leitor.representar
+    else:
+        serializar = lambda itens: serializer_class(itens, many=True).data
+
+    paginacao = PaginacaoKeyset(ordem)
+    if paginacao.usar_legado(request):
+        return Response(serializar(queryset.order_by(*ordem)))
+
+    pagina = paginacao.paginate_queryset(queryset, request)
+    return paginacao.get_paginated_response(serializar(pagina))
@@ -0,0 +1,27 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """JSONRenderer que usa o orjson quando ele está instalado.
+
+    Sem o orjson (ou quando o cliente pede indentação) cai no renderer padrão do DRF.
+    Datas e horas, e os tipos que o orjson não conhece (Decimal, strings lazy, etc.), passam
+    pelo mesmo encoder do DRF, então a saída continua igual mesmo para linhas cruas de
+    ``.values()`` (o orjson escreveria datetime em UTC com ``+00:00`` em vez de ``Z``).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        opcoes = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        ret = orjson.dumps(data, default=JSONEncoder().default, option=opcoes)
+        # Como o JSONRenderer, escapa U+2028/U+2029 para a resposta poder ser embutida em JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -7,8 +7,10 @@ from .models import (
     PontuacaoCompromisso,
     CompromissoAtividade,
     ComposicaoCorporal,
-    HistoricoExercicio
+    HistoricoExercicio,
+    SerieCompromisso
 )
+from .services.recorrencia import RegraInvalidaError, RegraRecorrencia
 from datetime import date
 
 class PerfilUsuarioSerializer(serializers.ModelSerializer):
@@ -19,8 +21,8 @@ class PerfilUsuarioSerializer(serializers.ModelSerializer):
 class RegistroCorporalSerializer(serializers.ModelSerializer):
     class Meta:
         model = RegistroCorporal
-        fields = ['id', 'data_consulta', 'peso', 'altura', 'imc_res', 'classificacao']
-        read_only_fields = ['imc_res', 'classificacao']
+        fields = ['id', 'client_id', 'data_consulta', 'peso', 'altura', 'imc_res', 'classificacao']
+        read_only_fields = ['client_id', 'imc_res', 'classificacao']
 
     def validate_data_consulta(self, value):
         user = self.context['request'].user
@@ -38,9 +40,16 @@ class GraficoEvolucaoSerializer(serializers.ModelSerializer):
         fields = ['data_consulta', 'imc_res']
 
 class DietaSerializer(serializers.ModelSerializer):
+    """Resumo para listas; o plano completo fica no DietaDetalheSerializer."""
     class Meta:
         model = Dieta
-        fields = ['id', 'data_criacao', 'plano_alimentar']
+        fields = ['id', 'data_criacao', 'calorias_totais', 'qtd_refeicoes', 'qtd_dias']
+
+class DietaDetalheSerializer(DietaSerializer):
+    plano_alimentar = serializers.JSONField(read_only=True)
+
+    class Meta(DietaSerializer.Meta):
+        fields = DietaSerializer.Meta.fields + ['plano_alimentar']
 
 class ComposicaoCorporalSerializer(serializers.ModelSerializer):
     class Meta:
@@ -61,15 +70,78 @@ class AtividadeSerializer(serializers.ModelSerializer):
         model = CompromissoAtividade
         fields = ['id', 'descricao', 'done']
 
+class AtividadeSyncSerializer(serializers.ModelSerializer):
+    compromisso_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = CompromissoAtividade
+        fields = ['id', 'compromisso_id', 'descricao', 'done']
+
 class CompromissoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Compromisso
-        fields = ['id', 'titulo', 'data', 'hora_inicio', 'hora_fim', 'concluido']
+        fields = ['id', 'client_id', 'titulo', 'data', 'hora_inicio', 'hora_fim', 'concluido', 'serie',
+                  'data_original']
+        read_only_fields = ['client_id', 'serie', 'data_original']
+
+    def create(self, validated_data):
+        validated_data['id_usuario'] = self.context['request'].user
+        return super().create(validated_data)
+
+class PontuacaoResumoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PontuacaoCompromisso
+        fields = ['qtd_total_atv', 'qtd_atv_done', 'porcentagem']
+
+class CompromissoCalendarioSerializer(CompromissoSerializer):
+    """Compromisso com atividades e pontuação; espera atividades prefetchadas e pontuacao no select_related."""
+    atividades = AtividadeSerializer(many=True, read_only=True)
+    pontuacao = serializers.SerializerMethodField()
+    virtual = serializers.SerializerMethodField()
+
+    class Meta(CompromissoSerializer.Meta):
+        fields = CompromissoSerializer.Meta.fields + ['atividades', 'pontuacao', 'virtual']
+
+    def get_pontuacao(self, obj):
+        try:
+            return PontuacaoResumoSerializer(obj.pontuacao).data
+        except PontuacaoCompromisso.DoesNotExist:
+            return None
+
+    def get_virtual(self, obj):
+        return False
+
+class SerieCompromissoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SerieCompromisso
+        fields = ['id', 'titulo', 'hora_inicio', 'hora_fim', 'regra', 'data_inicio', 'data_fim', 'excecoes']
+        read_only_fields = ['data_fim', 'excecoes']
+
+    def validate_regra(self, value):
+        try:
+            RegraRecorrencia.from_string(value)
+        except RegraInvalidaError as e:
+            raise serializers.ValidationError(str(e))
+        return value.upper().removeprefix('RRULE:')
+
+    def validate(self, attrs):
+        regra = attrs.get('regra', getattr(self.instance, 'regra', None))
+        data_inicio = attrs.get('data_inicio', getattr(self.instance, 'data_inicio', None))
+        if next(RegraRecorrencia.from_string(regra).ocorrencias(data_inicio, data_inicio, date.max), None) is None:
+            raise serializers.ValidationError({'regra': "A regra não gera nenhuma ocorrência."})
+        return attrs
 
     def create(self, validated_data):
         validated_data['id_usuario'] = self.context['request'].user
         return super().create(validated_data)
 
+class OcorrenciaSerieSerializer(serializers.ModelSerializer):
+    """Campos que podem ser sobrescritos ao materializar uma ocorrência; o resto vem da série."""
+    class Meta:
+        model = Compromisso
+        fields = ['titulo', 'data', 'hora_inicio', 'hora_fim', 'concluido']
+        extra_kwargs = {campo: {'required': False} for campo in fields}
+
 class PontuacaoCompromissoSerializer(serializers.ModelSerializer):
     data_compromisso = serializers.DateField(source='compromisso.data', format='%Y-%m-%d')
     compromisso_id = serializers.IntegerField(source='compromisso.id', read_only=True)
@@ -89,7 +161,8 @@ class HistoricoExercicioSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = HistoricoExercicio
-        fields = ['id', 'exercise_name', 'duration_seconds', 'calories_burned', 'created_at']
+        fields = ['id', 'client_id', 'exercise_name', 'duration_seconds', 'calories_burned', 'created_at']
+        read_only_fields = ['client_id']
 
     def create(self, validated_data):
         validated_data['id_usuario'] = self.context['request'].user
@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+jwt_authentication = JWTAuthentication()
+
+
+class CacheUsuarios:
+    """Cache por processo do que a autenticação precisa saber do usuário (ativo e, com
+    CHECK_REVOKE_TOKEN, o hash da senha), para não consultar auth_user a cada requisição.
+
+    O post_save/post_delete de User invalida a entrada neste processo; nos outros workers ela
+    vale no máximo ``ttl`` segundos.
+    """
+
+    def __init__(self, ttl, max_itens):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(ttl=settings.AUTH_CACHE_USUARIO_TTL, max_itens=settings.AUTH_CACHE_USUARIO_MAX_ITENS)
+
+    def obter(self, user_id):
+        with self._lock:
+            item = self._itens.get(user_id)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._itens[user_id]
+                return None
+            self._itens.move_to_end(user_id)
+            return item[1]
+
+    def guardar(self, user_id, dados):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._itens[user_id] = (time.monotonic() + self.ttl, dados)
+            self._itens.move_to_end(user_id)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._itens.pop(user_id, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+cache_usuarios = CacheUsuarios.from_settings()
+
+def _id_do_token(validated_token):
+    try:
+        return User._meta.get_field(api_settings.USER_ID_FIELD).to_python(
+            validated_token[api_settings.USER_ID_CLAIM]
+        )
+    except KeyError:
+        raise InvalidToken("O token não identifica o usuário.")
+
+
+def _consulta_autenticacao(user_id):
+    campos = ('is_active', 'password') if api_settings.CHECK_REVOKE_TOKEN else ('is_active',)
+    return User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(*campos)
+
+
+def _dados_autenticacao(linha):
+    if linha is None:
+        return None
+    return linha[0], get_md5_hash_password(linha[1]) if api_settings.CHECK_REVOKE_TOKEN else None
+
+
+def _usuario_validado(validated_token, user_id, dados):
+    # Mesmas checagens do JWTAuthentication.get_user, sobre os dados em cache
+    if dados is None:
+        raise AuthenticationFailed("Usuário não encontrado.", code="user_not_found")
+    ativo, hash_senha = dados
+    if api_settings.CHECK_USER_IS_ACTIVE and not ativo:
+        raise AuthenticationFailed("Usuário inativo.", code="user_inactive")
+    if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != hash_senha:
+        raise AuthenticationFailed("A senha do usuário foi alterada.", code="password_changed")
+    # Só o id e is_active vêm carregados (USER_ID_FIELD é a chave primária); os outros campos
+    # são deferidos e lidos do banco no primeiro acesso, só pelas views que precisam deles.
+    return User.from_db(DEFAULT_DB_ALIAS, ['id', 'is_active'], [user_id, ativo])
+
+
+def usuario_do_token(validated_token):
+    user_id = _id_do_token(validated_token)
+    dados = cache_usuarios.obter(user_id)
+    if dados is None:
+        dados = _dados_autenticacao(_consulta_autenticacao(user_id).first())
+        if dados is not None:
+            cache_usuarios.guardar(user_id, dados)
+    return _usuario_validado(validated_token, user_id, dados)
+
+
+async def ausuario_do_token(validated_token):
+    user_id = _id_do_token(validated_token)
+    dados = cache_usuarios.obter(user_id)
+    if dados is None:
+        dados = _dados_autenticacao(await _consulta_autenticacao(user_id).afirst())
+        if dados is not None:
+            cache_usuarios.guardar(user_id, dados)
+    return _usuario_validado(validated_token, user_id, dados)
+
+
+class JWTAutenticacaoCache(JWTAuthentication):
+    """JWTAuthentication que resolve o usuário pelo CacheUsuarios em vez de um SELECT por requisição."""
+
+    def get_user(self, validated_token):
+        return usuario_do_token(validated_token)
+
+
+def token_validado(request):
+    # Validar o JWT não toca no banco; o resultado fica guardado na requisição para
+    # ser reaproveitado pelo limitador de taxa e pela autenticação da view.
+    if not hasattr(request, "_token_jwt"):
+        token = None
+        try:
+            header = jwt_authentication.get_header(request)
+            raw_token = jwt_authentication.get_raw_token(header) if header else None
+            if raw_token is not None:
+                token = jwt_authentication.get_validated_token(raw_token)
+        except AuthenticationFailed:
+            token = None
+        request._token_jwt = token
+    return request._token_jwt
+
+
+def user_id_do_token(token):
+    return token.payload.get(api_settings.USER_ID_CLAIM)
+
+
+async def autenticar_usuario(request):
+    token = token_validado(request)
+    if token is None:
+        return None
+    try:
+        return await ausuario_do_token(token)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+
+
+def resposta_nao_autenticado():
+    resposta = JsonResponse(
+        {"detail": "As credenciais de autenticação não foram fornecidas."},
+        status=status.HTTP_401_UNAUTHORIZED,
+        json_dumps_params={"ensure_ascii": False}
+    )
+    resposta["WWW-Authenticate"] = jwt_authentication.authenticate_header(None)
+    return resposta
@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+CAMPOS_PERFIL_DIETA = ['idade', 'sexo', 'peso', 'altura', 'objetivo', 'restricoes_alimentares', 'observacao_saude']
+
+
+def normalizar_texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        valor = f"{round(float(valor), 1):g}"
+    return re.sub(r"\s+", " ", str(valor)).strip().casefold()
+
+
+def normalizar_prompt(prompt):
+    # O app manda o prompt como JSON; reserializar com chaves ordenadas ignora ordem e espaçamento.
+    if isinstance(prompt, str):
+        try:
+            prompt = json.loads(prompt)
+        except json.JSONDecodeError:
+            return normalizar_texto(prompt)
+    return normalizar_texto(json.dumps(prompt, sort_keys=True, ensure_ascii=False))
+
+
+def chave_pergunta(prompt):
+    return hashlib.sha256(normalizar_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+def chave_dieta(prompt, user_profile):
+    perfil = user_profile or {}
+    partes = [normalizar_prompt(prompt)] + [normalizar_texto(perfil.get(campo)) for campo in CAMPOS_PERFIL_DIETA]
+    return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+class CacheDietas:
+    def __init__(self, max_itens, ttl):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._em_andamento = {}
+        self.metricas = {"hits": 0, "misses": 0, "coalescidas": 0, "despejos": 0}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(max_itens=settings.DIETA_CACHE_MAX_ITENS, ttl=settings.DIETA_CACHE_TTL)
+
+    def obter(self, chave):
+        item = self._itens.get(chave)
+        if item is None:
+            return None
+        expira_em, valor = item
+        if expira_em <= time.monotonic():
+            del self._itens[chave]
+            self.metricas["despejos"] += 1
+            return None
+        self._itens.move_to_end(chave)
+        return valor
+
+    def guardar(self, chave, valor):
+        self._itens[chave] = (time.monotonic() + self.ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+            self.metricas["despejos"] += 1
+
+    async def obter_ou_gerar(self, chave, gerar, usar_cache=True):
+        # usar_cache=False ignora o valor guardado, mas ainda se junta a uma geração em andamento
+        # (que também é nova) e guarda o resultado para os próximos pedidos.
+        valor = self.obter(chave) if usar_cache else None
+        if valor is not None:
+            self.metricas["hits"] += 1
+            return valor
+
+        # Single-flight: pedidos idênticos simultâneos esperam a mesma chamada ao upstream.
+        futuro = self._em_andamento.get(chave)
+        if futuro is not None:
+            self.metricas["coalescidas"] += 1
+            return await asyncio.shield(futuro)
+
+        self.metricas["misses"] += 1
+        futuro = asyncio.get_running_loop().create_future()
+        futuro.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._em_andamento[chave] = futuro
+        try:
+            valor = await gerar()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                futuro.cancel()
+            else:
+                futuro.set_exception(e)
+            raise
+        else:
+            self.guardar(chave, valor)
+            futuro.set_result(valor)
+            return valor
+        finally:
+            del self._em_andamento[chave]
+
+
+cache_dietas = CacheDietas.from_settings()
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import aclosing
+
+import httpx
+from django.conf import settings
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitoAbertoError(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Circuito do LLM aberto: upstream indisponível.")
+        self.retry_after = retry_after
+
+
+class LimiteConcorrenciaError(Exception):
+    pass
+
+
+def is_retryable_server_error(exception):
+    if isinstance(exception, httpx.HTTPStatusError):
+        is_server_error = 500 <= exception.response.status_code < 600
+        if is_server_error:
+            return True
+
+    if isinstance(exception, (httpx.ReadTimeout, httpx.ConnectError, httpx.RemoteProtocolError)):
+        return True
+
+    return False
+
+
+def politica_retry():
+    return AsyncRetrying(
+        retry=retry_if_exception(is_retryable_server_error),
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        stop=stop_after_attempt(settings.LLM_MAX_TENTATIVAS)
+    )
+
+
+def extrair_texto(dados):
+    return dados["candidates"][0]["content"]["parts"][0]["text"].strip()
+
+
+def extrair_trecho(dados):
+    try:
+        partes = dados["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError):
+        return ""
+    return "".join(parte.get("text", "") for parte in partes)
+
+
+class CircuitBreaker:
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(self, limite_falhas, tempo_reset):
+        self.limite_falhas = limite_falhas
+        self.tempo_reset = tempo_reset
+        self.estado = self.FECHADO
+        self.falhas = 0
+        self.aberto_em = 0.0
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        with self._lock:
+            agora = time.monotonic()
+            if self.estado == self.FECHADO:
+                return
+            # Uma única sonda por janela de reset; se ela não voltar, outra é liberada na próxima janela.
+            restante = self.tempo_reset - (agora - self.aberto_em)
+            if restante > 0:
+                raise CircuitoAbertoError(retry_after=math.ceil(restante))
+            self.estado = self.MEIO_ABERTO
+            self.aberto_em = agora
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self.estado = self.FECHADO
+            self.falhas = 0
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+            if self.estado == self.MEIO_ABERTO or self.falhas >= self.limite_falhas:
+                self.estado = self.ABERTO
+                self.aberto_em = time.monotonic()
+
+
+class ClienteLLM:
+    def __init__(self, url_base, api_key, max_concorrencia, max_keepalive, keepalive_expiry,
+                 espera_slot, circuit_breaker, transport=None):
+        self.url_base = url_base
+        self.api_key = api_key
+        self.max_concorrencia = max_concorrencia
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.espera_slot = espera_slot
+        self.circuit_breaker = circuit_breaker
+        # Transporte do httpx; None usa a rede (os testes passam um httpx.MockTransport)
+        self.transport = transport
+        self._por_loop = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            url_base=settings.LM_API_URL,
+            api_key=settings.GEMINI_API_KEY,
+            max_concorrencia=settings.LLM_MAX_CONCORRENCIA,
+            max_keepalive=settings.LLM_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            espera_slot=settings.LLM_ESPERA_SLOT,
+            circuit_breaker=CircuitBreaker(
+                limite_falhas=settings.LLM_CIRCUIT_FALHAS,
+                tempo_reset=settings.LLM_CIRCUIT_RESET
+            )
+        )
+
+    def url(self, metodo):
+        return f"{self.url_base}:{metodo}"
+
+    @property
+    def headers(self):
+        return {"Content-Type": "application/json", "x-goog-api-key": self.api_key}
+
+    async def _recursos_do_loop(self):
+        # httpx.AsyncClient e asyncio.Semaphore ficam presos ao event loop que os criou.
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            recursos = self._por_loop.get(loop)
+            if recursos is not None:
+                return recursos[:2]
+            for antigo in [l for l in self._por_loop if l.is_closed()]:
+                # Loop fechado sem shutdown_asyncgens(): não há mais onde aguardar o aclose()
+                client = self._por_loop.pop(antigo)[0]
+                if not client.is_closed:
+                    logger.warning("Cliente do LLM descartado sem fechar: o event loop já estava fechado.")
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_concorrencia,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                transport=self.transport
+            )
+            guarda = self._fechar_com_loop(loop, client)
+            recursos = (client, asyncio.Semaphore(self.max_concorrencia), guarda)
+            self._por_loop[loop] = recursos
+        # Registra o gerador no loop; o asyncio.run (e o async_to_sync) o finaliza antes de fechar o loop.
+        await anext(guarda)
+        return recursos[:2]
+
+    async def _fechar_com_loop(self, loop, client):
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._por_loop.get(loop, (None,))[0] is client:
+                    del self._por_loop[loop]
+            await client.aclose()
+
+    async def _adquirir_slot(self, semaforo):
+        try:
+            await asyncio.wait_for(semaforo.acquire(), timeout=self.espera_slot)
+        except asyncio.TimeoutError:
+            raise LimiteConcorrenciaError("Limite de chamadas simultâneas ao LLM atingido.")
+
+    async def _post(self, payload, timeout):
+        client, semaforo = await self._recursos_do_loop()
+        await self._adquirir_slot(semaforo)
+        try:
+            self.circuit_breaker.permitir()
+            try:
+                resposta = await client.post(self.url("generateContent"), json=payload,
+                                             headers=self.headers, timeout=timeout)
+                resposta.raise_for_status()
+            except Exception as e:
+                if is_retryable_server_error(e):
+                    self.circuit_breaker.registrar_falha()
+                else:
+                    self.circuit_breaker.registrar_sucesso()
+                raise
+        finally:
+            semaforo.release()
+
+        self.circuit_breaker.registrar_sucesso()
+        return resposta.json()
+
+    async def _abrir_stream(self, payload, timeout):
+        # O slot de concorrência fica preso à resposta aberta e só é liberado em _ler_stream.
+        client, semaforo = await self._recursos_do_loop()
+        await self._adquirir_slot(semaforo)
+        try:
+            self.circuit_breaker.permitir()
+            requisicao = client.build_request(
+                "POST", self.url("streamGenerateContent"), params={"alt": "sse"},
+                json=payload, headers=self.headers, timeout=timeout
+            )
+            try:
+                resposta = await client.send(requisicao, stream=True)
+            except Exception as e:
+                if is_retryable_server_error(e):
+                    self.circuit_breaker.registrar_falha()
+                raise
+            if resposta.is_error:
+                await resposta.aread()
+                await resposta.aclose()
+                try:
+                    resposta.raise_for_status()
+                except httpx.HTTPStatusError as e:
+                    if is_retryable_server_error(e):
+                        self.circuit_breaker.registrar_falha()
+                    else:
+                        self.circuit_breaker.registrar_sucesso()
+                    raise
+        except BaseException:
+            semaforo.release()
+            raise
+        return resposta, semaforo
+
+    async def _ler_stream(self, resposta, semaforo):
+        try:
+            async for linha in resposta.aiter_lines():
+                if not linha.startswith("data:"):
+                    continue
+                trecho = extrair_trecho(json.loads(linha[5:]))
+                if trecho:
+                    yield trecho
+        except Exception as e:
+            if is_retryable_server_error(e):
+                self.circuit_breaker.registrar_falha()
+            raise
+        else:
+            self.circuit_breaker.registrar_sucesso()
+        finally:
+            await resposta.aclose()
+            semaforo.release()
+
+    def _payload(self, contents, system_instruction, temperatura):
+        if not self.api_key:
+            raise Exception("GEMINI_API_KEY não configurada no settings.py")
+
+        return {
+            "contents": contents,
+            "generationConfig": {"temperature": temperatura},
+            "systemInstruction": {
+                "parts": [{"text": system_instruction}]
+            }
+        }
+
+    async def gerar(self, contents, system_instruction, temperatura, timeout):
+        payload = self._payload(contents, system_instruction, temperatura)
+
+        async for tentativa in politica_retry():
+            with tentativa:
+                return await self._post(payload, timeout)
+
+    async def gerar_stream(self, contents, system_instruction, temperatura, timeout):
+        # Só a abertura do stream é repetida; depois do primeiro byte não há como refazer a resposta.
+        payload = self._payload(contents, system_instruction, temperatura)
+
+        async for tentativa in politica_retry():
+            with tentativa:
+                resposta, semaforo = await self._abrir_stream(payload, timeout)
+
+        async with aclosing(self._ler_stream(resposta, semaforo)) as trechos:
+            async for trecho in trechos:
+                yield trecho
+
+    async def fechar(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            recursos = self._por_loop.pop(loop, None)
+        if recursos:
+            await recursos[0].aclose()
+
+
+_cliente = None
+_cliente_lock = threading.Lock()
+
+
+def get_cliente_llm():
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                _cliente = ClienteLLM.from_settings()
+    return _cliente
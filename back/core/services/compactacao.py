@@ -0,0 +1,82 @@
+from django.conf import settings
+
+from core.services.cliente_llm import extrair_texto, get_cliente_llm
+
+CARACTERES_POR_TOKEN = 4
+TOKENS_POR_MENSAGEM = 4
+
+PROMPT_RESUMO = (
+    "Você resume conversas entre um paciente e um(a) médico(a) de família. "
+    "Escreva um resumo curto, em terceira pessoa, mantendo sintomas, condições de saúde, "
+    "medicamentos, hábitos, objetivos e orientações já dadas. "
+    "Descarte cumprimentos e assuntos sem relevância clínica. "
+    "Responda apenas com o texto do resumo."
+)
+
+
+def estimar_tokens(texto):
+    if not texto:
+        return 0
+    return len(texto) // CARACTERES_POR_TOKEN + 1
+
+
+def tokens_mensagem(mensagem):
+    return estimar_tokens(mensagem["content"]) + TOKENS_POR_MENSAGEM
+
+
+class CompactadorHistorico:
+    def __init__(self, janela_turnos, intervalo_resumo, orcamento_tokens, max_tokens_resumo):
+        self.janela = janela_turnos * 2
+        self.intervalo = intervalo_resumo * 2
+        self.orcamento_tokens = orcamento_tokens
+        self.max_tokens_resumo = max_tokens_resumo
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            janela_turnos=settings.CHAT_JANELA_TURNOS,
+            intervalo_resumo=settings.CHAT_INTERVALO_RESUMO,
+            orcamento_tokens=settings.CHAT_ORCAMENTO_TOKENS,
+            max_tokens_resumo=settings.CHAT_MAX_TOKENS_RESUMO
+        )
+
+    def montar(self, resumo, mensagens, tokens_reservados=0):
+        # Mensagens ainda não resumidas seguem literais; o orçamento corta primeiro as
+        # mais antigas, depois o resumo. A última mensagem (a pergunta) nunca é cortada.
+        orcamento = self.orcamento_tokens - tokens_reservados
+        mensagens = list(mensagens)
+        total = estimar_tokens(resumo) + sum(tokens_mensagem(m) for m in mensagens)
+
+        while total > orcamento and len(mensagens) > 1:
+            total -= tokens_mensagem(mensagens.pop(0))
+            if len(mensagens) > 1 and mensagens[0]["role"] == "assistant":
+                total -= tokens_mensagem(mensagens.pop(0))
+
+        if total > orcamento and resumo:
+            disponivel = max(0, orcamento - (total - estimar_tokens(resumo)))
+            resumo = resumo[-disponivel * CARACTERES_POR_TOKEN:] if disponivel else ""
+
+        return resumo, mensagens
+
+    def mensagens_para_resumir(self, mensagens):
+        excedentes = len(mensagens) - self.janela
+        if excedentes < self.intervalo:
+            return []
+        return mensagens[:excedentes]
+
+    async def resumir(self, resumo_anterior, mensagens):
+        linhas = []
+        if resumo_anterior:
+            linhas.append(f"Resumo anterior:\n{resumo_anterior}\n")
+        linhas.append("Novas mensagens:")
+        for msg in mensagens:
+            autor = "Médico(a)" if msg["role"] == "assistant" else "Paciente"
+            linhas.append(f"{autor}: {msg['content']}")
+
+        contents = [{"role": "user", "parts": [{"text": "\n".join(linhas)}]}]
+        dados = await get_cliente_llm().gerar(contents, PROMPT_RESUMO, temperatura=0.2, timeout=30)
+        resumo = extrair_texto(dados)
+        return resumo[:self.max_tokens_resumo * CARACTERES_POR_TOKEN]
+
+
+compactador = CompactadorHistorico.from_settings()
@@ -0,0 +1,72 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from core.models import Exclusao
+from core.services.sincronizacao import TIPO_POR_MODEL
+
+
+def _validadores(request, user, atual, ultima_exclusao):
+    momentos = [m for m in (atual['ultima'], ultima_exclusao) if m is not None]
+    ultima = max(momentos) if momentos else None
+    chave = f"{user.pk}|{request.get_full_path()}|{ultima.isoformat() if ultima else ''}|{atual['total']}"
+    etag = f'W/"{hashlib.sha1(chave.encode()).hexdigest()[:32]}"'
+    return etag, int(ultima.timestamp()) if ultima else None
+
+
+def versao(request, queryset, user):
+    """(ETag, Last-Modified) do recurso a partir de consultas baratas pelos índices de sync: maior
+    atualizado_em e contagem das linhas (um delete não mexe no máximo) e, quando o model tem
+    tombstone, a última exclusão, para o Last-Modified também avançar em deletes."""
+    atual = queryset.order_by().aggregate(ultima=Max('atualizado_em'), total=Count('pk'))
+    tipo = TIPO_POR_MODEL.get(queryset.model)
+    ultima_exclusao = None
+    if tipo:
+        ultima_exclusao = Exclusao.objects.filter(id_usuario=user, tipo=tipo).aggregate(m=Max('excluido_em'))['m']
+    return _validadores(request, user, atual, ultima_exclusao)
+
+
+async def aversao(request, queryset, user):
+    atual = await queryset.order_by().aaggregate(ultima=Max('atualizado_em'), total=Count('pk'))
+    tipo = TIPO_POR_MODEL.get(queryset.model)
+    ultima_exclusao = None
+    if tipo:
+        ultima_exclusao = (await Exclusao.objects.filter(id_usuario=user, tipo=tipo)
+                           .aaggregate(m=Max('excluido_em')))['m']
+    return _validadores(request, user, atual, ultima_exclusao)
+
+
+def nao_modificado(request, etag, ultima):
+    """HttpResponseNotModified se o cliente já tem esta versão, senão None."""
+    resposta = get_conditional_response(request, etag=etag, last_modified=ultima)
+    return marcar(resposta, etag, ultima) if resposta is not None else None
+
+
+def marcar(resposta, etag, ultima):
+    if resposta.status_code in (200, 304):
+        resposta['ETag'] = etag
+        if ultima is not None:
+            resposta['Last-Modified'] = http_date(ultima)
+        # Resposta por usuário: o app pode guardar, mas precisa revalidar a cada uso
+        resposta['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(resposta, ['Authorization'])
+    return resposta
+
+
+def condicional(consulta):
+    """GET condicional para métodos de APIView: ``consulta(request)`` devolve o queryset que
+    define a versão do recurso. Se o If-None-Match/If-Modified-Since bater, responde 304 sem
+    chamar a view (nem serializar nada)."""
+    def decorator(metodo):
+        @wraps(metodo)
+        def wrapper(view, request, *args, **kwargs):
+            etag, ultima = versao(request, consulta(request), request.user)
+            resposta = nao_modificado(request, etag, ultima)
+            if resposta is not None:
+                return resposta
+            return marcar(metodo(view, request, *args, **kwargs), etag, ultima)
+        return wrapper
+    return decorator
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def tamanho_mensagem(mensagem):
+    return len(mensagem["content"].encode("utf-8"))
+
+
+class Sessao:
+    def __init__(self):
+        self.mensagens = []
+        self.resumo = ""
+        self.inicio = 0
+        self.bytes = 0
+        self.ultimo_acesso = time.monotonic()
+
+
+class ArmazemConversas:
+    def __init__(self, max_sessoes, ttl, max_mensagens, max_bytes_sessao, memoria_total):
+        self.max_sessoes = max_sessoes
+        self.ttl = ttl
+        self.max_mensagens = max_mensagens
+        self.max_bytes_sessao = max_bytes_sessao
+        self.memoria_total = memoria_total
+        self._sessoes = OrderedDict()
+        self._bytes_total = 0
+        self._lock = threading.Lock()
+        self._metricas = {
+            "hits": 0,
+            "misses": 0,
+            "despejos_lru": 0,
+            "despejos_ttl": 0,
+            "mensagens_cortadas": 0,
+        }
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_sessoes=settings.CONVERSA_MAX_SESSOES,
+            ttl=settings.CONVERSA_TTL,
+            max_mensagens=settings.CONVERSA_MAX_MENSAGENS,
+            max_bytes_sessao=settings.CONVERSA_MAX_BYTES_SESSAO,
+            memoria_total=settings.CONVERSA_MEMORIA_TOTAL
+        )
+
+    def obter(self, user_id, sessao_id):
+        with self._lock:
+            agora = time.monotonic()
+            self._expirar(agora)
+            chave = (user_id, str(sessao_id))
+            sessao = self._sessoes.get(chave)
+            if sessao is None:
+                self._metricas["misses"] += 1
+                return "", [], 0
+            self._metricas["hits"] += 1
+            sessao.ultimo_acesso = agora
+            self._sessoes.move_to_end(chave)
+            return sessao.resumo, list(sessao.mensagens), sessao.inicio
+
+    def adicionar(self, user_id, sessao_id, *mensagens):
+        with self._lock:
+            agora = time.monotonic()
+            self._expirar(agora)
+            chave = (user_id, str(sessao_id))
+            sessao = self._sessoes.get(chave)
+            if sessao is None:
+                sessao = self._sessoes[chave] = Sessao()
+            else:
+                self._sessoes.move_to_end(chave)
+            sessao.ultimo_acesso = agora
+
+            for mensagem in mensagens:
+                tamanho = tamanho_mensagem(mensagem)
+                sessao.mensagens.append(mensagem)
+                sessao.bytes += tamanho
+                self._bytes_total += tamanho
+
+            while sessao.mensagens and (
+                len(sessao.mensagens) > self.max_mensagens or sessao.bytes > self.max_bytes_sessao
+            ):
+                self._descartar_primeira(sessao)
+                self._metricas["mensagens_cortadas"] += 1
+
+            while len(self._sessoes) > self.max_sessoes or (
+                self._bytes_total > self.memoria_total and len(self._sessoes) > 1
+            ):
+                self._remover_mais_antiga("despejos_lru")
+
+    def aplicar_resumo(self, user_id, sessao_id, resumo, ate):
+        # "ate" é a posição absoluta da primeira mensagem que não entrou no resumo;
+        # usar posição absoluta evita cortar mensagens a mais se a sessão mudou no meio.
+        with self._lock:
+            sessao = self._sessoes.get((user_id, str(sessao_id)))
+            if sessao is None or ate <= sessao.inicio:
+                return
+            while sessao.mensagens and sessao.inicio < ate:
+                self._descartar_primeira(sessao)
+            tamanho = len(resumo.encode("utf-8")) - len(sessao.resumo.encode("utf-8"))
+            sessao.resumo = resumo
+            sessao.bytes += tamanho
+            self._bytes_total += tamanho
+
+    def remover(self, user_id, sessao_id):
+        with self._lock:
+            sessao = self._sessoes.pop((user_id, str(sessao_id)), None)
+            if sessao is not None:
+                self._bytes_total -= sessao.bytes
+
+    def metricas(self):
+        with self._lock:
+            return {
+                **self._metricas,
+                "sessoes": len(self._sessoes),
+                "bytes": self._bytes_total,
+            }
+
+    def _descartar_primeira(self, sessao):
+        tamanho = tamanho_mensagem(sessao.mensagens.pop(0))
+        sessao.inicio += 1
+        sessao.bytes -= tamanho
+        self._bytes_total -= tamanho
+
+    def _remover_mais_antiga(self, motivo):
+        _, sessao = self._sessoes.popitem(last=False)
+        self._bytes_total -= sessao.bytes
+        self._metricas[motivo] += 1
+
+    def _expirar(self, agora):
+        # O OrderedDict está em ordem de acesso, então as sessões ociosas ficam no início.
+        while self._sessoes:
+            sessao = next(iter(self._sessoes.values()))
+            if agora - sessao.ultimo_acesso < self.ttl:
+                break
+            self._remover_mais_antiga("despejos_ttl")
+
+
+conversas = ArmazemConversas.from_settings()
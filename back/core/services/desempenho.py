@@ -0,0 +1,155 @@
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Sum, Value, When
+from django.db.models.functions import ExtractMonth
+from django.utils import timezone
+
+from core.models import DesempenhoDiario, PontuacaoCompromisso
+
+# (limite exclusivo, emoji), em ordem crescente; acima do último limite vale EMOJI_MAXIMO.
+# Fonte única das faixas para o cálculo em Python e para o Case do banco.
+FAIXAS_EMOJI = ((33, '🧊'), (66, '😐'))
+EMOJI_MAXIMO = '🔥'
+
+
+def contribuicao(porcentagem, qtd_total_atv):
+    """(soma, quantidade) com que uma pontuação entra no dia; compromisso sem atividades não conta."""
+    if not qtd_total_atv:
+        return 0, 0
+    return porcentagem, 1
+
+
+def aplicar_diferenca(user_id, data, anterior, atual):
+    aplicar_delta(user_id, data, atual[0] - anterior[0], atual[1] - anterior[1])
+
+
+def aplicar_delta(user_id, data, delta_soma, delta_qtd):
+    """Soma a contribuição de uma pontuação ao rollup do dia, sem reler as pontuações do dia."""
+    if not delta_soma and not delta_qtd:
+        return
+
+    dia = DesempenhoDiario.objects.filter(id_usuario_id=user_id, data=data)
+    incremento = {
+        'soma_porcentagem': F('soma_porcentagem') + delta_soma,
+        'qtd_compromissos': F('qtd_compromissos') + delta_qtd,
+        'atualizado_em': timezone.now(),
+    }
+    if dia.update(**incremento):
+        if delta_qtd < 0:
+            dia.filter(qtd_compromissos=0).delete()
+        return
+
+    try:
+        with transaction.atomic():
+            DesempenhoDiario.objects.create(
+                id_usuario_id=user_id, data=data, soma_porcentagem=delta_soma, qtd_compromissos=delta_qtd
+            )
+    except IntegrityError:
+        # Outra requisição criou o dia no meio tempo
+        dia.update(**incremento)
+
+
+def recalcular_desempenho(user_id=None):
+    """Reconstrói o rollup a partir das pontuações; usado no backfill e para corrigir divergências."""
+    pontuacoes = PontuacaoCompromisso.objects.filter(qtd_total_atv__gt=0)
+    existentes = DesempenhoDiario.objects.all()
+    if user_id is not None:
+        pontuacoes = pontuacoes.filter(compromisso__id_usuario_id=user_id)
+        existentes = existentes.filter(id_usuario_id=user_id)
+
+    dias = (
+        pontuacoes
+        .values('compromisso__id_usuario_id', 'compromisso__data')
+        .annotate(soma=Sum('porcentagem'), qtd=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        existentes.delete()
+        DesempenhoDiario.objects.bulk_create([
+            DesempenhoDiario(
+                id_usuario_id=dia['compromisso__id_usuario_id'], data=dia['compromisso__data'],
+                soma_porcentagem=dia['soma'], qtd_compromissos=dia['qtd']
+            )
+            for dia in dias
+        ], batch_size=1000)
+
+
+def porcentagem_com_emoji(queryset):
+    porcentagem = ExpressionWrapper(F('soma_porcentagem') / F('qtd_compromissos'), output_field=FloatField())
+    return queryset.annotate(
+        porcentagem_dia=porcentagem,
+        emoji=Case(
+            *[When(porcentagem_dia__lt=limite, then=Value(emoji)) for limite, emoji in FAIXAS_EMOJI],
+            default=Value(EMOJI_MAXIMO),
+        ),
+    )
+
+
+def desempenho_por_dia(user, inicio, fim):
+    dias = DesempenhoDiario.objects.filter(id_usuario=user, data__gte=inicio, data__lt=fim).order_by('data')
+    return [
+        {'data': d['data'].strftime('%Y-%m-%d'), 'emoji': d['emoji'], 'porcentagem': d['porcentagem_dia']}
+        for d in porcentagem_com_emoji(dias).values('data', 'emoji', 'porcentagem_dia')
+    ]
+
+
+def limites_do_mes(ano, mes):
+    return date(ano, mes, 1), date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+
+
+def emoji_da_porcentagem(porcentagem):
+    for limite, emoji in FAIXAS_EMOJI:
+        if porcentagem < limite:
+            return emoji
+    return EMOJI_MAXIMO
+
+
+def pontuacoes_do_mes(user, ano, mes):
+    """Formato original de pontuacoes/mensal/: uma entrada por compromisso pontuado.
+
+    Lê PontuacaoCompromisso porque o rollup só guarda a soma por dia, sem a linha de cada
+    compromisso; o resumo por dia (pontuacoes/mensal/dias/) vem de DesempenhoDiario. Filtra por intervalo de datas (e não por __year/__month) para o banco usar o índice
+    do histórico de compromissos.
+    """
+    inicio, fim = limites_do_mes(ano, mes)
+    pontuacoes = PontuacaoCompromisso.objects.filter(
+        compromisso__id_usuario=user, compromisso__data__gte=inicio, compromisso__data__lt=fim
+    ).values('compromisso__data', 'porcentagem')
+    return [
+        {
+            'data': p['compromisso__data'].strftime('%Y-%m-%d'),
+            'emoji': emoji_da_porcentagem(p['porcentagem']),
+            'porcentagem': p['porcentagem'],
+        }
+        for p in pontuacoes
+    ]
+
+
+def desempenho_mensal(user, ano, mes):
+    return desempenho_por_dia(user, *limites_do_mes(ano, mes))
+
+
+def desempenho_anual(user, ano):
+    inicio, fim = date(ano, 1, 1), date(ano + 1, 1, 1)
+    meses = (
+        DesempenhoDiario.objects
+        .filter(id_usuario=user, data__gte=inicio, data__lt=fim)
+        .annotate(mes=ExtractMonth('data'))
+        .values('mes')
+        .annotate(soma=Sum('soma_porcentagem'), compromissos=Sum('qtd_compromissos'), dias=Count('id'))
+        .order_by('mes')
+    )
+    return {
+        'ano': ano,
+        'dias': desempenho_por_dia(user, inicio, fim),
+        'meses': [
+            {
+                'mes': m['mes'],
+                'porcentagem': m['soma'] / m['compromissos'],
+                'dias_com_compromissos': m['dias'],
+                'compromissos': m['compromissos'],
+            }
+            for m in meses
+        ],
+    }
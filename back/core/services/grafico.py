@@ -0,0 +1,71 @@
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from core.models import RegistroCorporal
+
+AGRUPAMENTOS = {
+    'dia': TruncDay,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+
+def lttb(pontos, limite, chave_y):
+    """Largest-Triangle-Three-Buckets: reduz a série a ``limite`` pontos mantendo picos e vales.
+
+    ``pontos`` já vem ordenado por data; o eixo x é o ordinal da data. Implementação em Python
+    puro, sem numpy, já que a série chega agregada do banco e raramente passa de alguns milhares.
+    """
+    total = len(pontos)
+    if limite >= total or limite < 3:
+        return pontos
+
+    xs = [p['data'].toordinal() for p in pontos]
+    ys = [p[chave_y] for p in pontos]
+    selecionados = [pontos[0]]
+    tamanho = (total - 2) / (limite - 2)
+    anterior = 0
+
+    for i in range(limite - 2):
+        inicio = int(i * tamanho) + 1
+        fim = int((i + 1) * tamanho) + 1
+
+        # Média do próximo balde, usada como terceiro vértice do triângulo
+        prox_inicio, prox_fim = fim, min(int((i + 2) * tamanho) + 1, total)
+        if i == limite - 3:
+            prox_inicio, prox_fim = total - 1, total
+        media_x = sum(xs[prox_inicio:prox_fim]) / (prox_fim - prox_inicio)
+        media_y = sum(ys[prox_inicio:prox_fim]) / (prox_fim - prox_inicio)
+
+        ax, ay = xs[anterior], ys[anterior]
+        melhor, maior_area = inicio, -1.0
+        for j in range(inicio, fim):
+            area = abs((ax - media_x) * (ys[j] - ay) - (ax - xs[j]) * (media_y - ay))
+            if area > maior_area:
+                melhor, maior_area = j, area
+        selecionados.append(pontos[melhor])
+        anterior = melhor
+
+    selecionados.append(pontos[-1])
+    return selecionados
+
+
+def serie_imc(user, agrupamento, max_pontos, inicio=None, fim=None):
+    registros = RegistroCorporal.objects.filter(id_usuario=user, imc_res__isnull=False)
+    if inicio:
+        registros = registros.filter(data_consulta__gte=inicio)
+    if fim:
+        registros = registros.filter(data_consulta__lte=fim)
+
+    baldes = (
+        registros
+        .annotate(data=AGRUPAMENTOS[agrupamento]('data_consulta'))
+        .values('data')
+        .annotate(imc_min=Min('imc_res'), imc_medio=Avg('imc_res'), imc_max=Max('imc_res'), registros=Count('id'))
+        .order_by('data')
+    )
+    pontos = lttb(list(baldes), max_pontos, 'imc_medio')
+    for ponto in pontos:
+        for chave in ('imc_min', 'imc_medio', 'imc_max'):
+            ponto[chave] = round(ponto[chave], 2)
+    return pontos
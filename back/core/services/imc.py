@@ -0,0 +1,13 @@
+def classificar_imc(imc_valor):
+    if imc_valor < 18.5:
+        return "Abaixo do peso"
+    elif imc_valor < 25:
+        return "Peso normal"
+    elif imc_valor < 30:
+        return "Sobrepeso"
+    return "Obesidade"
+
+
+def calcular_imc(peso, altura):
+    imc_valor = peso / (altura ** 2)
+    return imc_valor, classificar_imc(imc_valor)
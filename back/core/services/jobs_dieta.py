@@ -0,0 +1,98 @@
+import json
+from datetime import timedelta
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from tenacity import RetryError
+
+from core.models import Dieta, JobDieta
+from core.services.api_ia import gerar_dieta_gemini, interpretar_resposta_dieta
+from core.services.cache_dieta import cache_dietas, chave_dieta
+from core.services.cliente_llm import CircuitoAbertoError, LimiteConcorrenciaError
+from core.services.contexto_ia import obter_contexto_ia
+
+
+def reservar_jobs(limite):
+    agora = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            JobDieta.objects.select_for_update(skip_locked=True)
+            .filter(Q(disponivel_em__isnull=True) | Q(disponivel_em__lte=agora), status=JobDieta.PENDENTE)
+            .order_by('criado_em')
+            .values_list('id', flat=True)[:limite]
+        )
+        if ids:
+            JobDieta.objects.filter(id__in=ids).update(
+                status=JobDieta.PROCESSANDO,
+                iniciado_em=agora,
+                tentativas=F('tentativas') + 1
+            )
+    return list(JobDieta.objects.filter(id__in=ids).order_by('criado_em'))
+
+
+def recuperar_jobs_travados():
+    # Jobs de um worker que morreu no meio do processamento voltam para a fila.
+    limite = timezone.now() - timedelta(seconds=settings.DIETA_JOB_TIMEOUT)
+    travados = JobDieta.objects.filter(status=JobDieta.PROCESSANDO, iniciado_em__lt=limite)
+    travados.filter(tentativas__gte=settings.DIETA_JOB_MAX_TENTATIVAS).update(
+        status=JobDieta.ERRO, erro="Tempo limite de processamento excedido.", finalizado_em=timezone.now()
+    )
+    travados.update(status=JobDieta.PENDENTE)
+
+
+def concluir_job(job, dieta_data):
+    with transaction.atomic():
+        job.dieta = Dieta.objects.create(id_usuario_id=job.id_usuario_id, plano_alimentar=dieta_data)
+        job.status = JobDieta.CONCLUIDO
+        job.erro = None
+        job.finalizado_em = timezone.now()
+        job.save(update_fields=['dieta', 'status', 'erro', 'finalizado_em'])
+
+
+def backoff(tentativas):
+    return min(settings.DIETA_JOB_BACKOFF_MAX, settings.DIETA_JOB_BACKOFF_BASE * 2 ** (tentativas - 1))
+
+
+def falhar_job(job, erro, temporario=False, retry_after=None):
+    # Falha temporária volta para a fila, mas só depois do backoff (ou do retry_after do circuito,
+    # se for maior): sem a espera o worker gastaria todas as tentativas em milissegundos.
+    if temporario and job.tentativas < settings.DIETA_JOB_MAX_TENTATIVAS:
+        job.status = JobDieta.PENDENTE
+        espera = max(retry_after or 0, backoff(job.tentativas))
+        job.disponivel_em = timezone.now() + timedelta(seconds=espera)
+    else:
+        job.status = JobDieta.ERRO
+        job.finalizado_em = timezone.now()
+    job.erro = erro
+    job.save(update_fields=['status', 'erro', 'finalizado_em', 'disponivel_em'])
+
+
+async def processar_job(job):
+    async def gerar():
+        resposta_string_json = await gerar_dieta_gemini(job.pergunta, contexto["contexto_dieta"])
+        return interpretar_resposta_dieta(resposta_string_json)
+
+    try:
+        # O worker é outro processo: a invalidação do snapshot pode não chegar até ele, e a dieta
+        # precisa das restrições que o usuário acabou de salvar.
+        contexto = await obter_contexto_ia(job.id_usuario_id, usar_cache=False)
+        dieta_data = await cache_dietas.obter_ou_gerar(
+            chave_dieta(job.pergunta, contexto["perfil"]), gerar, usar_cache=not job.force_new
+        )
+    except json.JSONDecodeError:
+        await sync_to_async(falhar_job)(job, "JSON inválido.")
+    except CircuitoAbertoError as e:
+        await sync_to_async(falhar_job)(job, "IA sobrecarregada. Tente novamente.", temporario=True,
+                                        retry_after=e.retry_after)
+    except (RetryError, LimiteConcorrenciaError):
+        await sync_to_async(falhar_job)(job, "IA sobrecarregada. Tente novamente.", temporario=True)
+    except httpx.HTTPStatusError as e:
+        await sync_to_async(falhar_job)(job, f"Erro da API: {e.response.status_code}")
+    except Exception:
+        await sync_to_async(falhar_job)(job, "Erro interno.")
+    else:
+        await sync_to_async(concluir_job)(job, dieta_data)
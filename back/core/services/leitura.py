@@ -0,0 +1,90 @@
+from functools import lru_cache
+
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Campos cujo valor vindo do banco já é o que o serializer devolveria
+CAMPOS_DIRETOS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.JSONField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _conversor_data_hora(campo):
+    # Mesmo resultado do DateTimeField.to_representation em ISO 8601, mas com o fuso
+    # resolvido uma vez por lista em vez de uma vez por linha.
+    fuso = campo.timezone if hasattr(campo, 'timezone') else campo.default_timezone()
+    if fuso is None:
+        return campo.to_representation
+
+    def converter(valor):
+        if not timezone.is_aware(valor):
+            return campo.to_representation(valor)
+        texto = valor.astimezone(fuso).isoformat()
+        return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+    return converter
+
+
+def fabrica_conversor(campo):
+    """Função chamada a cada leitura que devolve o conversor do campo, ou None se o valor vai direto."""
+    if isinstance(campo, CAMPOS_DIRETOS):
+        return None
+    if isinstance(campo, serializers.DateTimeField) \
+            and str(getattr(campo, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601:
+        return lambda: _conversor_data_hora(campo)
+    if isinstance(campo, serializers.DateField) \
+            and str(getattr(campo, 'format', api_settings.DATE_FORMAT)).lower() == ISO_8601:
+        return lambda: lambda valor: valor.isoformat()
+    if isinstance(campo, serializers.UUIDField) and campo.uuid_format == 'hex_verbose':
+        return lambda: str
+    return lambda: campo.to_representation
+
+
+class LeitorValores:
+    """Monta a saída de um ModelSerializer a partir de ``.values()``, sem instanciar models.
+
+    Só vale para serializers "planos": campos com source simples (renomeados ou não), sem
+    SerializerMethodField, serializers aninhados ou to_representation sobrescrito. Campos de
+    data e UUID são convertidos reproduzindo o to_representation do próprio campo, para que o
+    formato seja idêntico ao do caminho normal.
+    """
+
+    def __init__(self, serializer_class):
+        if serializer_class.to_representation is not serializers.ModelSerializer.to_representation:
+            raise TypeError(f"{serializer_class.__name__} sobrescreve to_representation.")
+
+        self.campos = []
+        for nome, campo in serializer_class().fields.items():
+            if campo.write_only:
+                continue
+            if isinstance(campo, (serializers.SerializerMethodField, serializers.BaseSerializer)) \
+                    or '.' in campo.source or campo.source == '*':
+                raise TypeError(f"{serializer_class.__name__}.{nome} não pode ser lido com values().")
+            self.campos.append((nome, campo.source, fabrica_conversor(campo)))
+
+    def colunas(self, extras=()):
+        return list(dict.fromkeys([source for _, source, _ in self.campos] + list(extras)))
+
+    def representar(self, linhas):
+        campos = [(nome, source, fabrica and fabrica()) for nome, source, fabrica in self.campos]
+        return [
+            {
+                nome: conversor(linha[source]) if conversor and linha[source] is not None else linha[source]
+                for nome, source, conversor in campos
+            }
+            for linha in linhas
+        ]
+
+
+@lru_cache(maxsize=None)
+def leitor_para(serializer_class):
+    """LeitorValores do serializer, ou None se ele precisar do caminho normal."""
+    try:
+        return LeitorValores(serializer_class)
+    except TypeError:
+        return None
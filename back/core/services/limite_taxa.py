@@ -0,0 +1,157 @@
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from rest_framework import status
+
+from core.services.autenticacao import token_validado, user_id_do_token
+
+
+class BackendMemoria:
+    # Os métodos são async para ter a mesma interface do BackendCache; aqui nada bloqueia.
+    def __init__(self):
+        self._baldes = {}
+        self._em_voo = {}
+        self._lock = threading.Lock()
+
+    async def consumir(self, chave, capacidade, por_segundo):
+        with self._lock:
+            agora = time.monotonic()
+            tokens, atualizado_em = self._baldes.get(chave, (capacidade, agora))
+            tokens = min(capacidade, tokens + (agora - atualizado_em) * por_segundo)
+            if tokens < 1:
+                self._baldes[chave] = (tokens, agora)
+                return False, (1 - tokens) / por_segundo
+            self._baldes[chave] = (tokens - 1, agora)
+            return True, 0
+
+    async def entrar(self, chave, limite):
+        with self._lock:
+            atual = self._em_voo.get(chave, 0)
+            if atual >= limite:
+                return False
+            self._em_voo[chave] = atual + 1
+            return True
+
+    async def sair(self, chave):
+        with self._lock:
+            self._em_voo[chave] = max(0, self._em_voo.get(chave, 0) - 1)
+
+
+class BackendCache:
+    # Compartilhado entre pods quando CACHES aponta para Redis/Memcached. Usa a API async
+    # do cache para não travar o event loop com I/O de rede. O balde usa get/set (pode
+    # deixar passar uma requisição a mais sob corrida); o contador em voo usa incr/decr
+    # atômicos e expira sozinho se um processo morrer sem decrementar.
+    TTL_EM_VOO = 5 * 60
+
+    async def consumir(self, chave, capacidade, por_segundo):
+        chave = f"limite_taxa:balde:{chave}"
+        agora = time.time()
+        tokens, atualizado_em = await cache.aget(chave, (capacidade, agora))
+        tokens = min(capacidade, tokens + max(0, agora - atualizado_em) * por_segundo)
+        ttl = int(capacidade / por_segundo) + 1
+        if tokens < 1:
+            await cache.aset(chave, (tokens, agora), ttl)
+            return False, (1 - tokens) / por_segundo
+        await cache.aset(chave, (tokens - 1, agora), ttl)
+        return True, 0
+
+    async def entrar(self, chave, limite):
+        chave = f"limite_taxa:em_voo:{chave}"
+        await cache.aadd(chave, 0, self.TTL_EM_VOO)
+        try:
+            atual = await cache.aincr(chave)
+        except ValueError:
+            await cache.aset(chave, 1, self.TTL_EM_VOO)
+            atual = 1
+        else:
+            # O incr não renova o TTL: sem isto a chave expiraria sob carga contínua, o
+            # contador recomeçaria do zero e os decr seguintes o deixariam negativo.
+            await cache.atouch(chave, self.TTL_EM_VOO)
+        if atual > limite:
+            await self.sair_chave(chave)
+            return False
+        return True
+
+    async def sair(self, chave):
+        await self.sair_chave(f"limite_taxa:em_voo:{chave}")
+
+    async def sair_chave(self, chave):
+        try:
+            await cache.adecr(chave)
+        except ValueError:
+            pass
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.LIMITE_TAXA_BACKEND)()
+    return _backend
+
+
+def resposta_recusada(mensagem, status_code, espera):
+    resposta = JsonResponse({"erro": mensagem}, status=status_code, json_dumps_params={"ensure_ascii": False})
+    resposta["Retry-After"] = str(max(1, int(espera + 0.999)))
+    return resposta
+
+
+def limitar_taxa(endpoint, metodos=('POST',)):
+    # Roda antes da autenticação completa: o usuário sai do claim do JWT já validado,
+    # sem consulta ao banco, e a requisição é recusada antes de qualquer trabalho.
+    def decorator(view):
+        @wraps(view)
+        async def _view(request, *args, **kwargs):
+            if request.method not in metodos:
+                return await view(request, *args, **kwargs)
+
+            backend = get_backend()
+            token = token_validado(request)
+            config = settings.LIMITE_TAXA_ENDPOINTS.get(endpoint)
+            if token is not None and config:
+                permitido, espera = await backend.consumir(
+                    f"{endpoint}:{user_id_do_token(token)}",
+                    config["capacidade"], config["por_minuto"] / 60
+                )
+                if not permitido:
+                    return resposta_recusada(
+                        "Muitas requisições. Aguarde um pouco antes de tentar novamente.",
+                        status.HTTP_429_TOO_MANY_REQUESTS, espera
+                    )
+
+            if not await backend.entrar("global", settings.LIMITE_TAXA_MAX_EM_VOO):
+                return resposta_recusada(
+                    "Servidor sobrecarregado. Tente novamente em instantes.",
+                    status.HTTP_503_SERVICE_UNAVAILABLE, settings.LIMITE_TAXA_RETRY_AFTER_GLOBAL
+                )
+
+            liberar = True
+            try:
+                resposta = await view(request, *args, **kwargs)
+                if resposta.streaming:
+                    # Respostas em stream só liberam a vaga quando o stream termina.
+                    resposta.streaming_content = liberar_ao_fim(resposta.streaming_content, backend)
+                    liberar = False
+                return resposta
+            finally:
+                if liberar:
+                    await backend.sair("global")
+
+        return _view
+    return decorator
+
+
+async def liberar_ao_fim(conteudo, backend):
+    try:
+        async for parte in conteudo:
+            yield parte
+    finally:
+        await backend.sair("global")
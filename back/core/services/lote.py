@@ -0,0 +1,86 @@
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+CRIADO = 'criado'
+DUPLICADO = 'duplicado'
+INVALIDO = 'invalido'
+CONFLITO = 'conflito'
+
+
+class LoteInvalidoError(Exception):
+    pass
+
+
+def ler_client_id(item):
+    try:
+        return uuid.UUID(str(item['client_id']))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def gravar_lote(request, itens, model, serializer_class, preparar=None):
+    """Valida e grava uma lista de registros feitos offline com um único INSERT.
+
+    Cada item precisa de um ``client_id`` (UUID gerado no app). Itens cujo client_id já existe
+    para o usuário voltam como ``duplicado`` com o id original, então reenviar o mesmo lote
+    depois de uma falha de rede não cria nada em dobro. ``preparar`` recebe os validated_data
+    de todos os itens válidos de uma vez, para cálculos derivados como o IMC.
+    """
+    if not isinstance(itens, list):
+        raise LoteInvalidoError("Envie uma lista de itens.")
+    if len(itens) > settings.LOTE_MAX_ITENS:
+        raise LoteInvalidoError(f"Máximo de {settings.LOTE_MAX_ITENS} itens por lote.")
+
+    user = request.user
+    resultados = [None] * len(itens)
+    validos = {}
+
+    for indice, item in enumerate(itens):
+        client_id = ler_client_id(item) if isinstance(item, dict) else None
+        if client_id is None:
+            resultados[indice] = {'status': INVALIDO, 'erros': {'client_id': ["UUID obrigatório."]}}
+            continue
+        if client_id in validos:
+            resultados[indice] = {'status': DUPLICADO, 'client_id': str(client_id)}
+            continue
+        serializer = serializer_class(data=item, context={'request': request})
+        if not serializer.is_valid():
+            resultados[indice] = {'status': INVALIDO, 'client_id': str(client_id), 'erros': serializer.errors}
+            continue
+        validos[client_id] = (indice, serializer.validated_data)
+
+    existentes = dict(
+        model.objects.filter(id_usuario=user, client_id__in=validos).values_list('client_id', 'id')
+    )
+    novos = {cid: dados for cid, dados in validos.items() if cid not in existentes}
+
+    if preparar and novos:
+        preparar([dados for _, dados in novos.values()])
+
+    # ignore_conflicts cobre reenvios concorrentes do mesmo lote; o que não entrar por
+    # outra constraint (ex.: compromisso no mesmo horário) volta como conflito.
+    with transaction.atomic():
+        model.objects.bulk_create(
+            [model(id_usuario=user, client_id=cid, **dados) for cid, (_, dados) in novos.items()],
+            ignore_conflicts=True
+        )
+        gravados = dict(
+            model.objects.filter(id_usuario=user, client_id__in=novos).values_list('client_id', 'id')
+        )
+
+    for client_id, (indice, _) in validos.items():
+        if client_id in existentes:
+            resultados[indice] = {'status': DUPLICADO, 'client_id': str(client_id), 'id': existentes[client_id]}
+        elif client_id in gravados:
+            resultados[indice] = {'status': CRIADO, 'client_id': str(client_id), 'id': gravados[client_id]}
+        else:
+            resultados[indice] = {'status': CONFLITO, 'client_id': str(client_id)}
+
+    for resultado in resultados:
+        if resultado['status'] == DUPLICADO and 'id' not in resultado:
+            cid = uuid.UUID(resultado['client_id'])
+            resultado['id'] = existentes.get(cid, gravados.get(cid))
+
+    return resultados
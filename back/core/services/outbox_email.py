@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import EmailOutbox
+from core.welcome_email_html.welcome import montar_email_boas_vindas
+
+MONTADORES = {
+    EmailOutbox.BOAS_VINDAS: montar_email_boas_vindas,
+}
+
+
+def reservar_emails(limite):
+    # A reserva empurra proxima_tentativa para frente: se o worker morrer no meio do
+    # lote, os e-mails voltam a ficar elegíveis sozinhos depois do prazo.
+    agora = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .select_related('id_usuario')
+            .filter(status=EmailOutbox.PENDENTE, proxima_tentativa__lte=agora)
+            .order_by('proxima_tentativa')[:limite]
+        )
+        if emails:
+            EmailOutbox.objects.filter(id__in=[e.id for e in emails]).update(
+                proxima_tentativa=agora + timedelta(seconds=settings.EMAIL_OUTBOX_RESERVA)
+            )
+    return emails
+
+
+def backoff(tentativas):
+    return min(settings.EMAIL_OUTBOX_BACKOFF_MAX, settings.EMAIL_OUTBOX_BACKOFF_BASE * 2 ** (tentativas - 1))
+
+
+def enviar_lote(emails):
+    enviados = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            registrar_falha(email, e)
+        return enviados
+
+    try:
+        for email in emails:
+            mensagem = MONTADORES[email.tipo](email.id_usuario.username, email.destinatario, connection=connection)
+            try:
+                mensagem.send()
+            except Exception as e:
+                registrar_falha(email, e)
+            else:
+                email.status = EmailOutbox.ENVIADO
+                email.enviado_em = timezone.now()
+                email.tentativas += 1
+                email.erro = None
+                email.save(update_fields=['status', 'enviado_em', 'tentativas', 'erro'])
+                enviados += 1
+    finally:
+        connection.close()
+    return enviados
+
+
+def registrar_falha(email, erro):
+    email.tentativas += 1
+    email.erro = str(erro)
+    if email.tentativas >= settings.EMAIL_OUTBOX_MAX_TENTATIVAS:
+        email.status = EmailOutbox.ERRO
+    else:
+        email.proxima_tentativa = timezone.now() + timedelta(seconds=backoff(email.tentativas))
+    email.save(update_fields=['status', 'tentativas', 'erro', 'proxima_tentativa'])
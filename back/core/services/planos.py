@@ -0,0 +1,44 @@
+import hashlib
+import json
+import zlib
+
+
+def serializar_plano(plano):
+    """JSON canônico do plano: a mesma dieta sempre gera os mesmos bytes (e o mesmo hash)."""
+    return json.dumps(plano, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def endereco_plano(bruto):
+    return hashlib.sha256(bruto).hexdigest()
+
+
+def comprimir_plano(bruto):
+    return zlib.compress(bruto, 6)
+
+
+def descomprimir_plano(conteudo):
+    return json.loads(zlib.decompress(conteudo))
+
+
+def _inteiro(valor):
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return 0
+
+
+def resumir_plano(plano):
+    """Resumo mostrado no histórico, extraído uma vez ao salvar.
+
+    O plano vem do LLM no formato {"plano_diario": [{"dia", "resumo_kcal", "macros", "refeicoes"}]},
+    mas nada garante que ele respeite isso; o que não for reconhecido conta como zero.
+    """
+    dias = plano.get('plano_diario') if isinstance(plano, dict) else None
+    if not isinstance(dias, list):
+        dias = []
+    dias = [dia for dia in dias if isinstance(dia, dict)]
+    return {
+        'calorias_totais': sum(_inteiro(dia.get('resumo_kcal')) for dia in dias),
+        'qtd_refeicoes': sum(len(dia['refeicoes']) for dia in dias if isinstance(dia.get('refeicoes'), list)),
+        'qtd_dias': len(dias),
+    }
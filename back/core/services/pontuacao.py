@@ -0,0 +1,125 @@
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Q, Value, When
+from django.utils import timezone
+
+from core.models import Compromisso, PontuacaoCompromisso
+from core.services.desempenho import aplicar_diferenca, contribuicao
+
+# Compromissos no meio de um delete em cascata: as atividades somem junto e a pontuação
+# também, então não há o que manter (e recriar a pontuação quebraria a FK).
+_compromissos_em_exclusao = ContextVar('compromissos_em_exclusao', default=frozenset())
+
+
+def marcar_exclusao(compromisso_id):
+    _compromissos_em_exclusao.set(_compromissos_em_exclusao.get() | {compromisso_id})
+
+
+def desmarcar_exclusao(compromisso_id):
+    _compromissos_em_exclusao.set(_compromissos_em_exclusao.get() - {compromisso_id})
+
+
+def calcular_porcentagem(feitas, total):
+    return (feitas / total) * 100 if total else 0
+
+
+def registrar_mudanca_atividade(compromisso_id, delta_total, delta_feitas):
+    """Aplica a mudança de uma atividade na pontuação do compromisso com um UPDATE atômico.
+
+    No SET os F() enxergam os valores antigos da linha, por isso a porcentagem é calculada
+    já com os deltas somados.
+    """
+    if compromisso_id in _compromissos_em_exclusao.get():
+        return
+
+    total = F('qtd_total_atv') + delta_total
+    feitas = F('qtd_atv_done') + delta_feitas
+    with transaction.atomic():
+        atualizadas = PontuacaoCompromisso.objects.filter(compromisso_id=compromisso_id).update(
+            qtd_total_atv=total,
+            qtd_atv_done=feitas,
+            porcentagem=Case(
+                When(Q(qtd_total_atv__lte=-delta_total), then=Value(0.0)),
+                default=ExpressionWrapper(feitas * 100.0 / total, output_field=FloatField()),
+            ),
+            atualizado_em=timezone.now(),
+        )
+        if not atualizadas:
+            # Compromisso que nunca teve pontuação: conta tudo uma vez e cria a linha.
+            recalcular_pontuacao(compromisso_id)
+            return
+
+        # O UPDATE mantém a linha travada até o commit, então a releitura é consistente.
+        atual = PontuacaoCompromisso.objects.filter(compromisso_id=compromisso_id).values(
+            'qtd_total_atv', 'qtd_atv_done', 'porcentagem', 'compromisso__id_usuario_id', 'compromisso__data'
+        ).get()
+        total_antes = atual['qtd_total_atv'] - delta_total
+        feitas_antes = atual['qtd_atv_done'] - delta_feitas
+        aplicar_diferenca(
+            atual['compromisso__id_usuario_id'], atual['compromisso__data'],
+            contribuicao(calcular_porcentagem(feitas_antes, total_antes), total_antes),
+            contribuicao(atual['porcentagem'], atual['qtd_total_atv']),
+        )
+
+
+def recalcular_pontuacao(compromisso_id):
+    contagem = Compromisso.objects.filter(id=compromisso_id).aggregate(
+        total=Count('atividades'), feitas=Count('atividades', filter=Q(atividades__done=True))
+    )
+    if not contagem['total']:
+        return None
+    pontuacao, _ = PontuacaoCompromisso.objects.update_or_create(
+        compromisso_id=compromisso_id,
+        defaults={
+            'qtd_total_atv': contagem['total'],
+            'qtd_atv_done': contagem['feitas'],
+            'porcentagem': calcular_porcentagem(contagem['feitas'], contagem['total']),
+        }
+    )
+    return pontuacao
+
+
+def reconciliar_pontuacoes(user_id=None):
+    """Compara todas as pontuações com a contagem real das atividades e corrige as divergentes.
+
+    Devolve os ids de usuário afetados, para que o rollup de desempenho seja recalculado.
+    """
+    compromissos = Compromisso.objects.annotate(
+        total=Count('atividades'), feitas=Count('atividades', filter=Q(atividades__done=True))
+    ).values('id', 'id_usuario_id', 'total', 'feitas')
+    if user_id is not None:
+        compromissos = compromissos.filter(id_usuario_id=user_id)
+
+    pontuacoes = PontuacaoCompromisso.objects.all()
+    if user_id is not None:
+        pontuacoes = pontuacoes.filter(compromisso__id_usuario_id=user_id)
+    existentes = {p.compromisso_id: p for p in pontuacoes}
+
+    criar, corrigir, usuarios = [], [], set()
+    agora = timezone.now()
+    for c in compromissos:
+        porcentagem = calcular_porcentagem(c['feitas'], c['total'])
+        pontuacao = existentes.get(c['id'])
+        if pontuacao is None:
+            if c['total']:
+                criar.append(PontuacaoCompromisso(
+                    compromisso_id=c['id'], qtd_total_atv=c['total'], qtd_atv_done=c['feitas'],
+                    porcentagem=porcentagem
+                ))
+                usuarios.add(c['id_usuario_id'])
+        elif (pontuacao.qtd_total_atv, pontuacao.qtd_atv_done) != (c['total'], c['feitas']) \
+                or abs(pontuacao.porcentagem - porcentagem) > 1e-9:
+            pontuacao.qtd_total_atv = c['total']
+            pontuacao.qtd_atv_done = c['feitas']
+            pontuacao.porcentagem = porcentagem
+            pontuacao.atualizado_em = agora
+            corrigir.append(pontuacao)
+            usuarios.add(c['id_usuario_id'])
+
+    with transaction.atomic():
+        PontuacaoCompromisso.objects.bulk_create(criar, batch_size=1000)
+        PontuacaoCompromisso.objects.bulk_update(
+            corrigir, ['qtd_total_atv', 'qtd_atv_done', 'porcentagem', 'atualizado_em'], batch_size=1000
+        )
+    return len(criar), len(corrigir), usuarios
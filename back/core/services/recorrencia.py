@@ -0,0 +1,173 @@
+from calendar import monthrange
+from datetime import date, timedelta
+
+DIAS_SEMANA = {'MO': 0, 'TU': 1, 'WE': 2, 'TH': 3, 'FR': 4, 'SA': 5, 'SU': 6}
+FREQUENCIAS = ('DAILY', 'WEEKLY', 'MONTHLY')
+MAX_QUANTIDADE = 1000
+
+
+class RegraInvalidaError(ValueError):
+    pass
+
+
+class RegraRecorrencia:
+    """Subconjunto do RRULE (RFC 5545) suficiente para rotinas: FREQ=DAILY|WEEKLY|MONTHLY,
+    INTERVAL, BYDAY (dias da semana, sem prefixo numérico), BYMONTHDAY, COUNT e UNTIL.
+
+    Implementado aqui porque o python-dateutil não é dependência do projeto. As ocorrências
+    são geradas sob demanda e só dentro da janela pedida; sem COUNT o gerador pula direto
+    para o período que contém o início da janela.
+    """
+
+    def __init__(self, frequencia, intervalo=1, dias_semana=None, dias_mes=None, quantidade=None, ate=None):
+        self.frequencia = frequencia
+        self.intervalo = intervalo
+        self.dias_semana = sorted(dias_semana) if dias_semana else None
+        self.dias_mes = sorted(dias_mes) if dias_mes else None
+        self.quantidade = quantidade
+        self.ate = ate
+
+    @classmethod
+    def from_string(cls, regra):
+        partes = {}
+        for parte in regra.upper().removeprefix('RRULE:').split(';'):
+            if not parte:
+                continue
+            chave, sep, valor = parte.partition('=')
+            if not sep or not valor:
+                raise RegraInvalidaError(f"Parte inválida na regra: {parte!r}.")
+            partes[chave] = valor
+
+        desconhecidas = set(partes) - {'FREQ', 'INTERVAL', 'BYDAY', 'BYMONTHDAY', 'COUNT', 'UNTIL'}
+        if desconhecidas:
+            raise RegraInvalidaError(f"Parâmetros não suportados: {', '.join(sorted(desconhecidas))}.")
+
+        frequencia = partes.get('FREQ')
+        if frequencia not in FREQUENCIAS:
+            raise RegraInvalidaError("FREQ deve ser DAILY, WEEKLY ou MONTHLY.")
+        if 'COUNT' in partes and 'UNTIL' in partes:
+            raise RegraInvalidaError("Use COUNT ou UNTIL, não os dois.")
+
+        try:
+            intervalo = int(partes.get('INTERVAL', 1))
+            quantidade = int(partes['COUNT']) if 'COUNT' in partes else None
+            dias_mes = [int(d) for d in partes['BYMONTHDAY'].split(',')] if 'BYMONTHDAY' in partes else None
+            ate = date(int(partes['UNTIL'][:4]), int(partes['UNTIL'][4:6]), int(partes['UNTIL'][6:8])) \
+                if 'UNTIL' in partes else None
+        except (ValueError, IndexError):
+            raise RegraInvalidaError("INTERVAL, COUNT, BYMONTHDAY ou UNTIL inválidos.")
+
+        try:
+            dias_semana = [DIAS_SEMANA[d] for d in partes['BYDAY'].split(',')] if 'BYDAY' in partes else None
+        except KeyError:
+            raise RegraInvalidaError("BYDAY aceita MO, TU, WE, TH, FR, SA e SU.")
+
+        if intervalo < 1 or (quantidade is not None and not 1 <= quantidade <= MAX_QUANTIDADE):
+            raise RegraInvalidaError(f"INTERVAL deve ser positivo e COUNT entre 1 e {MAX_QUANTIDADE}.")
+        if dias_mes and (frequencia != 'MONTHLY' or not all(1 <= d <= 31 for d in dias_mes)):
+            raise RegraInvalidaError("BYMONTHDAY só vale para FREQ=MONTHLY, com dias de 1 a 31.")
+
+        return cls(frequencia, intervalo, dias_semana, dias_mes, quantidade, ate)
+
+    def _candidatas(self, data_inicio, a_partir):
+        """Percorre a regra em ordem a partir do período que contém ``a_partir``, ignorando COUNT/UNTIL.
+
+        Gera pares (data, valida): datas descartadas por BYDAY ou meses sem o dia pedido também
+        aparecem, como inválidas, para que quem consome consiga parar pelo fim da janela mesmo
+        quando a regra não produz nada por muito tempo.
+        """
+        try:
+            if self.frequencia == 'DAILY':
+                pulo = max(0, -(-(a_partir - data_inicio).days // self.intervalo))
+                atual = data_inicio + timedelta(days=pulo * self.intervalo)
+                while True:
+                    yield atual, self.dias_semana is None or atual.weekday() in self.dias_semana
+                    atual += timedelta(days=self.intervalo)
+
+            elif self.frequencia == 'WEEKLY':
+                dias = self.dias_semana or [data_inicio.weekday()]
+                semana_inicial = data_inicio - timedelta(days=data_inicio.weekday())
+                semanas = max(0, (a_partir - semana_inicial).days // 7)
+                semana = semana_inicial + timedelta(weeks=semanas // self.intervalo * self.intervalo)
+                while True:
+                    for dia in dias:
+                        atual = semana + timedelta(days=dia)
+                        yield atual, atual >= data_inicio
+                    semana += timedelta(weeks=self.intervalo)
+
+            else:
+                dias = self.dias_mes or [data_inicio.day]
+                meses = max(0, (a_partir.year - data_inicio.year) * 12 + a_partir.month - data_inicio.month)
+                indice = meses // self.intervalo * self.intervalo
+                while True:
+                    ano, mes = divmod(data_inicio.month - 1 + indice, 12)
+                    ano, mes = data_inicio.year + ano, mes + 1
+                    ultimo_dia = monthrange(ano, mes)[1]
+                    for dia in dias:
+                        # Como no RFC, meses sem o dia (ex.: 31 de abril) são pulados
+                        atual = date(ano, mes, min(dia, ultimo_dia))
+                        yield atual, dia <= ultimo_dia and atual >= data_inicio
+                    indice += self.intervalo
+        except (OverflowError, ValueError):
+            # Passou de date.max
+            return
+
+    def ocorrencias(self, data_inicio, inicio, fim):
+        """Gera as datas da série dentro de [inicio, fim], sem materializar o resto."""
+        # Com COUNT é preciso contar desde a primeira ocorrência; sem ele, começa na janela.
+        a_partir = data_inicio if self.quantidade else max(data_inicio, inicio)
+        numero = 0
+        for atual, valida in self._candidatas(data_inicio, a_partir):
+            if atual > fim or (self.ate and atual > self.ate):
+                return
+            if not valida:
+                continue
+            numero += 1
+            if self.quantidade and numero > self.quantidade:
+                return
+            if atual >= inicio:
+                yield atual
+
+    def ultima_data(self, data_inicio):
+        """Data da última ocorrência, ou None para séries sem fim."""
+        if self.ate:
+            return self.ate
+        if self.quantidade:
+            ultima = None
+            for ultima in self.ocorrencias(data_inicio, data_inicio, date.max):
+                pass
+            return ultima
+        return None
+
+
+def chave_calendario(item):
+    return item['data'], item['hora_inicio'], item['id'] or 0
+
+
+def ocorrencias_virtuais(series, inicio, fim, materializadas):
+    """Ocorrências das séries em [inicio, fim] que não têm linha própria, já no formato do
+    CompromissoCalendarioSerializer e ordenadas como o calendário.
+
+    ``materializadas`` é o conjunto de (serie_id, data_original) que já existem como Compromisso.
+    """
+    virtuais = []
+    for serie in series:
+        for dia in serie.datas(inicio, fim):
+            if (serie.id, dia) in materializadas:
+                continue
+            virtuais.append({
+                'id': None,
+                'client_id': None,
+                'titulo': serie.titulo,
+                'data': dia.isoformat(),
+                'hora_inicio': serie.hora_inicio.isoformat(),
+                'hora_fim': serie.hora_fim.isoformat(),
+                'concluido': False,
+                'serie': serie.id,
+                'data_original': dia.isoformat(),
+                'atividades': [],
+                'pontuacao': None,
+                'virtual': True,
+            })
+    virtuais.sort(key=chave_calendario)
+    return virtuais
@@ -0,0 +1,90 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core import models, serializers
+
+# tipo -> (model, serializer, caminho até o usuário dono)
+ENTIDADES = {
+    'perfil': (models.PerfilUsuario, serializers.PerfilUsuarioSerializer, 'id_usuario'),
+    'registros': (models.RegistroCorporal, serializers.RegistroCorporalSerializer, 'id_usuario'),
+    'composicoes': (models.ComposicaoCorporal, serializers.ComposicaoCorporalSerializer, 'id_usuario'),
+    'compromissos': (models.Compromisso, serializers.CompromissoSerializer, 'id_usuario'),
+    'series': (models.SerieCompromisso, serializers.SerieCompromissoSerializer, 'id_usuario'),
+    'atividades': (models.CompromissoAtividade, serializers.AtividadeSyncSerializer, 'compromisso__id_usuario'),
+    'pontuacoes': (models.PontuacaoCompromisso, serializers.PontuacaoCompromissoSerializer, 'compromisso__id_usuario'),
+    'exercicios': (models.HistoricoExercicio, serializers.HistoricoExercicioSerializer, 'id_usuario'),
+    'dietas': (models.Dieta, serializers.DietaSerializer, 'id_usuario'),
+}
+
+# Só os registros de primeiro nível geram tombstone; atividades e pontuação somem junto com o compromisso.
+TIPO_POR_MODEL = {
+    models.PerfilUsuario: 'perfil',
+    models.RegistroCorporal: 'registros',
+    models.ComposicaoCorporal: 'composicoes',
+    models.Compromisso: 'compromissos',
+    models.SerieCompromisso: 'series',
+    models.HistoricoExercicio: 'exercicios',
+    models.Dieta: 'dietas',
+}
+
+
+class TokenInvalido(Exception):
+    pass
+
+
+def codificar_token(momento):
+    return base64.urlsafe_b64encode(momento.isoformat().encode()).decode().rstrip('=')
+
+
+def decodificar_token(token):
+    try:
+        momento = datetime.fromisoformat(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise TokenInvalido()
+    if timezone.is_naive(momento):
+        raise TokenInvalido()
+    return momento
+
+
+def registrar_exclusao(instance):
+    tipo = TIPO_POR_MODEL[type(instance)]
+    models.Exclusao.objects.create(id_usuario_id=instance.id_usuario_id, tipo=tipo, objeto_id=instance.pk)
+
+
+def alteracoes_desde(user, desde):
+    """Monta a resposta do sync/.
+
+    Sem ``desde`` (ou com um token mais antigo que a retenção dos tombstones) devolve tudo
+    com ``completo`` ligado, e o app deve substituir os dados locais. O próximo token fica
+    SYNC_MARGEM segundos no passado: transações que gravaram ``atualizado_em`` antes do
+    commit ainda aparecem na sincronização seguinte, e o app só faz upsert por id.
+    """
+    agora = timezone.now()
+    completo = desde is None or desde < agora - timedelta(seconds=settings.SYNC_RETENCAO_EXCLUSOES)
+
+    alteracoes = {}
+    for tipo, (model, serializer_class, dono) in ENTIDADES.items():
+        queryset = model.objects.filter(**{dono: user})
+        if not completo:
+            queryset = queryset.filter(atualizado_em__gte=desde)
+        if dono != 'id_usuario':
+            queryset = queryset.select_related('compromisso')
+        alteracoes[tipo] = serializer_class(queryset.order_by('atualizado_em', 'id'), many=True).data
+
+    exclusoes = {tipo: [] for tipo in TIPO_POR_MODEL.values()}
+    if not completo:
+        for tipo, objeto_id in models.Exclusao.objects.filter(
+            id_usuario=user, excluido_em__gte=desde
+        ).values_list('tipo', 'objeto_id'):
+            exclusoes[tipo].append(objeto_id)
+
+    return {
+        'token': codificar_token(agora - timedelta(seconds=settings.SYNC_MARGEM)),
+        'completo': completo,
+        'alteracoes': alteracoes,
+        'exclusoes': exclusoes,
+    }
@@ -0,0 +1,122 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.models import (
+    Compromisso,
+    CompromissoAtividade,
+    Exclusao,
+    PerfilUsuario,
+    PontuacaoCompromisso,
+    RegistroCorporal
+)
+from core.services.autenticacao import cache_usuarios
+from core.services.contexto_ia import invalidar_contexto_ia
+from core.services.desempenho import aplicar_diferenca, contribuicao
+from core.services.pontuacao import desmarcar_exclusao, marcar_exclusao, registrar_mudanca_atividade
+from core.services.sincronizacao import TIPO_POR_MODEL, registrar_exclusao
+
+
+@receiver([post_save, post_delete], sender=PerfilUsuario)
+@receiver([post_save, post_delete], sender=RegistroCorporal)
+def invalidar_contexto_ia_usuario(sender, instance, **kwargs):
+    user_id = instance.id_usuario_id
+    transaction.on_commit(lambda: invalidar_contexto_ia(user_id))
+
+
+def registrar_exclusao_sync(sender, instance, **kwargs):
+    registrar_exclusao(instance)
+
+
+for model in TIPO_POR_MODEL:
+    post_delete.connect(registrar_exclusao_sync, sender=model, dispatch_uid=f'exclusao_sync_{model.__name__}')
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidar_cache_autenticacao(sender, instance, **kwargs):
+    # Troca de senha, desativação ou exclusão precisam valer já na próxima requisição.
+    cache_usuarios.invalidar(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def limpar_exclusoes_usuario(sender, instance, **kwargs):
+    # Os tombstones gerados pela cascata da exclusão do usuário não têm mais quem os sincronize.
+    Exclusao.objects.filter(id_usuario_id=instance.pk).delete()
+
+
+# Rollup de desempenho diário: guarda os valores carregados do banco para aplicar só a diferença.
+@receiver(post_init, sender=PontuacaoCompromisso)
+def guardar_pontuacao_salva(sender, instance, **kwargs):
+    if instance.pk:
+        instance._contribuicao_salva = contribuicao(
+            instance.__dict__.get('porcentagem'), instance.__dict__.get('qtd_total_atv')
+        )
+    else:
+        instance._contribuicao_salva = (0, 0)
+
+
+@receiver(post_save, sender=PontuacaoCompromisso)
+def atualizar_desempenho_pontuacao(sender, instance, **kwargs):
+    compromisso = instance.compromisso
+    atual = contribuicao(instance.porcentagem, instance.qtd_total_atv)
+    aplicar_diferenca(compromisso.id_usuario_id, compromisso.data, instance._contribuicao_salva, atual)
+    instance._contribuicao_salva = atual
+
+
+@receiver(pre_delete, sender=PontuacaoCompromisso)
+def remover_desempenho_pontuacao(sender, instance, **kwargs):
+    # pre_delete: na cascata de um compromisso ele ainda existe aqui para dizer o usuário e o dia
+    compromisso = instance.compromisso
+    aplicar_diferenca(compromisso.id_usuario_id, compromisso.data, instance._contribuicao_salva, (0, 0))
+
+
+@receiver(post_init, sender=Compromisso)
+def guardar_data_salva(sender, instance, **kwargs):
+    instance._data_salva = instance.__dict__.get('data') if instance.pk else None
+
+
+@receiver(post_save, sender=Compromisso)
+def mover_desempenho_compromisso(sender, instance, created, **kwargs):
+    data_anterior = instance._data_salva
+    instance._data_salva = instance.data
+    if created or data_anterior is None or data_anterior == instance.data:
+        return
+    try:
+        pontuacao = instance.pontuacao
+    except PontuacaoCompromisso.DoesNotExist:
+        return
+    atual = contribuicao(pontuacao.porcentagem, pontuacao.qtd_total_atv)
+    aplicar_diferenca(instance.id_usuario_id, data_anterior, atual, (0, 0))
+    aplicar_diferenca(instance.id_usuario_id, instance.data, (0, 0), atual)
+
+
+# Pontuação do compromisso mantida a cada mudança nas atividades (core.services.pontuacao).
+@receiver(pre_delete, sender=Compromisso)
+def marcar_compromisso_em_exclusao(sender, instance, **kwargs):
+    marcar_exclusao(instance.pk)
+
+
+@receiver(post_delete, sender=Compromisso)
+def desmarcar_compromisso_em_exclusao(sender, instance, **kwargs):
+    desmarcar_exclusao(instance.pk)
+
+
+@receiver(post_init, sender=CompromissoAtividade)
+def guardar_done_salvo(sender, instance, **kwargs):
+    instance._done_salvo = instance.__dict__.get('done') if instance.pk else None
+
+
+@receiver(post_save, sender=CompromissoAtividade)
+def contar_atividade_salva(sender, instance, created, **kwargs):
+    done_salvo = instance._done_salvo
+    instance._done_salvo = instance.done
+    if created:
+        registrar_mudanca_atividade(instance.compromisso_id, 1, int(instance.done))
+    elif done_salvo is not None and done_salvo != instance.done:
+        registrar_mudanca_atividade(instance.compromisso_id, 0, 1 if instance.done else -1)
+
+
+@receiver(post_delete, sender=CompromissoAtividade)
+def descontar_atividade_excluida(sender, instance, **kwargs):
+    registrar_mudanca_atividade(instance.compromisso_id, -1, -int(bool(instance._done_salvo)))
@@ -1,3 +1,1557 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+import httpx
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.mail.backends import locmem
+from django.db import IntegrityError, connection, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.test import AsyncClient, AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from tenacity import RetryError
+
+from core import models, serializers
+from core.management.commands.processar_dietas import Command as ProcessarDietas
+from core.renderers import JSONRapidoRenderer
+from core.services.api_ia import _resumos_em_andamento, perguntar_ia_gemini_stream, stream_chat
+from core.services.autenticacao import cache_usuarios
+from core.services.cache_dieta import cache_dietas, chave_pergunta
+from core.services.cliente_llm import CircuitBreaker, CircuitoAbertoError, ClienteLLM
+from core.services.compactacao import compactador
+from core.services.contexto_ia import obter_contexto_ia
+from core.services.conversas import ArmazemConversas, conversas
+from core.services.desempenho import emoji_da_porcentagem, porcentagem_com_emoji, recalcular_desempenho
+from core.services.grafico import lttb
+from core.services.imc import calcular_imc
+from core.services.jobs_dieta import processar_job, reservar_jobs
+from core.services.lote import gravar_lote
+from core.services.outbox_email import backoff, enviar_lote, reservar_emails
+from core.services.pontuacao import recalcular_pontuacao
+from core.services.sincronizacao import codificar_token
+from core.services.leitura import leitor_para
+from core.services.limite_taxa import BackendCache, BackendMemoria, liberar_ao_fim, limitar_taxa
+
+
+class PlanoDeExecucaoMixin:
+    """EXPLAIN de uma consulta capturada e as varreduras/ordenações que ele revela."""
+
+    def explicar(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Com poucas linhas o Postgres prefere seq scan de qualquer jeito; desligar
+                # força o planner a mostrar se existe um índice que atenda a consulta.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return '\n'.join(str(linha[-1]) for linha in cursor.fetchall())
+
+    def problemas_no_plano(self, plano, permitir_ordenacao=False):
+        # permitir_ordenacao: consultas agregadas ordenam só os grupos, não as linhas da tabela
+        if connection.vendor == 'postgresql':
+            varreduras = [linha for linha in plano.splitlines() if 'Seq Scan' in linha]
+            ordenacoes = [linha for linha in plano.splitlines() if linha.strip().lstrip('-> ').startswith('Sort ')]
+        else:
+            varreduras = [linha for linha in plano.splitlines() if linha.startswith('SCAN')]
+            ordenacoes = [linha for linha in plano.splitlines() if 'USE TEMP B-TREE' in linha]
+        return varreduras if permitir_ordenacao else varreduras + ordenacoes
+
+
+class PlanoConsultasHistoricoTests(PlanoDeExecucaoMixin, TestCase):
+    """Roda EXPLAIN nas consultas que cada endpoint de histórico executa de fato e falha
+    se o banco precisar varrer a tabela inteira ou ordenar em memória — sinal de que o
+    índice composto (id_usuario, data DESC, id) deixou de ser usado."""
+
+    # endpoint -> tabela cuja consulta precisa vir do índice
+    ENDPOINTS = [
+        ('/imc/registrosConsultas/', 'registro_corporal'),
+        ('/imc/historico/', 'registro_corporal'),
+        ('/dietas/historico/', 'dieta'),
+        ('/composicao-corporal/', 'composicao_corporal'),
+        ('/compromissos/', 'compromisso'),
+        ('/exercicios/', 'historico_exercicio'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        usuarios = [User.objects.create_user(f'usuario{i}', f'usuario{i}@lifeai.local', 'senha') for i in range(3)]
+        cls.user = usuarios[0]
+        inicio = date(2024, 1, 1)
+        for user in usuarios:
+            for i in range(30):
+                dia = inicio + timedelta(days=i)
+                models.RegistroCorporal.objects.create(id_usuario=user, data_consulta=dia, peso=70, altura=1.7,
+                                                       imc_res=24.2, classificacao='Peso normal')
+                models.ComposicaoCorporal.objects.create(id_usuario=user, gordura_percentual=20)
+                models.Dieta.objects.create(id_usuario=user, plano_alimentar={'refeicoes': []})
+                models.Compromisso.objects.create(id_usuario=user, titulo='Treino', data=dia,
+                                                  hora_inicio=time(8), hora_fim=time(9))
+                models.DesempenhoDiario.objects.create(id_usuario=user, data=dia, soma_porcentagem=50,
+                                                       qtd_compromissos=1)
+                models.HistoricoExercicio.objects.create(
+                    id_usuario=user, nome_exercicio='Corrida', duracao_segundos=600, calorias_queimadas=80,
+                    data_treino=timezone.make_aware(datetime.combine(dia, time(7)))
+                )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def consultas_da_tabela(self, url, tabela, params=None):
+        with CaptureQueriesContext(connection) as capturadas:
+            resposta = self.client.get(url, params or {})
+        self.assertEqual(resposta.status_code, 200, url)
+        return [q['sql'] for q in capturadas.captured_queries
+                if q['sql'].startswith('SELECT') and f'FROM "{tabela}"' in q['sql']]
+
+    def test_historicos_usam_indice_sem_ordenar(self):
+        for url, tabela in self.ENDPOINTS:
+            for params in ({}, {'limite': 10}):
+                consultas = self.consultas_da_tabela(url, tabela, params)
+                self.assertTrue(consultas, f'{url} não consultou {tabela}')
+                for sql in consultas:
+                    plano = self.explicar(sql)
+                    with self.subTest(url=url, params=params):
+                        self.assertEqual(self.problemas_no_plano(plano), [], f'{sql}\n{plano}')
+
+    def test_pagina_seguinte_usa_indice_sem_ordenar(self):
+        for url, tabela in self.ENDPOINTS:
+            if url == '/imc/historico/':
+                continue
+            cursor = self.client.get(url, {'limite': 10}).data['cursor']
+            for sql in self.consultas_da_tabela(url, tabela, {'limite': 10, 'cursor': cursor}):
+                plano = self.explicar(sql)
+                with self.subTest(url=url):
+                    self.assertEqual(self.problemas_no_plano(plano), [], f'{sql}\n{plano}')
+
+    def test_desempenho_le_intervalo_do_rollup_pelo_indice(self):
+        for url, params in (('/pontuacoes/mensal/dias/', {'ano': 2024, 'mes': 1}), ('/pontuacoes/anual/', {'ano': 2024})):
+            consultas = self.consultas_da_tabela(url, 'desempenho_diario', params)
+            self.assertTrue(consultas, f'{url} não consultou desempenho_diario')
+            for sql in consultas:
+                plano = self.explicar(sql)
+                with self.subTest(url=url):
+                    problemas = self.problemas_no_plano(plano, permitir_ordenacao='GROUP BY' in sql)
+                    self.assertEqual(problemas, [], f'{sql}\n{plano}')
+
+
+class CalendarioCompromissosTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('calendario', 'calendario@lifeai.local', 'senha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def criar_compromissos(self, quantidade, primeira_hora=0):
+        for i in range(quantidade):
+            compromisso = models.Compromisso.objects.create(
+                id_usuario=self.user, titulo=f'Compromisso {primeira_hora}-{i}',
+                data=date(2024, 5, 1) + timedelta(days=i % 7), hora_inicio=time(primeira_hora + i // 7),
+                hora_fim=time(23)
+            )
+            for j in range(3):
+                models.CompromissoAtividade.objects.create(compromisso=compromisso, descricao=f'Atividade {j}',
+                                                           done=j < i % 4)
+
+    def buscar_semana(self):
+        return self.client.get('/compromissos/', {'inicio': '2024-05-01', 'fim': '2024-05-07'})
+
+    def test_quantidade_de_queries_nao_cresce_com_o_periodo(self):
+        self.criar_compromissos(2)
+        with self.assertNumQueries(3):
+            resposta = self.buscar_semana()
+        self.assertEqual(len(resposta.data), 2)
+
+        self.criar_compromissos(40, primeira_hora=10)
+        with self.assertNumQueries(3):
+            resposta = self.buscar_semana()
+        self.assertEqual(len(resposta.data), 42)
+
+    def test_compromissos_trazem_atividades_e_pontuacao(self):
+        self.criar_compromissos(2)
+        sem_atividades = models.Compromisso.objects.create(
+            id_usuario=self.user, titulo='Livre', data=date(2024, 5, 3), hora_inicio=time(22), hora_fim=time(23)
+        )
+
+        dados = {c['id']: c for c in self.buscar_semana().data}
+        segundo = dados[models.Compromisso.objects.get(titulo='Compromisso 0-1').id]
+        self.assertEqual(len(segundo['atividades']), 3)
+        self.assertEqual(segundo['pontuacao']['qtd_total_atv'], 3)
+        self.assertEqual(segundo['pontuacao']['qtd_atv_done'], 1)
+        self.assertIsNone(dados[sem_atividades.id]['pontuacao'])
+        self.assertEqual(dados[sem_atividades.id]['atividades'], [])
+
+    def test_periodo_invalido(self):
+        self.assertEqual(self.client.get('/compromissos/', {'inicio': '2024-05-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/compromissos/', {'inicio': '2024-05-07', 'fim': '2024-05-01'}).status_code,
+                         400)
+
+
+class RecorrenciaCompromissosTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recorrencia', 'recorrencia@lifeai.local', 'senha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        resposta = self.client.post('/compromissos/series/', {
+            'titulo': 'Academia', 'hora_inicio': '07:00', 'hora_fim': '08:00',
+            'regra': 'FREQ=WEEKLY;BYDAY=MO,WE,FR', 'data_inicio': '2024-05-01',
+        }, format='json')
+        self.assertEqual(resposta.status_code, 201, resposta.data)
+        self.serie_id = resposta.data['id']
+
+    def buscar(self, inicio='2024-05-01', fim='2024-05-14'):
+        return self.client.get('/compromissos/', {'inicio': inicio, 'fim': fim}).data
+
+    def ocorrencia(self, data):
+        return f'/compromissos/series/{self.serie_id}/ocorrencias/{data}/'
+
+    def test_ocorrencias_sao_geradas_so_para_a_janela(self):
+        dados = self.buscar()
+        self.assertEqual([c['data'] for c in dados],
+                         ['2024-05-01', '2024-05-03', '2024-05-06', '2024-05-08', '2024-05-10', '2024-05-13'])
+        self.assertTrue(all(c['virtual'] and c['id'] is None for c in dados))
+        self.assertFalse(models.Compromisso.objects.exists())
+        self.assertEqual(len(self.buscar('2034-05-01', '2034-05-07')), 3)
+
+    def test_concluir_materializa_e_substitui_a_virtual(self):
+        resposta = self.client.put(self.ocorrencia('2024-05-06'), {'concluido': True}, format='json')
+        self.assertEqual(resposta.status_code, 201, resposta.data)
+        models.Compromisso.objects.create(id_usuario=self.user, titulo='Avulso', data=date(2024, 5, 6),
+                                          hora_inicio=time(6), hora_fim=time(7))
+
+        dados = [c for c in self.buscar() if c['data'] == '2024-05-06']
+        self.assertEqual([(c['titulo'], c['virtual']) for c in dados], [('Avulso', False), ('Academia', False)])
+        self.assertTrue(dados[1]['concluido'])
+        self.assertEqual(self.client.patch(self.ocorrencia('2024-05-06'), {'titulo': 'Perna'}, format='json').status_code, 200)
+        self.assertEqual(models.Compromisso.objects.filter(serie_id=self.serie_id).count(), 1)
+
+    def test_remarcada_para_fora_da_janela_nao_duplica(self):
+        self.client.put(self.ocorrencia('2024-05-13'), {'data': '2024-05-20'}, format='json')
+        datas = [c['data'] for c in self.buscar()]
+        self.assertNotIn('2024-05-13', datas)
+        remarcada = [c for c in self.buscar('2024-05-20', '2024-05-20') if not c['virtual']]
+        self.assertEqual(remarcada[0]['data_original'], '2024-05-13')
+
+    def test_cancelar_ocorrencia(self):
+        self.client.put(self.ocorrencia('2024-05-08'), {'concluido': True}, format='json')
+        self.assertEqual(self.client.delete(self.ocorrencia('2024-05-08')).status_code, 204)
+        self.assertNotIn('2024-05-08', [c['data'] for c in self.buscar()])
+        self.assertFalse(models.Compromisso.objects.exists())
+        self.assertEqual(self.client.put(self.ocorrencia('2024-05-08'), {}, format='json').status_code, 404)
+        self.assertEqual(self.client.put(self.ocorrencia('2024-05-07'), {}, format='json').status_code, 404)
+
+    def test_regra_invalida(self):
+        for regra in ('FREQ=YEARLY', 'FREQ=DAILY;COUNT=0', 'FREQ=WEEKLY;BYDAY=XX', 'FREQ=DAILY;BYSETPOS=1'):
+            resposta = self.client.post('/compromissos/series/', {
+                'titulo': 'X', 'hora_inicio': '07:00', 'hora_fim': '08:00', 'regra': regra,
+                'data_inicio': '2024-05-01',
+            }, format='json')
+            with self.subTest(regra=regra):
+                self.assertEqual(resposta.status_code, 400)
+
+
+class LeituraValoresTests(TestCase):
+    """O caminho por .values() e o renderer orjson precisam gerar exatamente o mesmo JSON do serializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('leitura', 'leitura@lifeai.local', 'senha')
+        for i in range(3):
+            dia = date(2024, 3, 1) + timedelta(days=i)
+            models.RegistroCorporal.objects.create(id_usuario=cls.user, data_consulta=dia, peso=70.5, altura=1.7,
+                                                   imc_res=24.39, classificacao='Peso normal')
+            models.ComposicaoCorporal.objects.create(id_usuario=cls.user, gordura_percentual=20.5)
+            models.Dieta.objects.create(id_usuario=cls.user, plano_alimentar={'refeicoes': [{'nome': 'Café'}]})
+            models.Compromisso.objects.create(id_usuario=cls.user, titulo='Treino', data=dia, hora_inicio=time(8, 30),
+                                              hora_fim=time(9))
+            models.HistoricoExercicio.objects.create(
+                id_usuario=cls.user, nome_exercicio='Corrida', duracao_segundos=600, calorias_queimadas=80,
+                data_treino=timezone.make_aware(datetime.combine(dia, time(7, 15, 30, 1234)))
+            )
+
+    def test_values_gera_o_mesmo_json_do_serializer(self):
+        for model, serializer_class in (
+            (models.RegistroCorporal, serializers.RegistroCorporalSerializer),
+            (models.ComposicaoCorporal, serializers.ComposicaoCorporalSerializer),
+            (models.Dieta, serializers.DietaSerializer),
+            (models.Compromisso, serializers.CompromissoSerializer),
+            (models.HistoricoExercicio, serializers.HistoricoExercicioSerializer),
+        ):
+            queryset = model.objects.filter(id_usuario=self.user).order_by('id')
+            leitor = leitor_para(serializer_class)
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertIsNotNone(leitor)
+                esperado = serializer_class(queryset, many=True).data
+                self.assertEqual(leitor.representar(queryset.values(*leitor.colunas())), esperado)
+                self.assertEqual(JSONRapidoRenderer().render(esperado), JSONRenderer().render(esperado))
+
+    def test_renderer_rapido_gera_os_mesmos_bytes_para_linhas_cruas(self):
+        linhas = [
+            {
+                'utc': timezone.make_aware(datetime(2024, 3, 1, 7, 15, 30, 1234), timezone.get_fixed_timezone(0)),
+                'sao_paulo': timezone.make_aware(datetime(2024, 3, 1, 7, 15), timezone.get_fixed_timezone(-180)),
+                'sem_fuso': datetime(2024, 3, 1, 7, 15, 30, 1234),
+                'dia': date(2024, 3, 1),
+                'hora': time(8, 30, 0, 500),
+                'valor': Decimal('70.50'),
+                'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+                'duracao': timedelta(minutes=10),
+                'texto': 'linha\u2028nova',
+            }
+        ]
+        for model in (models.RegistroCorporal, models.Dieta, models.Compromisso, models.HistoricoExercicio):
+            linhas += list(model.objects.filter(id_usuario=self.user).values())
+        for linha in linhas:
+            with self.subTest(linha=linha):
+                self.assertEqual(JSONRapidoRenderer().render([linha]), JSONRenderer().render([linha]))
+
+    def test_serializer_com_campos_calculados_usa_caminho_normal(self):
+        self.assertIsNone(leitor_para(serializers.CompromissoCalendarioSerializer))
+        self.assertIsNone(leitor_para(serializers.PontuacaoCompromissoSerializer))
+
+    def test_endpoints_respondem_igual_com_e_sem_values(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for url in ('/imc/registrosConsultas/', '/dietas/historico/', '/composicao-corporal/', '/compromissos/',
+                    '/exercicios/'):
+            for params in ({}, {'limite': 2}):
+                rapido = client.get(url, params).content
+                with override_settings(LEITURA_VALORES=False):
+                    normal = client.get(url, params).content
+                with self.subTest(url=url, params=params):
+                    self.assertEqual(rapido, normal)
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('condicional', 'condicional@lifeai.local', 'senha')
+        models.PerfilUsuario.objects.create(id_usuario=self.user, nome='Ana', sexo='F', idade=30, objetivo='Saúde')
+        self.registro = models.RegistroCorporal.objects.create(id_usuario=self.user, data_consulta=date(2024, 1, 1),
+                                                               peso=70, altura=1.7, imc_res=24.2)
+        models.Dieta.objects.create(id_usuario=self.user, plano_alimentar={'refeicoes': []})
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_recurso_inalterado_responde_304_sem_serializar(self):
+        for url in ('/perfil/', '/gerar-dieta-ia/', '/dietas/historico/', '/imc/historico/'):
+            primeira = self.client.get(url)
+            with self.subTest(url=url):
+                self.assertEqual(primeira.status_code, 200)
+                self.assertIn('Last-Modified', primeira)
+                with CaptureQueriesContext(connection) as capturadas:
+                    segunda = self.client.get(url, HTTP_IF_NONE_MATCH=primeira['ETag'])
+                self.assertEqual(segunda.status_code, 304)
+                self.assertEqual(segunda.content, b'')
+                self.assertEqual(segunda['ETag'], primeira['ETag'])
+                # Só as consultas de versão: nenhuma leitura das linhas do recurso
+                self.assertFalse([q for q in capturadas.captured_queries
+                                  if 'MAX(' not in q['sql'] and 'auth_user' not in q['sql']])
+                self.assertEqual(
+                    self.client.get(url, HTTP_IF_MODIFIED_SINCE=primeira['Last-Modified']).status_code, 304
+                )
+
+    def test_alteracao_e_exclusao_mudam_a_versao(self):
+        etag = self.client.get('/imc/historico/')['ETag']
+        self.client.post('/imc/', {'data_consulta': '2024-02-01', 'peso': 71, 'altura': 1.7}, format='json')
+        nova = self.client.get('/imc/historico/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(nova.status_code, 200)
+
+        self.client.delete(f'/imc/{self.registro.id}/')
+        self.assertEqual(self.client.get('/imc/historico/', HTTP_IF_NONE_MATCH=nova['ETag']).status_code, 200)
+
+        etag = self.client.get('/perfil/')['ETag']
+        self.client.patch('/perfil/', {'idade': 31}, format='json')
+        self.assertEqual(self.client.get('/perfil/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_parametros_fazem_parte_da_versao(self):
+        etag = self.client.get('/dietas/historico/')['ETag']
+        resposta = self.client.get('/dietas/historico/', {'limite': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+
+
+class PlanosDietaTests(TestCase):
+    PLANO = {
+        'plano_diario': [
+            {'dia': 'Segunda', 'resumo_kcal': 2100, 'macros': {'proteina_g': 120, 'carbo_g': 250, 'gordura_g': 60},
+             'refeicoes': [{'titulo': 'Café', 'opcoes_acessiveis': ['Pão'], 'opcoes_ideais': ['Aveia']}] * 4},
+            {'dia': 'Terça', 'resumo_kcal': 1900, 'macros': {'proteina_g': 110, 'carbo_g': 220, 'gordura_g': 55},
+             'refeicoes': [{'titulo': 'Almoço', 'opcoes_acessiveis': ['Arroz'], 'opcoes_ideais': ['Quinoa']}] * 3},
+        ]
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user('planos', 'planos@lifeai.local', 'senha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_planos_iguais_sao_gravados_uma_vez_e_comprimidos(self):
+        primeira = models.Dieta.objects.create(id_usuario=self.user, plano_alimentar=self.PLANO)
+        outro = User.objects.create_user('planos2', 'planos2@lifeai.local', 'senha')
+        segunda = models.Dieta.objects.create(id_usuario=outro, plano_alimentar=dict(reversed(self.PLANO.items())))
+
+        self.assertEqual(primeira.plano_id, segunda.plano_id)
+        self.assertEqual(models.PlanoAlimentar.objects.count(), 1)
+        plano = models.PlanoAlimentar.objects.get()
+        self.assertLess(len(plano.conteudo), plano.tamanho)
+        self.assertEqual(models.Dieta.objects.get(id=primeira.id).plano_alimentar, self.PLANO)
+
+    def test_historico_traz_resumo_e_detalhe_traz_o_plano(self):
+        dieta = models.Dieta.objects.create(id_usuario=self.user, plano_alimentar=self.PLANO)
+        models.Dieta.objects.create(id_usuario=self.user, plano_alimentar={'formato': 'inesperado'})
+
+        historico = self.client.get('/dietas/historico/').data
+        self.assertEqual(historico[1], {
+            'id': dieta.id, 'data_criacao': historico[1]['data_criacao'], 'calorias_totais': 4000,
+            'qtd_refeicoes': 7, 'qtd_dias': 2,
+        })
+        self.assertEqual(historico[0]['calorias_totais'], 0)
+
+        with self.assertNumQueries(3):
+            detalhe = self.client.get(f'/dietas/{dieta.id}/')
+        self.assertEqual(detalhe.data['plano_alimentar'], self.PLANO)
+        outro = User.objects.create_user('planos3', 'planos3@lifeai.local', 'senha')
+        alheia = models.Dieta.objects.create(id_usuario=outro, plano_alimentar=self.PLANO)
+        self.assertEqual(self.client.get(f'/dietas/{alheia.id}/').status_code, 404)
+
+
+class AutenticacaoCacheTests(TestCase):
+    # Rotas GET de core/urls.py que exigem autenticação e não têm parâmetros no caminho
+    ROTAS = [
+        '/perfil/', '/imc/historico/', '/imc/registrosConsultas/', '/composicao-corporal/', '/gerar-dieta-ia/',
+        '/dietas/historico/', '/compromissos/', '/compromissos/series/', '/pontuacoes/mensal/',
+        '/pontuacoes/mensal/dias/', '/pontuacoes/anual/', '/exercicios/', '/sync/',
+    ]
+
+    def setUp(self):
+        cache_usuarios.limpar()
+        self.user = User.objects.create_user('autenticacao', 'autenticacao@lifeai.local', 'senha')
+        models.PerfilUsuario.objects.create(id_usuario=self.user, nome='Ana', sexo='F', idade=30, objetivo='Saúde')
+        models.Dieta.objects.create(id_usuario=self.user, plano_alimentar={'plano_diario': []})
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def contar(self, url):
+        with CaptureQueriesContext(connection) as capturadas:
+            resposta = self.client.get(url)
+        self.assertNotEqual(resposta.status_code, 401, url)
+        return len(capturadas.captured_queries)
+
+    def test_usuario_em_cache_economiza_uma_query_por_requisicao(self):
+        for url in self.ROTAS:
+            cache_usuarios.limpar()
+            sem_cache = self.contar(url)
+            com_cache = self.contar(url)
+            with self.subTest(url=url):
+                self.assertEqual(com_cache, sem_cache - 1)
+
+    def test_campos_do_usuario_sao_carregados_sob_demanda(self):
+        self.client.get('/perfil/')
+        resposta = self.client.get('/perfil/')
+        usuario = resposta.wsgi_request.user
+        self.assertTrue({'username', 'email', 'password'} <= usuario.get_deferred_fields())
+        self.assertEqual(usuario.username, 'autenticacao')
+
+    def test_desativar_ou_trocar_senha_invalida_o_cache(self):
+        self.assertEqual(self.client.get('/perfil/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/perfil/').status_code, 401)
+        self.assertEqual(self.client.get('/gerar-dieta-ia/').status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.get('/perfil/').status_code, 200)
+        self.user.set_password('nova-senha')
+        self.user.save()
+        self.assertIsNone(cache_usuarios.obter(self.user.pk))
+
+
+class LoginRegistroTests(PlanoDeExecucaoMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('maria', 'maria@lifeai.local', 'senha-forte')
+
+    def login(self, email, senha='senha-forte'):
+        return self.client.post('/login/', {'email': email, 'password': senha}, format='json')
+
+    def test_login_em_uma_query_com_flag_de_onboarding(self):
+        with self.assertNumQueries(1):
+            resposta = self.login('Maria@LifeAI.local')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(resposta.data['onboarding_completed'])
+
+        models.PerfilUsuario.objects.create(id_usuario=self.user, nome='Maria', sexo='F', idade=30, objetivo='Saúde')
+        with self.assertNumQueries(1):
+            self.assertTrue(self.login('maria@lifeai.local').data['onboarding_completed'])
+
+    def test_login_busca_email_pelo_indice_unico(self):
+        for i in range(20):
+            User.objects.create_user(f'usuario{i}', f'usuario{i}@lifeai.local', 'senha')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with CaptureQueriesContext(connection) as capturadas:
+            resposta = self.login('MARIA@lifeai.local')
+        self.assertEqual(resposta.status_code, 200)
+        [sql] = [q['sql'] for q in capturadas.captured_queries if 'FROM "auth_user"' in q['sql']]
+        plano = self.explicar(sql)
+        self.assertEqual(self.problemas_no_plano(plano), [], f'{sql}\n{plano}')
+
+    def test_credenciais_invalidas(self):
+        self.assertEqual(self.login('maria@lifeai.local', 'errada').status_code, 401)
+        self.assertEqual(self.login('ninguem@lifeai.local').status_code, 401)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login('maria@lifeai.local').status_code, 401)
+
+    def test_registro_sem_consultas_previas(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            resposta = self.client.post('/registro/', {'username': 'joao', 'email': 'joao@lifeai.local',
+                                                       'password': 'senha'}, format='json')
+        self.assertEqual(resposta.status_code, 201)
+        self.assertTrue(capturadas.captured_queries[0]['sql'].startswith(('INSERT', 'SAVEPOINT')))
+        self.assertFalse([q for q in capturadas.captured_queries if q['sql'].startswith('SELECT')])
+
+    def test_registro_duplicado(self):
+        dados = {'username': 'maria', 'email': 'outra@lifeai.local', 'password': 'senha'}
+        resposta = self.client.post('/registro/', dados, format='json')
+        self.assertEqual(resposta.data['message'], 'Nome de usuário já em uso.')
+
+        dados = {'username': 'maria2', 'email': 'MARIA@lifeai.local', 'password': 'senha'}
+        resposta = self.client.post('/registro/', dados, format='json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.data['message'], 'Email já em uso.')
+        self.assertFalse(User.objects.filter(username='maria2').exists())
+        self.assertFalse(models.EmailOutbox.objects.filter(destinatario='MARIA@lifeai.local').exists())
+
+
+@override_settings(LIMITE_TAXA_ENDPOINTS={'teste': {'capacidade': 2, 'por_minuto': 6}}, LIMITE_TAXA_MAX_EM_VOO=1,
+                   LIMITE_TAXA_RETRY_AFTER_GLOBAL=7)
+class LimiteTaxaTests(TestCase):
+    def setUp(self):
+        self.backend = BackendMemoria()
+        patcher = patch('core.services.limite_taxa.get_backend', return_value=self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fabrica = AsyncRequestFactory()
+        self.liberar = asyncio.Event()
+        self.liberar.set()
+
+    def requisicao(self, user_id, metodo='post'):
+        user = User(id=user_id)
+        token = RefreshToken.for_user(user).access_token
+        return getattr(self.fabrica, metodo)('/teste/', headers={'Authorization': f'Bearer {token}'})
+
+    def view(self, stream=False):
+        @limitar_taxa('teste')
+        async def view(request):
+            await self.liberar.wait()
+            if stream:
+                async def partes():
+                    yield b'a'
+                    yield b'b'
+                return StreamingHttpResponse(partes())
+            return JsonResponse({'ok': True})
+        return view
+
+    async def test_balde_recusa_e_recarrega(self):
+        relogio = patch('core.services.limite_taxa.time')
+        tempo = relogio.start()
+        self.addCleanup(relogio.stop)
+        tempo.monotonic.return_value = 100.0
+
+        self.assertEqual(await self.backend.consumir('u', 2, 0.5), (True, 0))
+        self.assertEqual(await self.backend.consumir('u', 2, 0.5), (True, 0))
+        self.assertEqual(await self.backend.consumir('u', 2, 0.5), (False, 2.0))
+
+        tempo.monotonic.return_value = 101.0
+        self.assertEqual(await self.backend.consumir('u', 2, 0.5), (False, 1.0))
+        tempo.monotonic.return_value = 102.0
+        self.assertEqual(await self.backend.consumir('u', 2, 0.5), (True, 0))
+        # Outro usuário tem o próprio balde
+        self.assertEqual(await self.backend.consumir('v', 2, 0.5), (True, 0))
+
+    async def test_429_so_para_o_usuario_que_estourou(self):
+        view = self.view()
+        for _ in range(2):
+            self.assertEqual((await view(self.requisicao(1))).status_code, 200)
+
+        recusada = await view(self.requisicao(1))
+        self.assertEqual(recusada.status_code, 429)
+        # 6 por minuto: o próximo token chega em 10 segundos
+        self.assertEqual(recusada['Retry-After'], '10')
+        self.assertEqual((await view(self.requisicao(2))).status_code, 200)
+
+    async def test_503_com_o_limite_global_em_voo(self):
+        view = self.view()
+        self.liberar.clear()
+        primeira = asyncio.create_task(view(self.requisicao(1)))
+        await asyncio.sleep(0)
+
+        recusada = await view(self.requisicao(2))
+        self.assertEqual(recusada.status_code, 503)
+        self.assertEqual(recusada['Retry-After'], '7')
+
+        self.liberar.set()
+        self.assertEqual((await primeira).status_code, 200)
+        self.assertEqual((await view(self.requisicao(2))).status_code, 200)
+
+    async def test_stream_libera_a_vaga_quando_termina(self):
+        view = self.view(stream=True)
+        resposta = await view(self.requisicao(1))
+        self.assertEqual(self.backend._em_voo['global'], 1)
+        self.assertEqual((await view(self.requisicao(2))).status_code, 503)
+
+        self.assertEqual(b''.join([parte async for parte in resposta.streaming_content]), b'ab')
+        self.assertEqual(self.backend._em_voo['global'], 0)
+
+        # Stream fechado no meio (cliente desconectou) também devolve a vaga
+        async def conteudo():
+            yield b'a'
+            yield b'b'
+
+        await self.backend.entrar('global', 1)
+        partes = liberar_ao_fim(conteudo(), self.backend)
+        self.assertEqual(await anext(partes), b'a')
+        await partes.aclose()
+        self.assertEqual(self.backend._em_voo['global'], 0)
+
+    async def test_get_nao_passa_pelo_limitador(self):
+        view = self.view()
+        for _ in range(5):
+            self.assertEqual((await view(self.requisicao(1, 'get'))).status_code, 200)
+        self.assertEqual((self.backend._baldes, self.backend._em_voo), ({}, {}))
+
+    async def test_backend_cache_renova_o_ttl_em_voo(self):
+        backend = BackendCache()
+        chave = 'limite_taxa:em_voo:global'
+        await cache.adelete(chave)
+        self.addCleanup(cache.delete, chave)
+        # Chave criada há quase 5 minutos, ainda com requisições em voo
+        await cache.aset(chave, 1, 1)
+
+        with patch.object(cache, 'atouch', wraps=cache.atouch) as renovar:
+            self.assertTrue(await backend.entrar('global', 3))
+        renovar.assert_awaited_once_with(chave, BackendCache.TTL_EM_VOO)
+        self.assertEqual(await cache.aget(chave), 2)
+
+        self.assertTrue(await backend.entrar('global', 3))
+        self.assertFalse(await backend.entrar('global', 3))
+        await backend.sair('global')
+        self.assertEqual(await cache.aget(chave), 2)
+
+
+class ClienteLLMTests(TestCase):
+    def test_cliente_do_loop_e_fechado_quando_o_loop_termina(self):
+        cliente = ClienteLLM.from_settings()
+
+        async def usar():
+            client, _ = await cliente._recursos_do_loop()
+            self.assertIs((await cliente._recursos_do_loop())[0], client)
+            return client
+
+        clientes = [asyncio.run(usar()), async_to_sync(usar)()]
+        self.assertNotEqual(*clientes)
+        self.assertTrue(all(client.is_closed for client in clientes))
+        self.assertEqual(cliente._por_loop, {})
+
+    def relogio(self, inicio=100.0):
+        relogio = patch('core.services.cliente_llm.time')
+        tempo = relogio.start()
+        self.addCleanup(relogio.stop)
+        tempo.monotonic.return_value = inicio
+        return tempo
+
+    def test_circuito_abre_depois_do_limite_de_falhas(self):
+        tempo = self.relogio()
+        circuito = CircuitBreaker(limite_falhas=3, tempo_reset=30)
+        for _ in range(2):
+            circuito.permitir()
+            circuito.registrar_falha()
+        self.assertEqual(circuito.estado, CircuitBreaker.FECHADO)
+        circuito.registrar_falha()
+        self.assertEqual(circuito.estado, CircuitBreaker.ABERTO)
+
+        tempo.monotonic.return_value = 110.5
+        with self.assertRaises(CircuitoAbertoError) as erro:
+            circuito.permitir()
+        self.assertEqual(erro.exception.retry_after, 20)
+
+    def test_circuito_meio_aberto_libera_uma_unica_sonda(self):
+        tempo = self.relogio()
+        circuito = CircuitBreaker(limite_falhas=1, tempo_reset=30)
+        circuito.registrar_falha()
+
+        tempo.monotonic.return_value = 130.0
+        circuito.permitir()
+        self.assertEqual(circuito.estado, CircuitBreaker.MEIO_ABERTO)
+        with self.assertRaises(CircuitoAbertoError) as erro:
+            circuito.permitir()
+        self.assertEqual(erro.exception.retry_after, 30)
+
+        circuito.registrar_sucesso()
+        self.assertEqual((circuito.estado, circuito.falhas), (CircuitBreaker.FECHADO, 0))
+        circuito.permitir()
+
+    def test_sonda_que_falha_reabre_o_circuito(self):
+        tempo = self.relogio()
+        circuito = CircuitBreaker(limite_falhas=3, tempo_reset=30)
+        for _ in range(3):
+            circuito.registrar_falha()
+        tempo.monotonic.return_value = 131.0
+        circuito.permitir()
+
+        circuito.registrar_falha()
+        self.assertEqual(circuito.estado, CircuitBreaker.ABERTO)
+        tempo.monotonic.return_value = 132.0
+        with self.assertRaises(CircuitoAbertoError) as erro:
+            circuito.permitir()
+        self.assertEqual(erro.exception.retry_after, 29)
+
+    @override_settings(LLM_MAX_TENTATIVAS=1)
+    async def test_so_erros_5xx_contam_para_o_circuito(self):
+        respostas = iter([400, 404, 400, 500, 503])
+        chamadas = []
+
+        def responder(request):
+            chamadas.append(request.url.path)
+            return httpx.Response(next(respostas), json={'erro': 'x'})
+
+        cliente = ClienteLLM(url_base='https://llm.teste/v1/models/gemini', api_key='chave', max_concorrencia=2,
+                             max_keepalive=1, keepalive_expiry=5, espera_slot=1,
+                             circuit_breaker=CircuitBreaker(limite_falhas=2, tempo_reset=30),
+                             transport=httpx.MockTransport(responder))
+        try:
+            for _ in range(3):
+                with self.assertRaises(httpx.HTTPStatusError):
+                    await cliente.gerar([], 'sistema', 0.5, 5)
+            self.assertEqual((cliente.circuit_breaker.estado, cliente.circuit_breaker.falhas),
+                             (CircuitBreaker.FECHADO, 0))
+
+            for _ in range(2):
+                with self.assertRaises(RetryError):
+                    await cliente.gerar([], 'sistema', 0.5, 5)
+            self.assertEqual(cliente.circuit_breaker.estado, CircuitBreaker.ABERTO)
+            with self.assertRaises(CircuitoAbertoError):
+                await cliente.gerar([], 'sistema', 0.5, 5)
+            self.assertEqual(len(chamadas), 5)
+        finally:
+            await cliente.fechar()
+
+
+class ArmazemConversasTests(TestCase):
+    def setUp(self):
+        relogio = patch('core.services.conversas.time')
+        self.tempo = relogio.start()
+        self.addCleanup(relogio.stop)
+        self.tempo.monotonic.return_value = 100.0
+
+    def armazem(self, **limites):
+        config = {'max_sessoes': 10, 'ttl': 60, 'max_mensagens': 10, 'max_bytes_sessao': 1000,
+                  'memoria_total': 10000, **limites}
+        return ArmazemConversas(**config)
+
+    def mensagem(self, texto):
+        return {'role': 'user', 'content': texto}
+
+    def test_sessao_ociosa_expira_pelo_ttl(self):
+        armazem = self.armazem()
+        armazem.adicionar(1, 'sessao', self.mensagem('oi'))
+
+        self.tempo.monotonic.return_value = 159.0
+        self.assertEqual(armazem.obter(1, 'sessao'), ('', [self.mensagem('oi')], 0))
+        # O acesso renova o prazo: expira 60s depois da última leitura
+        self.tempo.monotonic.return_value = 218.0
+        self.assertEqual(len(armazem.obter(1, 'sessao')[1]), 1)
+        self.tempo.monotonic.return_value = 278.0
+        self.assertEqual(armazem.obter(1, 'sessao'), ('', [], 0))
+        self.assertEqual(armazem.metricas()['despejos_ttl'], 1)
+
+    def test_orcamento_global_despeja_a_sessao_menos_usada(self):
+        armazem = self.armazem(memoria_total=10)
+        armazem.adicionar(1, 'a', self.mensagem('aaaa'))
+        armazem.adicionar(1, 'b', self.mensagem('bbbb'))
+        armazem.obter(1, 'a')
+        armazem.adicionar(1, 'c', self.mensagem('cccc'))
+
+        self.assertEqual(armazem.obter(1, 'b')[1], [])
+        self.assertEqual(armazem.obter(1, 'a')[1], [self.mensagem('aaaa')])
+        self.assertEqual(armazem.obter(1, 'c')[1], [self.mensagem('cccc')])
+        metricas = armazem.metricas()
+        self.assertEqual((metricas['despejos_lru'], metricas['sessoes'], metricas['bytes']), (1, 2, 8))
+
+    def test_limite_de_sessoes_despeja_a_mais_antiga(self):
+        armazem = self.armazem(max_sessoes=2)
+        for sessao in ('a', 'b', 'c'):
+            armazem.adicionar(1, sessao, self.mensagem(sessao))
+        self.assertEqual(armazem.obter(1, 'a')[1], [])
+        self.assertEqual(armazem.metricas()['sessoes'], 2)
+
+    def test_sessao_guarda_so_as_ultimas_mensagens(self):
+        armazem = self.armazem(max_mensagens=3, max_bytes_sessao=8)
+        armazem.adicionar(1, 'sessao', *[self.mensagem(str(i)) for i in range(5)])
+        _, mensagens, inicio = armazem.obter(1, 'sessao')
+        self.assertEqual(([m['content'] for m in mensagens], inicio), (['2', '3', '4'], 2))
+
+        # Também corta pelo tamanho em bytes da sessão
+        armazem.adicionar(1, 'sessao', self.mensagem('abcdefg'))
+        _, mensagens, inicio = armazem.obter(1, 'sessao')
+        self.assertEqual(([m['content'] for m in mensagens], inicio), (['4', 'abcdefg'], 4))
+        self.assertEqual(armazem.metricas()['mensagens_cortadas'], 4)
+
+    def test_sessao_e_separada_por_usuario(self):
+        armazem = self.armazem()
+        armazem.adicionar(1, 'sessao', self.mensagem('segredo'))
+        self.assertEqual(armazem.obter(2, 'sessao'), ('', [], 0))
+        armazem.remover(2, 'sessao')
+        self.assertEqual(armazem.obter(1, 'sessao')[1], [self.mensagem('segredo')])
+
+    def test_metricas(self):
+        armazem = self.armazem()
+        armazem.obter(1, 'sessao')
+        armazem.adicionar(1, 'sessao', self.mensagem('olá'), self.mensagem('oi'))
+        armazem.obter(1, 'sessao')
+        armazem.obter(1, 'sessao')
+        self.assertEqual(armazem.metricas(), {
+            'hits': 2, 'misses': 1, 'despejos_lru': 0, 'despejos_ttl': 0, 'mensagens_cortadas': 0,
+            'sessoes': 1, 'bytes': 6,
+        })
+        armazem.remover(1, 'sessao')
+        self.assertEqual((armazem.metricas()['sessoes'], armazem.metricas()['bytes']), (0, 0))
+
+
+class ResumoChatTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('resumo', 'resumo@lifeai.local', 'senha')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        conversas.remover(self.user.id, 'sessao')
+        conversas.adicionar(self.user.id, 'sessao', {'role': 'user', 'content': 'Oi'},
+                            {'role': 'assistant', 'content': 'Olá!'})
+
+    async def test_resposta_nao_espera_o_resumo(self):
+        liberar = asyncio.Event()
+
+        async def resumir(resumo, mensagens):
+            await liberar.wait()
+            return 'Paciente cumprimentou.'
+
+        async def perguntar(*args):
+            return 'Durma 8 horas.'
+
+        with patch.object(compactador, 'janela', 2), patch.object(compactador, 'intervalo', 2), \
+                patch.object(compactador, 'resumir', resumir), \
+                patch('core.services.api_ia.perguntar_ia_gemini', perguntar):
+            resposta = await AsyncClient().post('/chat-ia/', {'pergunta': 'Como dormir?', 'sessao_id': 'sessao'},
+                                                content_type='application/json',
+                                                headers={'Authorization': f'Bearer {self.token}'})
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual(conversas.obter(self.user.id, 'sessao')[0], '')
+
+            liberar.set()
+            await _resumos_em_andamento[(self.user.id, 'sessao')]
+
+        resumo, mensagens, inicio = conversas.obter(self.user.id, 'sessao')
+        self.assertEqual(resumo, 'Paciente cumprimentou.')
+        self.assertEqual([m['content'] for m in mensagens], ['Como dormir?', 'Durma 8 horas.'])
+        self.assertEqual(inicio, 2)
+        self.assertEqual(_resumos_em_andamento, {})
+
+
+class StreamTeste(httpx.AsyncByteStream):
+    def __init__(self, trechos):
+        self.trechos = trechos
+        self.fechado = False
+
+    async def __aiter__(self):
+        for trecho in self.trechos:
+            yield ('data: ' + json.dumps({'candidates': [{'content': {'parts': [{'text': trecho}]}}]}) + '\r\n\r\n').encode()
+
+    async def aclose(self):
+        self.fechado = True
+
+
+@override_settings(LIMITE_TAXA_ENDPOINTS={})
+class StreamChatTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('stream', 'stream@lifeai.local', 'senha')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        conversas.remover(self.user.id, 'sessao')
+        self.stream = StreamTeste(['Durma ', '8 horas.'])
+        self.cliente = ClienteLLM(url_base='https://llm.teste/v1/models/gemini', api_key='chave', max_concorrencia=1,
+                                  max_keepalive=1, keepalive_expiry=5, espera_slot=0.1,
+                                  circuit_breaker=CircuitBreaker(limite_falhas=5, tempo_reset=30),
+                                  transport=httpx.MockTransport(self.responder))
+        patcher = patch('core.services.api_ia.get_cliente_llm', return_value=self.cliente)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def responder(self, request):
+        self.assertEqual(request.url.params['alt'], 'sse')
+        return httpx.Response(200, headers={'Content-Type': 'text/event-stream'}, stream=self.stream)
+
+    async def semaforo(self):
+        return (await self.cliente._recursos_do_loop())[1]
+
+    async def test_eventos_sse_e_historico_so_no_fim(self):
+        try:
+            resposta = await AsyncClient().post('/chat-ia/', {'pergunta': 'Como dormir?', 'sessao_id': 'sessao',
+                                                              'stream': True},
+                                                content_type='application/json',
+                                                headers={'Authorization': f'Bearer {self.token}'})
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+            self.assertEqual(resposta['Cache-Control'], 'no-cache')
+
+            eventos = aiter(resposta.streaming_content)
+            self.assertEqual(await anext(eventos), 'data: {"trecho": "Durma "}\n\n'.encode())
+            self.assertEqual(conversas.obter(self.user.id, 'sessao')[1], [])
+
+            self.assertEqual(b''.join([evento async for evento in eventos]).decode(), (
+                'data: {"trecho": "8 horas."}\n\n'
+                'event: fim\ndata: {"resposta": "Durma 8 horas."}\n\n'
+            ))
+            self.assertEqual(conversas.obter(self.user.id, 'sessao')[1], [
+                {'role': 'user', 'content': 'Como dormir?'},
+                {'role': 'assistant', 'content': 'Durma 8 horas.'},
+            ])
+            self.assertTrue(self.stream.fechado)
+            self.assertFalse((await self.semaforo()).locked())
+        finally:
+            await self.cliente.fechar()
+
+    async def test_cliente_desconectado_fecha_o_upstream_e_libera_o_slot(self):
+        try:
+            trechos = perguntar_ia_gemini_stream([{'role': 'user', 'content': 'Como dormir?'}], 'sistema')
+            primeiro = await anext(trechos)
+            self.assertTrue((await self.semaforo()).locked())
+
+            eventos = stream_chat(trechos, primeiro, self.user.id, 'sessao', '', [],
+                                  0, {'role': 'user', 'content': 'Como dormir?'})
+            self.assertEqual(await anext(eventos), 'data: {"trecho": "Durma "}\n\n')
+            await eventos.aclose()
+
+            self.assertTrue(self.stream.fechado)
+            self.assertFalse((await self.semaforo()).locked())
+            self.assertEqual(conversas.obter(self.user.id, 'sessao')[1], [])
+        finally:
+            await self.cliente.fechar()
+
+
+@override_settings(LIMITE_TAXA_ENDPOINTS={})
+class JobsDietaTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('jobs', 'jobs@lifeai.local', 'senha')
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def pedir(self, pergunta):
+        resposta = self.client.post('/gerar-dieta-ia/', {'pergunta': pergunta}, format='json')
+        self.assertEqual(resposta.status_code, 202)
+        return resposta.json()['job_id']
+
+    def test_reaproveita_so_o_job_ativo_da_mesma_pergunta(self):
+        primeiro = self.pedir('{"objetivo": "emagrecer", "refeicoes": 4}')
+        self.assertEqual(self.pedir('{"refeicoes": 4,  "objetivo": "emagrecer"}'), primeiro)
+        outro = self.pedir('{"objetivo": "ganhar massa", "refeicoes": 4}')
+        self.assertNotEqual(outro, primeiro)
+        self.assertEqual(models.JobDieta.objects.get(id=outro).pergunta, '{"objetivo": "ganhar massa", "refeicoes": 4}')
+
+        models.JobDieta.objects.filter(id=primeiro).update(status=models.JobDieta.ERRO)
+        self.assertNotIn(self.pedir('{"objetivo": "emagrecer", "refeicoes": 4}'), (primeiro, outro))
+
+    def test_banco_impede_dois_jobs_ativos_da_mesma_pergunta(self):
+        job = models.JobDieta.objects.create(id_usuario=self.user, pergunta='dieta', chave=chave_pergunta('dieta'))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.JobDieta.objects.create(id_usuario=self.user, pergunta='Dieta ', chave=chave_pergunta('Dieta '),
+                                           status=models.JobDieta.PROCESSANDO)
+        job.status = models.JobDieta.CONCLUIDO
+        job.save()
+        models.JobDieta.objects.create(id_usuario=self.user, pergunta='dieta', chave=chave_pergunta('dieta'))
+
+    async def test_force_new_ignora_o_cache_de_dietas(self):
+        planos = iter([{'plano_diario': [1]}, {'plano_diario': [2]}])
+
+        async def gerar(pergunta, contexto):
+            return json.dumps(next(planos))
+
+        async def processar(force_new):
+            job = await models.JobDieta.objects.acreate(id_usuario=self.user, pergunta='dieta', force_new=force_new,
+                                                        status=models.JobDieta.PROCESSANDO)
+            await processar_job(job)
+            return await models.JobDieta.objects.select_related('dieta__plano').aget(id=job.id)
+
+        cache_dietas._itens.clear()
+        with patch('core.services.jobs_dieta.gerar_dieta_gemini', gerar):
+            primeiro = await processar(False)
+            self.assertEqual((await processar(False)).dieta.plano_alimentar, primeiro.dieta.plano_alimentar)
+            novo = await processar(True)
+        self.assertEqual(novo.status, models.JobDieta.CONCLUIDO)
+        self.assertEqual(novo.dieta.plano_alimentar, {'plano_diario': [2]})
+
+    async def test_falha_ao_montar_contexto_marca_o_job(self):
+        job = await models.JobDieta.objects.acreate(id_usuario=self.user, pergunta='dieta',
+                                                    status=models.JobDieta.PROCESSANDO)
+        with patch('core.services.jobs_dieta.obter_contexto_ia', side_effect=ConnectionError):
+            await processar_job(job)
+        job = await models.JobDieta.objects.aget(id=job.id)
+        self.assertEqual((job.status, job.erro), (models.JobDieta.ERRO, 'Erro interno.'))
+
+    def test_force_new_fica_no_job(self):
+        resposta = self.client.post('/gerar-dieta-ia/', {'pergunta': 'dieta', 'force_new': 'true'}, format='json')
+        self.assertTrue(models.JobDieta.objects.get(id=resposta.json()['job_id']).force_new)
+        self.client.post('/gerar-dieta-ia/', {'pergunta': 'outra', 'force_new': 'false'}, format='json')
+        self.assertFalse(models.JobDieta.objects.get(pergunta='outra').force_new)
+
+    async def test_worker_le_o_contexto_do_banco(self):
+        await models.PerfilUsuario.objects.acreate(id_usuario=self.user, nome='Ana', sexo='F', idade=30,
+                                                   objetivo='Saúde', restricoes_alimentares='Nenhuma')
+        await obter_contexto_ia(self.user.id)
+        # Alteração feita por outro processo: o sinal de invalidação não chega ao cache deste
+        await models.PerfilUsuario.objects.filter(id_usuario=self.user).aupdate(restricoes_alimentares='Sem lactose')
+        self.assertIn('Nenhuma', (await obter_contexto_ia(self.user.id))['contexto_dieta'])
+
+        contextos = []
+
+        async def gerar(pergunta, contexto):
+            contextos.append(contexto)
+            return '{"plano_diario": []}'
+
+        job = await models.JobDieta.objects.acreate(id_usuario=self.user, pergunta='dieta',
+                                                    status=models.JobDieta.PROCESSANDO)
+        with patch('core.services.jobs_dieta.gerar_dieta_gemini', gerar):
+            await processar_job(job)
+        self.assertIn('Sem lactose', contextos[0])
+
+    async def test_falha_ao_ler_o_perfil_nao_fica_no_cache(self):
+        await models.PerfilUsuario.objects.acreate(id_usuario=self.user, nome='Ana', sexo='F', idade=30,
+                                                   objetivo='Saúde', restricoes_alimentares='Sem glúten')
+        with patch('core.services.contexto_ia.carregar_perfil_ia', side_effect=ConnectionError), \
+                self.assertLogs('core.services.contexto_ia', 'ERROR'):
+            degradado = await obter_contexto_ia(self.user.id)
+        self.assertIsNone(degradado['perfil'])
+        self.assertIn('Sem glúten', (await obter_contexto_ia(self.user.id))['contexto_dieta'])
+
+
+    async def test_circuito_aberto_nao_esgota_as_tentativas_numa_passada(self):
+        job = await models.JobDieta.objects.acreate(id_usuario=self.user, pergunta='dieta', force_new=True)
+        chamadas = []
+
+        async def gerar(pergunta, contexto):
+            chamadas.append(pergunta)
+            raise CircuitoAbertoError(retry_after=40)
+
+        worker = ProcessarDietas(stdout=io.StringIO())
+        # O loop de teste não roda na thread principal, onde ficam os handlers de sinal
+        with patch.object(asyncio.get_running_loop(), 'add_signal_handler'), \
+                patch('core.services.jobs_dieta.gerar_dieta_gemini', gerar):
+            await worker.executar(concorrencia=2, intervalo=0.01, uma_vez=True)
+
+        job = await models.JobDieta.objects.aget(id=job.id)
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual((job.status, job.tentativas), (models.JobDieta.PENDENTE, 1))
+        espera = (job.disponivel_em - timezone.now()).total_seconds()
+        self.assertTrue(35 < espera <= 40, espera)
+
+    def test_job_adiado_so_volta_a_ser_reservado_depois_do_backoff(self):
+        job = models.JobDieta.objects.create(id_usuario=self.user, pergunta='dieta',
+                                             disponivel_em=timezone.now() + timedelta(seconds=30))
+        self.assertEqual(reservar_jobs(5), [])
+
+        models.JobDieta.objects.filter(id=job.id).update(disponivel_em=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([j.id for j in reservar_jobs(5)], [job.id])
+
+    async def test_tentativas_temporarias_esgotadas_marcam_erro(self):
+        async def gerar(pergunta, contexto):
+            raise CircuitoAbertoError(retry_after=1)
+
+        job = await models.JobDieta.objects.acreate(id_usuario=self.user, pergunta='dieta', force_new=True,
+                                                    tentativas=3, status=models.JobDieta.PROCESSANDO)
+        with patch('core.services.jobs_dieta.gerar_dieta_gemini', gerar):
+            await processar_job(job)
+        job = await models.JobDieta.objects.aget(id=job.id)
+        self.assertEqual(job.status, models.JobDieta.ERRO)
+
+class BackendEmailTeste(locmem.EmailBackend):
+    aberturas = 0
+
+    def open(self):
+        BackendEmailTeste.aberturas += 1
+        return super().open()
+
+    def send_messages(self, mensagens):
+        if any('falha' in destinatario for m in mensagens for destinatario in m.to):
+            raise ConnectionResetError('SMTP caiu')
+        return super().send_messages(mensagens)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.BackendEmailTeste', EMAIL_OUTBOX_BACKOFF_BASE=30,
+                   EMAIL_OUTBOX_BACKOFF_MAX=3600, EMAIL_OUTBOX_MAX_TENTATIVAS=3)
+class OutboxEmailTests(TestCase):
+    def setUp(self):
+        BackendEmailTeste.aberturas = 0
+        self.user = User.objects.create_user('outbox', 'outbox@lifeai.local', 'senha')
+
+    def enfileirar(self, *destinatarios):
+        for destinatario in destinatarios:
+            models.EmailOutbox.objects.create(id_usuario=self.user, tipo=models.EmailOutbox.BOAS_VINDAS,
+                                              destinatario=destinatario)
+
+    def test_lote_usa_uma_conexao_e_isola_falhas(self):
+        self.enfileirar('a@lifeai.local', 'falha@lifeai.local', 'b@lifeai.local')
+        self.assertEqual(enviar_lote(reservar_emails(10)), 2)
+        self.assertEqual(BackendEmailTeste.aberturas, 1)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['a@lifeai.local', 'b@lifeai.local'])
+
+        falha = models.EmailOutbox.objects.get(destinatario='falha@lifeai.local')
+        self.assertEqual((falha.status, falha.tentativas, falha.erro), (models.EmailOutbox.PENDENTE, 1, 'SMTP caiu'))
+        self.assertAlmostEqual((falha.proxima_tentativa - timezone.now()).total_seconds(), 30, delta=5)
+        self.assertFalse(models.EmailOutbox.objects.filter(status=models.EmailOutbox.ENVIADO, enviado_em=None).exists())
+
+    def test_reserva_respeita_o_backoff_e_desiste_no_limite(self):
+        self.enfileirar('falha@lifeai.local')
+        for tentativa in range(1, 4):
+            emails = reservar_emails(10)
+            self.assertEqual(len(emails), 1)
+            self.assertEqual(reservar_emails(10), [])
+            enviar_lote(emails)
+            models.EmailOutbox.objects.update(proxima_tentativa=timezone.now())
+
+        email = models.EmailOutbox.objects.get()
+        self.assertEqual((email.status, email.tentativas), (models.EmailOutbox.ERRO, 3))
+        self.assertEqual(reservar_emails(10), [])
+
+    def test_falha_ao_abrir_conexao_conta_para_todo_o_lote(self):
+        self.enfileirar('a@lifeai.local', 'b@lifeai.local')
+        with patch.object(BackendEmailTeste, 'open', side_effect=OSError('sem rede')):
+            self.assertEqual(enviar_lote(reservar_emails(10)), 0)
+        self.assertEqual(list(models.EmailOutbox.objects.order_by().values_list('tentativas', 'erro').distinct()),
+                         [(1, 'sem rede')])
+        self.assertEqual(mail.outbox, [])
+
+    def test_backoff_exponencial_com_teto(self):
+        self.assertEqual([backoff(n) for n in (1, 2, 3, 8, 20)], [30, 60, 120, 3600, 3600])
+
+
+class PaginacaoKeysetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('paginacao', 'paginacao@lifeai.local', 'senha')
+        # Vários registros no mesmo dia: o desempate pelo id precisa manter a ordem entre páginas
+        for i in range(11):
+            models.RegistroCorporal.objects.create(id_usuario=cls.user, data_consulta=date(2024, 1, 1 + i // 4),
+                                                   peso=70 + i, altura=1.7)
+        for i in range(7):
+            models.Compromisso.objects.create(id_usuario=cls.user, titulo=f'C{i}', data=date(2024, 5, 1 + i // 3),
+                                              hora_inicio=time(8 + i % 3), hora_fim=time(12))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def percorrer(self, url, limite):
+        ids, params, paginas = [], {'limite': limite}, 0
+        while True:
+            dados = self.client.get(url, params).data
+            paginas += 1
+            self.assertLessEqual(len(dados['resultados']), limite)
+            ids += [item['id'] for item in dados['resultados']]
+            if dados['cursor'] is None:
+                self.assertIsNone(dados['proximo'])
+                return ids, paginas
+            self.assertIn(f"cursor={dados['cursor']}", dados['proximo'])
+            params = {'limite': limite, 'cursor': dados['cursor']}
+
+    def test_paginas_cobrem_tudo_na_ordem_com_empates(self):
+        for url, queryset, ordem in (
+            ('/imc/registrosConsultas/', models.RegistroCorporal.objects, ('-data_consulta', '-id')),
+            ('/compromissos/', models.Compromisso.objects, ('-data', 'hora_inicio', 'id')),
+        ):
+            esperado = list(queryset.filter(id_usuario=self.user).order_by(*ordem).values_list('id', flat=True))
+            for limite in (1, 3, 4, len(esperado), 50):
+                ids, paginas = self.percorrer(url, limite)
+                with self.subTest(url=url, limite=limite):
+                    self.assertEqual(ids, esperado)
+                    self.assertEqual(paginas, max(1, -(-len(esperado) // limite)))
+
+    def test_ultima_pagina_exata_nao_tem_cursor(self):
+        dados = self.client.get('/imc/registrosConsultas/', {'limite': 11}).data
+        self.assertEqual((len(dados['resultados']), dados['cursor']), (11, None))
+
+    def test_limite_invalido_ou_acima_do_maximo(self):
+        with override_settings(PAGINACAO_LIMITE_PADRAO=2, PAGINACAO_LIMITE_MAXIMO=5):
+            for limite, esperado in (('abc', 2), (0, 2), (-3, 2), (100, 5)):
+                dados = self.client.get('/imc/registrosConsultas/', {'limite': limite}).data
+                with self.subTest(limite=limite):
+                    self.assertEqual(len(dados['resultados']), esperado)
+
+    def test_cursor_invalido(self):
+        valido = self.client.get('/imc/registrosConsultas/', {'limite': 2}).data['cursor']
+        self.assertEqual(self.client.get('/imc/registrosConsultas/', {'cursor': valido}).status_code, 200)
+        for cursor in ('%%%', 'bm9wZQ', base64.urlsafe_b64encode(b'[1]').decode(),
+                       base64.urlsafe_b64encode(b'["ontem", 3]').decode(),
+                       base64.urlsafe_b64encode(b'{"a": 1}').decode()):
+            resposta = self.client.get('/imc/registrosConsultas/', {'cursor': cursor})
+            with self.subTest(cursor=cursor):
+                self.assertEqual(resposta.status_code, 404)
+                self.assertEqual(resposta.data['detail'], 'Cursor inválido.')
+
+    def test_modo_legado(self):
+        self.assertIsInstance(self.client.get('/imc/registrosConsultas/').data, list)
+        self.assertEqual(len(self.client.get('/imc/registrosConsultas/').data), 11)
+        self.assertIn('resultados', self.client.get('/imc/registrosConsultas/', {'limite': 2}).data)
+        with override_settings(PAGINACAO_LEGADO_PADRAO=False, PAGINACAO_LIMITE_PADRAO=4):
+            dados = self.client.get('/imc/registrosConsultas/').data
+        self.assertEqual(len(dados['resultados']), 4)
+
+
+@override_settings(SYNC_MARGEM=60)
+class SincronizacaoTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('sync', 'sync@lifeai.local', 'senha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.registros = [
+            models.RegistroCorporal.objects.create(id_usuario=self.user, data_consulta=date(2024, 1, 1 + i),
+                                                   peso=70, altura=1.7)
+            for i in range(3)
+        ]
+        self.compromisso = models.Compromisso.objects.create(id_usuario=self.user, titulo='Treino',
+                                                             data=date(2024, 1, 1), hora_inicio=time(8),
+                                                             hora_fim=time(9))
+        models.CompromissoAtividade.objects.create(compromisso=self.compromisso, descricao='Correr')
+        self.envelhecer(minutos=10)
+
+    def envelhecer(self, minutos):
+        # update() não passa pelo auto_now: simula registros gravados há algum tempo
+        momento = timezone.now() - timedelta(minutes=minutos)
+        for model in (models.RegistroCorporal, models.Compromisso, models.CompromissoAtividade):
+            model.objects.update(atualizado_em=momento)
+
+    def sincronizar(self, token=None):
+        resposta = self.client.get('/sync/', {'since': token} if token else {})
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.data
+
+    def test_sincronizacao_completa_e_depois_so_o_que_mudou(self):
+        inicial = self.sincronizar()
+        self.assertTrue(inicial['completo'])
+        self.assertEqual(len(inicial['alteracoes']['registros']), 3)
+
+        self.assertEqual(self.client.patch(f'/compromissos/{self.compromisso.id}/', {'titulo': 'Corrida'},
+                                           format='json').status_code, 200)
+        delta = self.sincronizar(inicial['token'])
+        self.assertFalse(delta['completo'])
+        self.assertEqual([c['titulo'] for c in delta['alteracoes']['compromissos']], ['Corrida'])
+        self.assertEqual(delta['alteracoes']['registros'], [])
+        self.assertEqual(delta['alteracoes']['atividades'], [])
+
+    def test_exclusao_vira_tombstone(self):
+        token = self.sincronizar()['token']
+        removido = self.registros[0].id
+        self.assertEqual(self.client.delete(f'/imc/{removido}/').status_code, 204)
+        self.client.delete(f'/compromissos/{self.compromisso.id}/')
+
+        self.assertTrue(models.Exclusao.objects.filter(id_usuario=self.user, tipo='registros',
+                                                       objeto_id=removido).exists())
+        exclusoes = self.sincronizar(token)['exclusoes']
+        self.assertEqual(exclusoes['registros'], [removido])
+        self.assertEqual(exclusoes['compromissos'], [self.compromisso.id])
+        self.assertNotIn('atividades', exclusoes)
+
+    def test_margem_reentrega_gravacoes_proximas_do_token(self):
+        # Gravado 30s antes da sincronização: dentro da margem de 60s, volta na próxima
+        self.envelhecer(minutos=0.5)
+        token = self.sincronizar()['token']
+        self.assertEqual(len(self.sincronizar(token)['alteracoes']['registros']), 3)
+
+        self.envelhecer(minutos=2)
+        token = self.sincronizar()['token']
+        self.assertEqual(self.sincronizar(token)['alteracoes']['registros'], [])
+
+    def test_token_invalido_ou_expirado(self):
+        self.assertEqual(self.client.get('/sync/', {'since': 'nao-e-token'}).status_code, 400)
+        antigo = codificar_token(timezone.now() - timedelta(days=365))
+        self.assertTrue(self.sincronizar(antigo)['completo'])
+
+
+class LoteOfflineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('lote', 'lote@lifeai.local', 'senha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def registro(self, client_id, **extra):
+        return {'client_id': str(client_id), 'data_consulta': '2024-02-01', 'peso': 80, 'altura': 1.8, **extra}
+
+    def enviar(self, url, itens):
+        resposta = self.client.post(url, itens, format='json')
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        return resposta.data['resultados']
+
+    def test_classifica_cada_item_e_reenvio_nao_duplica(self):
+        ids = [uuid.uuid4() for _ in range(3)]
+        lote = [
+            self.registro(ids[0]),
+            self.registro(ids[1], peso=60),
+            {'peso': 70, 'altura': 1.7},
+            self.registro(ids[2], peso='pesado'),
+            self.registro(ids[0]),
+        ]
+        resultados = self.enviar('/imc/lote/', lote)
+        self.assertEqual([r['status'] for r in resultados], ['criado', 'criado', 'invalido', 'invalido', 'duplicado'])
+        self.assertIn('client_id', resultados[2]['erros'])
+        self.assertIn('peso', resultados[3]['erros'])
+        self.assertEqual(resultados[4]['id'], resultados[0]['id'])
+        criado = models.RegistroCorporal.objects.get(client_id=ids[0])
+        self.assertEqual((criado.imc_res, criado.classificacao), calcular_imc(80, 1.8))
+
+        with CaptureQueriesContext(connection) as capturadas:
+            reenvio = self.enviar('/imc/lote/', lote)
+        self.assertEqual([r['status'] for r in reenvio], ['duplicado', 'duplicado', 'invalido', 'invalido', 'duplicado'])
+        self.assertEqual([r.get('id') for r in reenvio[:2]], [r['id'] for r in resultados[:2]])
+        self.assertEqual(models.RegistroCorporal.objects.filter(id_usuario=self.user).count(), 2)
+        self.assertFalse([q for q in capturadas.captured_queries if q['sql'].startswith('INSERT')
+                          and 'registro_corporal' in q['sql']])
+
+    def test_reenvio_concorrente_cai_no_ignore_conflicts(self):
+        client_id = uuid.uuid4()
+
+        def concorrente(itens):
+            # Outra requisição com o mesmo lote grava entre a checagem de existentes e o INSERT
+            models.RegistroCorporal.objects.create(id_usuario=self.user, client_id=client_id,
+                                                   data_consulta=date(2024, 2, 1), peso=80, altura=1.8)
+
+        request = APIRequestFactory().post('/imc/lote/')
+        request.user = self.user
+        [resultado] = gravar_lote(request, [self.registro(client_id)], models.RegistroCorporal,
+                                  serializers.RegistroCorporalSerializer, preparar=concorrente)
+        existente = models.RegistroCorporal.objects.get(client_id=client_id)
+        self.assertEqual(resultado['id'], existente.id)
+        self.assertEqual(models.RegistroCorporal.objects.filter(id_usuario=self.user).count(), 1)
+
+    def test_outra_constraint_vira_conflito(self):
+        models.Compromisso.objects.create(id_usuario=self.user, titulo='Consulta', data=date(2024, 5, 1),
+                                          hora_inicio=time(8), hora_fim=time(9))
+        item = {'titulo': 'Treino', 'data': '2024-05-01', 'hora_inicio': '08:00', 'hora_fim': '09:00'}
+        livre = {**item, 'hora_inicio': '10:00', 'hora_fim': '11:00', 'client_id': str(uuid.uuid4())}
+        resultados = self.enviar('/compromissos/lote/', [{**item, 'client_id': str(uuid.uuid4())}, livre])
+        self.assertEqual([r['status'] for r in resultados], ['conflito', 'criado'])
+        self.assertNotIn('id', resultados[0])
+        self.assertEqual(models.Compromisso.objects.filter(id_usuario=self.user).count(), 2)
+
+    def test_lote_malformado(self):
+        self.assertEqual(self.client.post('/exercicios/lote/', {'client_id': 'x'}, format='json').status_code, 400)
+        with override_settings(LOTE_MAX_ITENS=2):
+            resposta = self.client.post('/imc/lote/', [self.registro(uuid.uuid4()) for _ in range(3)], format='json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(models.RegistroCorporal.objects.exists())
+
+
+class GraficoImcTests(TestCase):
+    def serie(self, total, pico=None):
+        inicio = date(2024, 1, 1)
+        pontos = [{'data': inicio + timedelta(days=i), 'imc_medio': 24 + (i % 7) / 10} for i in range(total)]
+        if pico is not None:
+            pontos[pico]['imc_medio'] = 40
+        return pontos
+
+    def test_lttb_mantem_extremos_e_pico(self):
+        pontos = self.serie(1000, pico=537)
+        reduzidos = lttb(pontos, 50, 'imc_medio')
+
+        self.assertEqual(len(reduzidos), 50)
+        self.assertIs(reduzidos[0], pontos[0])
+        self.assertIs(reduzidos[-1], pontos[-1])
+        self.assertIn(pontos[537], reduzidos)
+        datas = [p['data'] for p in reduzidos]
+        self.assertEqual(datas, sorted(set(datas)))
+
+    def test_lttb_nunca_passa_do_limite(self):
+        for total in (4, 10, 99, 100, 101, 1000):
+            for limite in (3, 7, 50):
+                with self.subTest(total=total, limite=limite):
+                    self.assertLessEqual(len(lttb(self.serie(total), limite, 'imc_medio')), limite)
+
+    def test_lttb_serie_curta_passa_intacta(self):
+        pontos = self.serie(10)
+        self.assertIs(lttb(pontos, 10, 'imc_medio'), pontos)
+        self.assertIs(lttb(pontos, 60, 'imc_medio'), pontos)
+        self.assertIs(lttb(pontos, 2, 'imc_medio'), pontos)
+        self.assertEqual(lttb([], 60, 'imc_medio'), [])
+
+    def test_historico_agrupado_por_mes(self):
+        user = User.objects.create_user('grafico', 'grafico@lifeai.local', 'senha')
+        for dia, imc in ((date(2024, 1, 3), 24), (date(2024, 1, 20), 26), (date(2024, 2, 1), 25)):
+            models.RegistroCorporal.objects.create(id_usuario=user, data_consulta=dia, peso=70, altura=1.7,
+                                                   imc_res=imc)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        resposta = client.get('/imc/historico/', {'agrupamento': 'mes'})
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['pontos'], [
+            {'data': date(2024, 1, 1), 'imc_min': 24, 'imc_medio': 25, 'imc_max': 26, 'registros': 2},
+            {'data': date(2024, 2, 1), 'imc_min': 25, 'imc_medio': 25, 'imc_max': 25, 'registros': 1},
+        ])
+        self.assertEqual(client.get('/imc/historico/', {'agrupamento': 'ano'}).status_code, 400)
+
+
+class DesempenhoTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('desempenho', 'desempenho@lifeai.local', 'senha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def compromisso(self, dia, hora, feitas, total):
+        compromisso = models.Compromisso.objects.create(id_usuario=self.user, titulo='Treino', data=dia,
+                                                        hora_inicio=time(hora), hora_fim=time(hora, 30))
+        for i in range(total):
+            models.CompromissoAtividade.objects.create(compromisso=compromisso, descricao=f'A{i}', done=i < feitas)
+        return compromisso
+
+    def test_mensal_mantem_uma_entrada_por_compromisso(self):
+        self.compromisso(date(2024, 3, 5), 8, 1, 4)
+        self.compromisso(date(2024, 3, 5), 10, 4, 4)
+        self.compromisso(date(2024, 4, 1), 8, 1, 1)
+
+        self.assertEqual(self.client.get('/pontuacoes/mensal/', {'ano': 2024, 'mes': 3}).data, [
+            {'data': '2024-03-05', 'emoji': '🧊', 'porcentagem': 25.0},
+            {'data': '2024-03-05', 'emoji': '🔥', 'porcentagem': 100.0},
+        ])
+        self.assertEqual(self.client.get('/pontuacoes/mensal/dias/', {'ano': 2024, 'mes': 3}).data, [
+            {'data': '2024-03-05', 'emoji': '😐', 'porcentagem': 62.5},
+        ])
+
+    def test_emoji_igual_no_banco_e_em_python(self):
+        porcentagens = [0, 32.9, 33, 65.9, 66, 100]
+        for dia, porcentagem in enumerate(porcentagens, start=1):
+            models.DesempenhoDiario.objects.create(id_usuario=self.user, data=date(2024, 3, dia),
+                                                   soma_porcentagem=porcentagem, qtd_compromissos=1)
+
+        dias = models.DesempenhoDiario.objects.filter(id_usuario=self.user).order_by('data')
+        no_banco = list(porcentagem_com_emoji(dias).values_list('emoji', flat=True))
+        self.assertEqual(no_banco, [emoji_da_porcentagem(p) for p in porcentagens])
+        self.assertEqual(no_banco, ['🧊', '🧊', '😐', '😐', '🔥', '🔥'])
+
+    def test_mensal_por_dia_le_o_rollup(self):
+        self.compromisso(date(2024, 3, 5), 8, 1, 4)
+        # Só o rollup muda: a resposta por dia acompanha, a por compromisso não
+        models.DesempenhoDiario.objects.filter(id_usuario=self.user).update(soma_porcentagem=80)
+
+        self.assertEqual(self.client.get('/pontuacoes/mensal/dias/', {'ano': 2024, 'mes': 3}).data, [
+            {'data': '2024-03-05', 'emoji': '🔥', 'porcentagem': 80.0},
+        ])
+        self.assertEqual(self.client.get('/pontuacoes/mensal/', {'ano': 2024, 'mes': 3}).data, [
+            {'data': '2024-03-05', 'emoji': '🧊', 'porcentagem': 25.0},
+        ])
+
+    def rollup(self):
+        return [(d.id_usuario_id, d.data, d.qtd_compromissos, round(d.soma_porcentagem, 6))
+                for d in models.DesempenhoDiario.objects.order_by('id_usuario', 'data')]
+
+    def assertRollupIgualRecalculo(self):
+        incremental = self.rollup()
+        recalcular_desempenho()
+        self.assertEqual(incremental, self.rollup())
+        return incremental
+
+    def test_rollup_igual_recalculo_ao_criar(self):
+        outro = User.objects.create_user('outro', 'outro@lifeai.local', 'senha')
+        models.Compromisso.objects.create(id_usuario=outro, titulo='Sem atividades', data=date(2024, 3, 5),
+                                          hora_inicio=time(8), hora_fim=time(9))
+        self.compromisso(date(2024, 3, 5), 8, 1, 3)
+        self.compromisso(date(2024, 3, 5), 10, 2, 2)
+        self.compromisso(date(2024, 3, 6), 8, 0, 1)
+
+        self.assertEqual(self.assertRollupIgualRecalculo(), [
+            (self.user.id, date(2024, 3, 5), 2, round(100 / 3 + 100, 6)),
+            (self.user.id, date(2024, 3, 6), 1, 0),
+        ])
+
+    def test_rollup_igual_recalculo_ao_atualizar(self):
+        compromisso = self.compromisso(date(2024, 3, 5), 8, 1, 3)
+        self.compromisso(date(2024, 3, 5), 10, 0, 2)
+
+        atividade = compromisso.atividades.filter(done=False).first()
+        atividade.done = True
+        atividade.save()
+        self.assertRollupIgualRecalculo()
+
+        models.CompromissoAtividade.objects.create(compromisso=compromisso, descricao='Extra')
+        self.assertRollupIgualRecalculo()
+
+        compromisso.data = date(2024, 3, 9)
+        compromisso.save()
+        self.assertEqual(self.assertRollupIgualRecalculo(), [
+            (self.user.id, date(2024, 3, 5), 1, 0),
+            (self.user.id, date(2024, 3, 9), 1, 50),
+        ])
+
+    def contadores(self):
+        return {p.compromisso_id: (p.qtd_total_atv, p.qtd_atv_done, round(p.porcentagem, 6))
+                for p in models.PontuacaoCompromisso.objects.order_by('compromisso_id')}
+
+    def test_reconciliar_pontuacoes_corrige_divergencias(self):
+        corrompido = self.compromisso(date(2024, 3, 5), 8, 1, 3)
+        sem_pontuacao = self.compromisso(date(2024, 3, 5), 10, 2, 2)
+        self.compromisso(date(2024, 3, 6), 8, 0, 1)
+        outro = User.objects.create_user('outro', 'outro@lifeai.local', 'senha')
+        alheio = models.Compromisso.objects.create(id_usuario=outro, titulo='Alheio', data=date(2024, 3, 5),
+                                                   hora_inicio=time(8), hora_fim=time(9))
+        models.CompromissoAtividade.objects.create(compromisso=alheio, descricao='A0')
+
+        # update() e delete() em queryset não passam pelo save(): a pontuação e o rollup divergem
+        models.PontuacaoCompromisso.objects.filter(compromisso__in=[corrompido, alheio]).update(
+            qtd_total_atv=9, qtd_atv_done=7, porcentagem=77.0
+        )
+        models.PontuacaoCompromisso.objects.filter(compromisso=sem_pontuacao).delete()
+        models.DesempenhoDiario.objects.filter(id_usuario=self.user).update(soma_porcentagem=1)
+
+        saida = io.StringIO()
+        call_command('reconciliar_pontuacoes', usuario=self.user.id, stdout=saida)
+        self.assertIn('1 pontuação(ões) criada(s), 1 corrigida(s), 1 usuário(s)', saida.getvalue())
+
+        reconciliadas = self.contadores()
+        self.assertEqual(reconciliadas[alheio.id], (9, 7, 77.0))
+        for compromisso in models.Compromisso.objects.filter(id_usuario=self.user):
+            recalcular_pontuacao(compromisso.id)
+        self.assertEqual(reconciliadas, self.contadores())
+        self.assertEqual(reconciliadas[corrompido.id], (3, 1, round(100 / 3, 6)))
+        self.assertEqual(reconciliadas[sem_pontuacao.id], (2, 2, 100.0))
+
+        rollup = self.rollup()
+        recalcular_desempenho(self.user.id)
+        self.assertEqual(rollup, self.rollup())
+        self.assertIn((self.user.id, date(2024, 3, 5), 2, round(100 / 3 + 100, 6)), rollup)
+
+    def test_rollup_igual_recalculo_ao_excluir(self):
+        compromisso = self.compromisso(date(2024, 3, 5), 8, 2, 2)
+        outro = self.compromisso(date(2024, 3, 5), 10, 1, 2)
+        self.compromisso(date(2024, 3, 6), 8, 1, 1)
+
+        outro.atividades.filter(done=True).delete()
+        self.assertRollupIgualRecalculo()
+
+        compromisso.delete()
+        self.assertRollupIgualRecalculo()
+
+        # Sem atividades o compromisso deixa de contar e o dia some do rollup
+        outro.atividades.all().delete()
+        self.assertEqual(self.assertRollupIgualRecalculo(), [(self.user.id, date(2024, 3, 6), 1, 100)])
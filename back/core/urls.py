@@ -13,17 +13,29 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('perfil/', viewsets.PerfilUsuarioView.as_view(), name='perfil_usuario'),
     path('imc/', viewsets.RegistroCorporalCreateView.as_view(), name='criar_registro_imc'),
+    path('imc/lote/', viewsets.RegistroCorporalLoteView.as_view(), name='criar_registros_imc_lote'),
     path('imc/historico/', viewsets.GraficoEvolucaoView.as_view(), name='grafico_evolucao'),
     path('imc/registrosConsultas/', viewsets.HistoricoRegistrosView.as_view(), name='historico_tabela'),
     path('imc/<int:pk>/', viewsets.RegistroDeleteView.as_view(), name='deletar_registro'),
     path('composicao-corporal/', viewsets.ComposicaoCorporalListCreateAPIView.as_view(), name='composicao_corporal'),
     path('gerar-dieta-ia/', api_ia.gerar_dieta_ia_view, name='gerar-dieta-ia'),
+    path('gerar-dieta-ia/jobs/<int:job_id>/', api_ia.job_dieta_ia_view, name='job-dieta-ia'),
     path('chat-ia/', api_ia.chat_ia_view, name='chat-ia'),
     path('dietas/historico/', viewsets.HistoricoDietasView.as_view(), name='historico_dietas'),
+    path('dietas/<int:pk>/', viewsets.DietaDetalheView.as_view(), name='dieta_detalhe'),
     path('compromissos/', viewsets.CompromissosListCreateAPIView.as_view(), name='compromissos-list-create'),
+    path('compromissos/lote/', viewsets.CompromissoLoteView.as_view(), name='compromissos-lote'),
     path('compromissos/<int:pk>/', viewsets.CompromissoRetrieveUpdateDeleteAPIView.as_view(), name='compromisso-crud'),
+    path('compromissos/series/', viewsets.SerieCompromissoListCreateAPIView.as_view(), name='series-list-create'),
+    path('compromissos/series/<int:pk>/', viewsets.SerieCompromissoRetrieveUpdateDeleteAPIView.as_view(), name='serie-crud'),
+    path('compromissos/series/<int:pk>/ocorrencias/<str:data>/', viewsets.OcorrenciaSerieAPIView.as_view(), name='serie-ocorrencia'),
     path('pontuacoes/mensal/', viewsets.DesempenhoMensalAPIView.as_view(), name='pontuacoes-mensal'),
+    path('pontuacoes/mensal/dias/', viewsets.DesempenhoMensalAPIView.as_view(por_dia=True),
+         name='pontuacoes-mensal-dias'),
+    path('pontuacoes/anual/', viewsets.DesempenhoAnualAPIView.as_view(), name='pontuacoes-anual'),
     path('compromissos/<int:compromisso_id>/pontuacao/', viewsets.GerarPontuacaoCompromissoAPIView.as_view(), name='gerar_pontuacao'),
     path('health/', views.health_check, name="health_check"),
     path('exercicios/', viewsets.HistoricoExercicioView.as_view(), name='historico_exercicios'),
+    path('exercicios/lote/', viewsets.HistoricoExercicioLoteView.as_view(), name='historico_exercicios_lote'),
+    path('sync/', viewsets.SincronizacaoView.as_view(), name='sincronizacao'),
 ]
\ No newline at end of file
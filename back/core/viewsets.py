@@ -5,10 +5,23 @@ from rest_framework.response import Response
 from rest_framework import status, permissions
 from core import serializers
 from core import models
+from core.pagination import responder_paginado
+from core.services.condicional import condicional
+from core.services.contexto_ia import invalidar_contexto_ia
+from core.services.desempenho import desempenho_anual, desempenho_mensal, pontuacoes_do_mes
+from core.services.grafico import AGRUPAMENTOS, serie_imc
+from core.services.imc import calcular_imc
+from core.services.lote import CRIADO, LoteInvalidoError, gravar_lote
+from core.services.pontuacao import recalcular_pontuacao
+from core.services.recorrencia import chave_calendario, ocorrencias_virtuais
+from core.services.sincronizacao import TokenInvalido, alteracoes_desde, decodificar_token
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
 from datetime import date
-
-from core.welcome_email_html.welcome import send_welcome_email_html
+from heapq import merge
 
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -22,18 +35,20 @@ class RegisterView(APIView):
         if not username or not email or not password:
             return Response({'message': 'Todos os campos são obrigatórios.'}, status=400)
 
-        if User.objects.filter(username=username).exists():
-            return Response({'message': 'Nome de usuário já em uso.'}, status=400)
-
-        if User.objects.filter(email=email).exists():
-            return Response({'message': 'Email já em uso.'}, status=400)
-
-        user = User.objects.create_user(username=username, email=email, password=password)
-
+        # As constraints de username e e-mail (auth_user_email_uniq) decidem; só em caso de
+        # conflito consultamos qual dos dois já existia, para a mensagem.
         try:
-            send_welcome_email_html(user)
-        except Exception as e:
-            print(f"ALERTA: Falha ao enviar e-mail: {str(e)}")
+            with transaction.atomic():
+                user = User.objects.create_user(username=username, email=email, password=password)
+                models.EmailOutbox.objects.create(
+                    id_usuario=user,
+                    tipo=models.EmailOutbox.BOAS_VINDAS,
+                    destinatario=user.email
+                )
+        except IntegrityError:
+            if User.objects.filter(username=username).exists():
+                return Response({'message': 'Nome de usuário já em uso.'}, status=400)
+            return Response({'message': 'Email já em uso.'}, status=400)
 
         refresh = RefreshToken.for_user(user)
 
@@ -59,16 +74,11 @@ class LoginView(APIView):
         if not email or not password:
             return Response({"error": "Email e senha são obrigatórios."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({"error": "Usuário com esse email não encontrado."}, status=status.HTTP_404_NOT_FOUND)
-
-        user = authenticate(username=user.username, password=password)
-
-        onboarding_completed = hasattr(user, 'perfil')
+        # Uma consulta só: o EmailBackend já traz o perfil junto (select_related)
+        user = authenticate(request, email=email, password=password)
 
         if user is not None:
+            onboarding_completed = hasattr(user, 'perfil')
             refresh = RefreshToken.for_user(user)
             return Response({
                 'message': 'Login bem-sucedido',
@@ -98,6 +108,7 @@ class SendEmailView(APIView):
 class PerfilUsuarioView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @condicional(lambda request: models.PerfilUsuario.objects.filter(id_usuario=request.user))
     def get(self, request):
         try:
             perfil = request.user.perfil
@@ -139,18 +150,9 @@ class RegistroCorporalCreateView(APIView):
         serializer = serializers.RegistroCorporalSerializer(data=data, context={'request': request})
 
         if serializer.is_valid():
-            peso = serializer.validated_data['peso']
-            altura = serializer.validated_data['altura']
-            imc_valor = peso / (altura ** 2)
-
-            if imc_valor < 18.5:
-                classificacao = "Abaixo do peso"
-            elif 18.5 <= imc_valor < 25:
-                classificacao = "Peso normal"
-            elif 25 <= imc_valor < 30:
-                classificacao = "Sobrepeso"
-            else:
-                classificacao = "Obesidade"
+            imc_valor, classificacao = calcular_imc(
+                serializer.validated_data['peso'], serializer.validated_data['altura']
+            )
 
             registro = serializer.save(
                 imc_res=imc_valor,
@@ -167,22 +169,100 @@ class RegistroCorporalCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class LoteAPIView(APIView):
+    """POST de uma lista de itens registrados offline; ver core.services.lote.gravar_lote."""
+    permission_classes = [permissions.IsAuthenticated]
+    model = None
+    serializer_class = None
+
+    def preparar(self, itens):
+        pass
+
+    def ao_gravar(self, resultados):
+        pass
+
+    def post(self, request):
+        try:
+            resultados = gravar_lote(request, request.data, self.model, self.serializer_class, self.preparar)
+        except LoteInvalidoError as e:
+            return Response({"erro": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        self.ao_gravar(resultados)
+        return Response({'resultados': resultados}, status=status.HTTP_200_OK)
+
+
+class RegistroCorporalLoteView(LoteAPIView):
+    model = models.RegistroCorporal
+    serializer_class = serializers.RegistroCorporalSerializer
+
+    def post(self, request):
+        if isinstance(request.data, list):
+            for item in request.data:
+                if isinstance(item, dict) and 'data_consulta' not in item:
+                    item['data_consulta'] = date.today()
+        return super().post(request)
+
+    def preparar(self, itens):
+        for dados in itens:
+            dados['imc_res'], dados['classificacao'] = calcular_imc(dados['peso'], dados['altura'])
+
+    def ao_gravar(self, resultados):
+        # bulk_create não dispara post_save, que é quem invalida o contexto da IA
+        if any(r['status'] == CRIADO for r in resultados):
+            user_id = self.request.user.id
+            transaction.on_commit(lambda: invalidar_contexto_ia(user_id))
+
+
+class HistoricoExercicioLoteView(LoteAPIView):
+    model = models.HistoricoExercicio
+    serializer_class = serializers.HistoricoExercicioSerializer
+
+
+class CompromissoLoteView(LoteAPIView):
+    model = models.Compromisso
+    serializer_class = serializers.CompromissoSerializer
+
+
 class HistoricoRegistrosView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        registros = models.RegistroCorporal.objects.filter(id_usuario=request.user).order_by('-data_consulta')
-        serializer = serializers.RegistroCorporalSerializer(registros, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        registros = models.RegistroCorporal.objects.filter(id_usuario=request.user)
+        return responder_paginado(request, registros, serializers.RegistroCorporalSerializer,
+                                  ('-data_consulta', '-id'))
 
 
 class GraficoEvolucaoView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    PARAMETROS = ('inicio', 'fim', 'agrupamento', 'max_pontos')
+
+    @condicional(lambda request: models.RegistroCorporal.objects.filter(id_usuario=request.user))
     def get(self, request):
-        registros = models.RegistroCorporal.objects.filter(id_usuario=request.user).order_by('data_consulta')
-        serializer = serializers.GraficoEvolucaoSerializer(registros, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Sem nenhum parâmetro, mantém a resposta antiga com todos os registros
+        if not any(p in request.GET for p in self.PARAMETROS):
+            registros = models.RegistroCorporal.objects.filter(id_usuario=request.user).order_by('data_consulta')
+            serializer = serializers.GraficoEvolucaoSerializer(registros, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        agrupamento = request.GET.get('agrupamento', 'dia')
+        if agrupamento not in AGRUPAMENTOS:
+            return Response({"erro": "Agrupamento deve ser dia, semana ou mes."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            inicio = date.fromisoformat(request.GET['inicio']) if request.GET.get('inicio') else None
+            fim = date.fromisoformat(request.GET['fim']) if request.GET.get('fim') else None
+        except ValueError:
+            return Response({"erro": "Datas devem estar no formato AAAA-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            max_pontos = int(request.GET.get('max_pontos', settings.GRAFICO_MAX_PONTOS))
+        except ValueError:
+            return Response({"erro": "max_pontos deve ser um número."}, status=status.HTTP_400_BAD_REQUEST)
+        max_pontos = max(3, min(max_pontos, settings.GRAFICO_MAX_PONTOS_LIMITE))
+
+        pontos = serie_imc(request.user, agrupamento, max_pontos, inicio, fim)
+        return Response({'agrupamento': agrupamento, 'pontos': pontos}, status=status.HTTP_200_OK)
 
 
 class RegistroDeleteView(APIView):
@@ -200,19 +280,31 @@ class RegistroDeleteView(APIView):
 class HistoricoDietasView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @condicional(lambda request: models.Dieta.objects.filter(id_usuario=request.user))
     def get(self, request):
-        dietas = models.Dieta.objects.filter(id_usuario=request.user).order_by('-data_criacao')
-        serializer = serializers.DietaSerializer(dietas, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        dietas = models.Dieta.objects.filter(id_usuario=request.user)
+        return responder_paginado(request, dietas, serializers.DietaSerializer, ('-data_criacao', '-id'))
+
+
+class DietaDetalheView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @condicional(lambda request: models.Dieta.objects.filter(id_usuario=request.user))
+    def get(self, request, pk):
+        dieta = models.Dieta.objects.select_related('plano').filter(id=pk, id_usuario=request.user).first()
+        if dieta is None:
+            return Response({"erro": "Dieta não encontrada."}, status=status.HTTP_404_NOT_FOUND)
+        serializer = serializers.DietaDetalheSerializer(dieta)
+        return Response(serializer.data)
 
 
 class ComposicaoCorporalListCreateAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        registros = models.ComposicaoCorporal.objects.filter(id_usuario=request.user).order_by('-data_consulta')
-        serializer = serializers.ComposicaoCorporalSerializer(registros, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        registros = models.ComposicaoCorporal.objects.filter(id_usuario=request.user)
+        return responder_paginado(request, registros, serializers.ComposicaoCorporalSerializer,
+                                  ('-data_consulta', '-id'))
 
     def post(self, request):
         serializer = serializers.ComposicaoCorporalSerializer(data=request.data, context={'request': request})
@@ -226,9 +318,50 @@ class CompromissosListCreateAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        compromissos = models.Compromisso.objects.filter(id_usuario=request.user).order_by('-data', 'hora_inicio')
-        serializer = serializers.CompromissoSerializer(compromissos, many=True)
-        return Response(serializer.data)
+        if 'inicio' in request.GET or 'fim' in request.GET:
+            return self.intervalo(request)
+        compromissos = models.Compromisso.objects.filter(id_usuario=request.user)
+        return responder_paginado(request, compromissos, serializers.CompromissoSerializer,
+                                  ('-data', 'hora_inicio', 'id'))
+
+    def intervalo(self, request):
+        """Visão de calendário: compromissos de um período com atividades e pontuação, mais as
+        ocorrências das séries recorrentes que ainda não foram materializadas, em 3 queries."""
+        try:
+            inicio = date.fromisoformat(request.GET['inicio'])
+            fim = date.fromisoformat(request.GET['fim'])
+        except KeyError:
+            return Response({"erro": "Informe inicio e fim."}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"erro": "Datas devem estar no formato AAAA-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if fim < inicio:
+            return Response({"erro": "fim deve ser depois de inicio."}, status=status.HTTP_400_BAD_REQUEST)
+        if (fim - inicio).days >= settings.CALENDARIO_MAX_DIAS:
+            return Response({"erro": f"Período máximo de {settings.CALENDARIO_MAX_DIAS} dias."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Ocorrências previstas para o período mas remarcadas para fora dele vêm junto, só
+        # para esconder a versão virtual; não entram na resposta.
+        compromissos = list(
+            models.Compromisso.objects
+            .filter(Q(data__gte=inicio, data__lte=fim)
+                    | Q(serie__isnull=False, data_original__gte=inicio, data_original__lte=fim),
+                    id_usuario=request.user)
+            .select_related('pontuacao')
+            .prefetch_related('atividades')
+            .order_by('data', 'hora_inicio', 'id')
+        )
+        materializadas = {(c.serie_id, c.data_original) for c in compromissos if c.serie_id}
+        no_periodo = [c for c in compromissos if inicio <= c.data <= fim]
+
+        series = models.SerieCompromisso.objects.filter(
+            Q(data_fim__isnull=True) | Q(data_fim__gte=inicio), id_usuario=request.user, data_inicio__lte=fim
+        )
+        virtuais = ocorrencias_virtuais(series, inicio, fim, materializadas)
+
+        serializer = serializers.CompromissoCalendarioSerializer(no_periodo, many=True)
+        return Response(list(merge(serializer.data, virtuais, key=chave_calendario)))
 
     def post(self, request):
         serializer = serializers.CompromissoSerializer(data=request.data, context={'request': request})
@@ -283,43 +416,155 @@ class CompromissoRetrieveUpdateDeleteAPIView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class GerarPontuacaoCompromissoAPIView(APIView):
+class SerieCompromissoListCreateAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request, compromisso_id):
+    def get(self, request):
+        series = models.SerieCompromisso.objects.filter(id_usuario=request.user)
+        serializer = serializers.SerieCompromissoSerializer(series, many=True)
+        return Response(serializer.data)
+
+    def post(self, request):
+        serializer = serializers.SerieCompromissoSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SerieCompromissoRetrieveUpdateDeleteAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self, pk, user):
         try:
-            comp = models.Compromisso.objects.get(id=compromisso_id, id_usuario=request.user)
-        except models.Compromisso.DoesNotExist:
-            return Response({'erro': 'Compromisso não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+            return models.SerieCompromisso.objects.get(id=pk, id_usuario=user)
+        except models.SerieCompromisso.DoesNotExist:
+            return None
 
-        atividades = models.CompromissoAtividade.objects.filter(compromisso=comp)
-        total = atividades.count()
-        feitas = atividades.filter(done=True).count()
+    def get(self, request, pk):
+        serie = self.get_object(pk, request.user)
+        if not serie:
+            return Response({'erro': 'Série não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = serializers.SerieCompromissoSerializer(serie)
+        return Response(serializer.data)
 
-        if total == 0:
-            return Response({'erro': 'Compromisso sem atividades'}, status=status.HTTP_400_BAD_REQUEST)
+    def put(self, request, pk, partial=False):
+        serie = self.get_object(pk, request.user)
+        if not serie:
+            return Response({'erro': 'Série não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = serializers.SerieCompromissoSerializer(serie, data=request.data, partial=partial,
+                                                            context={'request': request})
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def patch(self, request, pk):
+        return self.put(request, pk, partial=True)
+
+    def delete(self, request, pk):
+        serie = self.get_object(pk, request.user)
+        if not serie:
+            return Response({'erro': 'Série não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        # As ocorrências já materializadas (concluídas ou editadas) ficam como compromissos avulsos.
+        # O SET_NULL do delete não passa pelo auto_now, então o sync não as veria mudar.
+        with transaction.atomic():
+            serie.ocorrencias.update(serie=None, atualizado_em=timezone.now())
+            serie.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-        porcentagem = (feitas / total) * 100
 
-        pontuacao, _ = models.PontuacaoCompromisso.objects.update_or_create(
-            compromisso=comp,
-            defaults={
-                'qtd_total_atv': total,
-                'qtd_atv_done': feitas,
-                'porcentagem': porcentagem
+class OcorrenciaSerieAPIView(APIView):
+    """Materializa (PUT/PATCH) ou cancela (DELETE) uma ocorrência de série pela data prevista na regra."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def carregar(self, request, pk, data):
+        try:
+            dia = date.fromisoformat(data)
+        except ValueError:
+            return None, None, Response({"erro": "Data deve estar no formato AAAA-MM-DD."},
+                                        status=status.HTTP_400_BAD_REQUEST)
+        try:
+            serie = models.SerieCompromisso.objects.get(id=pk, id_usuario=request.user)
+        except models.SerieCompromisso.DoesNotExist:
+            return None, None, Response({'erro': 'Série não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        return serie, dia, None
+
+    def put(self, request, pk, data):
+        serie, dia, erro = self.carregar(request, pk, data)
+        if erro:
+            return erro
+
+        compromisso = serie.ocorrencias.filter(data_original=dia).first()
+        if compromisso is None and next(serie.datas(dia, dia), None) is None:
+            return Response({'erro': 'Ocorrência não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = serializers.OcorrenciaSerieSerializer(compromisso, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        criado = compromisso is None
+        extras = {}
+        if criado:
+            extras = {
+                'id_usuario': request.user, 'serie': serie, 'data_original': dia, 'titulo': serie.titulo,
+                'data': dia, 'hora_inicio': serie.hora_inicio, 'hora_fim': serie.hora_fim,
+                **serializer.validated_data,
             }
-        )
+        try:
+            with transaction.atomic():
+                compromisso = serializer.save(**extras)
+        except IntegrityError:
+            return Response({'erro': 'Já existe um compromisso nesse horário.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(serializers.CompromissoSerializer(compromisso).data,
+                        status=status.HTTP_201_CREATED if criado else status.HTTP_200_OK)
+
+    def patch(self, request, pk, data):
+        return self.put(request, pk, data)
+
+    def delete(self, request, pk, data):
+        serie, dia, erro = self.carregar(request, pk, data)
+        if erro:
+            return erro
+        if next(serie.datas(dia, dia), None) is None:
+            return Response({'erro': 'Ocorrência não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        with transaction.atomic():
+            serie.excecoes = [*serie.excecoes, dia.isoformat()]
+            serie.save(update_fields=['excecoes', 'atualizado_em'])
+            serie.ocorrencias.filter(data_original=dia).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class GerarPontuacaoCompromissoAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, compromisso_id):
+        # A pontuação é mantida pelos signals das atividades; aqui só é lida.
+        pontuacao = models.PontuacaoCompromisso.objects.filter(
+            compromisso_id=compromisso_id, compromisso__id_usuario=request.user
+        ).first()
+
+        if pontuacao is None:
+            if not models.Compromisso.objects.filter(id=compromisso_id, id_usuario=request.user).exists():
+                return Response({'erro': 'Compromisso não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+            pontuacao = recalcular_pontuacao(compromisso_id)
+
+        if pontuacao is None or pontuacao.qtd_total_atv == 0:
+            return Response({'erro': 'Compromisso sem atividades'}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
-            'compromisso_id': comp.id,
-            'qtd_total_atv': total,
-            'qtd_atv_done': feitas,
+            'compromisso_id': compromisso_id,
+            'qtd_total_atv': pontuacao.qtd_total_atv,
+            'qtd_atv_done': pontuacao.qtd_atv_done,
             'porcentagem': round(pontuacao.porcentagem, 2)
         })
 
 
 class DesempenhoMensalAPIView(APIView):
+    """Uma entrada por compromisso pontuado no mês, formato consumido pelas versões atuais do app.
+    O resumo por dia, lido do rollup, fica em pontuacoes/mensal/dias/."""
     permission_classes = [permissions.IsAuthenticated]
+    por_dia = False
 
     def get(self, request):
         ano = request.GET.get('ano')
@@ -334,45 +579,54 @@ class DesempenhoMensalAPIView(APIView):
         except ValueError:
             return Response({"erro": "Ano e mês devem ser números."}, status=400)
 
-        pontuacoes = models.PontuacaoCompromisso.objects.filter(
-            compromisso__id_usuario=request.user,
-            compromisso__data__year=ano,
-            compromisso__data__month=mes
-        ).values(
-            'compromisso__data',
-            'porcentagem'
-        )
+        if not 1 <= mes <= 12 or not 1 <= ano <= 9998:
+            return Response({"erro": "Ano ou mês inválido."}, status=400)
 
-        resultado = []
-        for p in pontuacoes:
-            data_str = p['compromisso__data'].strftime('%Y-%m-%d')
-            porcentagem = p['porcentagem']
-            if porcentagem < 33:
-                emoji = '🧊'
-            elif porcentagem < 66:
-                emoji = '😐'
-            else:
-                emoji = '🔥'
-
-            resultado.append({
-                'data': data_str,
-                'emoji': emoji,
-                'porcentagem': porcentagem
-            })
+        if self.por_dia:
+            return Response(desempenho_mensal(request.user, ano, mes))
+        return Response(pontuacoes_do_mes(request.user, ano, mes))
 
-        return Response(resultado)
+
+class DesempenhoAnualAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            ano = int(request.GET.get('ano', date.today().year))
+        except ValueError:
+            return Response({"erro": "Ano deve ser um número."}, status=400)
+
+        if not 1 <= ano <= 9998:
+            return Response({"erro": "Ano inválido."}, status=400)
+
+        return Response(desempenho_anual(request.user, ano))
 
 class HistoricoExercicioView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        historico = models.HistoricoExercicio.objects.filter(id_usuario=request.user).order_by('-data_treino')
-        serializer = serializers.HistoricoExercicioSerializer(historico, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        historico = models.HistoricoExercicio.objects.filter(id_usuario=request.user)
+        return responder_paginado(request, historico, serializers.HistoricoExercicioSerializer,
+                                  ('-data_treino', '-id'))
 
     def post(self, request):
         serializer = serializers.HistoricoExercicioSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SincronizacaoView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        since = request.GET.get('since')
+        desde = None
+        if since:
+            try:
+                desde = decodificar_token(since)
+            except TokenInvalido:
+                return Response({"erro": "Token de sincronização inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(alteracoes_desde(request.user, desde), status=status.HTTP_200_OK)
@@ -1,21 +1,22 @@
+from functools import lru_cache
+
 from django.core.mail import EmailMultiAlternatives
+from django.utils.html import escape
 
 from LIFEAI_ import settings
 
-def send_welcome_email_html(user):
-    subject = "Bem-vindo ao LifeAI!"
-    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER)
-    to_email = [user.email]
+SUBJECT = "Bem-vindo ao LifeAI!"
+MARCADOR = "\x00"
 
-    text_content = f"""
-        Olá, {user.username}!
+TEXT_TEMPLATE = """
+        Olá, {username}!
         Seja muito bem-vindo ao LifeAI, sua nova plataforma de bem-estar e inteligência personalizada.
         Sua conta foi criada com sucesso e agora você pode aproveitar recursos exclusivos para melhorar sua saúde física e mental.
         Atenciosamente,
         Equipe LifeAI
     """
 
-    html_content = f"""
+HTML_TEMPLATE = """
     <html lang="pt-BR">
     <head>
         <meta charset="UTF-8">
@@ -71,7 +72,7 @@ def send_welcome_email_html(user):
                 <h1>Bem-vindo ao LifeAI!</h1>
             </div>
             <div class="content">
-                <p>Olá, <strong>{user.username}</strong>!</p>
+                <p>Olá, <strong>{username}</strong>!</p>
                 <p>Seja muito bem-vindo ao <strong>LifeAI</strong>, sua nova plataforma de bem-estar e inteligência personalizada.</p>
                 <p>Sua conta foi criada com sucesso e agora você pode aproveitar recursos exclusivos para melhorar sua saúde física e mental.</p>
                 <p>Estamos felizes em ter você conosco.</p>
@@ -85,6 +86,26 @@ def send_welcome_email_html(user):
     </html>
     """
 
-    msg = EmailMultiAlternatives(subject, text_content, from_email, to_email)
+
+@lru_cache(maxsize=None)
+def partes_template(template):
+    # O template é formatado uma única vez; cada e-mail só concatena o nome do usuário.
+    return template.format(username=MARCADOR).split(MARCADOR)
+
+
+def renderizar(template, username):
+    return username.join(partes_template(template))
+
+
+def montar_email_boas_vindas(username, email, connection=None):
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER)
+    text_content = renderizar(TEXT_TEMPLATE, username)
+    html_content = renderizar(HTML_TEMPLATE, escape(username))
+
+    msg = EmailMultiAlternatives(SUBJECT, text_content, from_email, [email], connection=connection)
     msg.attach_alternative(html_content, "text/html")
-    msg.send(fail_silently=False)
\ No newline at end of file
+    return msg
+
+
+def send_welcome_email_html(user):
+    montar_email_boas_vindas(user.username, user.email).send()
@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Com workers uvicorn as views async (chat e dieta com IA) atendem muitas requisições ao mesmo
+# tempo no event loop. As views síncronas do DRF não: sob ASGI o Django as roda com
+# sync_to_async(thread_sensitive=True), ou seja, todas na mesma thread do processo, uma por vez.
+# Por isso o padrão são dois processos por CPU: enquanto uma view síncrona espera o banco em um
+# worker, o outro continua atendendo as demais. GUNICORN_THREADS só vale para o worker gthread (WSGI)
+# e ASGI_THREADS não muda esse limite, só o executor das chamadas thread_sensitive=False.
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "LIFEAI_.workers.UvicornWorker")
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+
+# Carrega o Django uma vez no master; os workers herdam a aplicação já importada via fork.
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() in ("true", "1")
+
+# No SIGTERM os workers param de aceitar conexões e esperam as requisições em andamento.
+# O chat pode levar até 3 tentativas de 30s no LLM, então o prazo padrão cobre esse pior caso.
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 120))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 150))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Recicla os workers periodicamente para conter vazamentos de memória.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+
+def on_starting(server):
+    # Com mais de um worker, o LocMemCache deixa cada processo com sua cópia do snapshot de
+    # contexto da IA, e a invalidação feita por um worker não chega aos outros.
+    backend = os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache")
+    if workers > 1 and backend.endswith("LocMemCache"):
+        raise RuntimeError(
+            "CACHE_BACKEND local não é compartilhado entre os workers; configure um cache como o Redis "
+            "ou rode com WEB_CONCURRENCY=1."
+        )
+
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
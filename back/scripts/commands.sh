@@ -9,9 +9,6 @@ done
 
 echo "✅ Postgres Database Started Successfully ($DB_HOST:$DB_PORT)"
 
-# Roda migrations e coletar static
-python manage.py collectstatic --noinput
-python manage.py migrate --noinput
-
-# Roda servidor Django
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+# collectstatic roda no build da imagem e as migrations em um passo separado (scripts/migrate.sh).
+# Gunicorn com workers uvicorn (ASGI); workers, threads e timeouts ficam em gunicorn.conf.py.
+exec gunicorn -c gunicorn.conf.py LIFEAI_.asgi:application
@@ -0,0 +1,13 @@
+#!/bin/sh
+set -e
+
+# Espera o Postgres iniciar
+while ! nc -z $DB_HOST $DB_PORT; do
+  echo "🟡 Waiting for Postgres Database Startup ($DB_HOST $DB_PORT) ..."
+  sleep 2
+done
+
+echo "✅ Postgres Database Started Successfully ($DB_HOST:$DB_PORT)"
+
+# Passo único, executado antes de subir a nova versão da API e dos workers
+python manage.py migrate --noinput